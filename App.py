@@ -1,110 +1,373 @@
+import math
+import os
+import random
 import sys
+import time
+from collections import OrderedDict, deque
 
-from PIL.ImageQt import ImageQt
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel
-from PyQt5.QtGui import QPainter, QColor, QBrush, QPixmap
-from PyQt5.QtCore import Qt, QPoint, QBasicTimer
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 
 from code import GameLogic
+from code.mcts import MCTSPlayer
+from code.profiling import Profiler
+from code.replay import ReplayRecorder
+from code.serialization import save, load
+from code.render import GameRenderer, BoardLayer, TileTracker
+
+
+class BotSearch(QThread):
+    """Search of the action of the computer player out of the GUI thread.
+
+    The controller gets the copy of the game, so the game is drawn during the search.
+    """
+
+    found = pyqtSignal(object)
+
+    def __init__(self, controller, game_logic):
+        super().__init__()
+        self.controller = controller
+        # Game to make the action in, it's replaced by the new or loaded game.
+        self.target = game_logic
+        self.game_logic = game_logic.copy()
+
+    def run(self):
+        self.found.emit(self.controller(self.game_logic))
 
 
 class App(QWidget):
     """The main class of the game."""
 
-    __key_to_direction = {
-        Qt.Key_Up: 'up',
-        Qt.Key_Down: 'down',
-        Qt.Key_Right: 'right',
-        Qt.Key_Left: 'left',
+    __key_to_command = {
+        Qt.Key_Up: ('move_character', 'up'),
+        Qt.Key_Down: ('move_character', 'down'),
+        Qt.Key_Right: ('move_character', 'right'),
+        Qt.Key_Left: ('move_character', 'left'),
+        Qt.Key_Return: ('pick_money',),
+        Qt.Key_Alt: ('next_character',),
+        Qt.Key_R: ('new_game',),
+        Qt.Key_F5: ('save_game',),
+        Qt.Key_F9: ('load_game',),
+        Qt.Key_Plus: ('zoom', 1),
+        Qt.Key_Equal: ('zoom', 1),
+        Qt.Key_Minus: ('zoom', -1),
+        Qt.Key_0: ('fit_view',),
     }
+    # Commands handled by the app, the rest are passed to the game logic.
+    __app_commands = {'new_game', 'save_game', 'load_game', 'zoom', 'fit_view'}
+
+    save_path = 'savegame.jkl'
+
+    # Overlays with thick pens are drawn outside of their tiles, given for the tiles of 128.
+    overlay_margin = 8
+    # Tile sizes of the zoom levels, the sprites of each size are scaled once.
+    zoom_levels = (16, 24, 32, 48, 64, 96, 128, 192, 256)
+    # Number of the board layers of the last zoom levels kept, so zooming back is instant.
+    n_boards = 4
 
     # TODO: Custom assignment of color and position.
-    def __init__(self, num_of_players, tile_size=64):
+    def __init__(self, num_of_players, tile_size=64, report_latency=False, bots=0, bot_time=1.,
+                 bot_processes=1, replay_path=None):
+        """
+        :param bots: number of the last players played by the computer
+        :param bot_time: search time of the computer players per action in seconds
+        :param bot_processes: number of processes of the search
+        :param replay_path: replay log each game is recorded to, the games are not recorded if None
+        """
         # Init widget.
         super().__init__()
         self.num_of_players = num_of_players
-        self.tile_size = tile_size
-        self.game_logic = GameLogic(num_of_players, tile_size=tile_size)
-        self.map_shape = self.game_logic.get_map_shape()
-        self.key_press = ''
+        self.replay_path = replay_path
+        self.recorder = None
+        self.bots = bots
+        self.bot = MCTSPlayer(time_limit=bot_time, processes=bot_processes) if bots else None
+        # Running search of the computer player, None if no one is searching.
+        self.bot_search = None
+        self.set_game(*self.create_game())
+        self.renderer = GameRenderer(tile_size)
+        self.board = BoardLayer(self.renderer, self.game_logic)
+        # Board layers of the last zoom levels in format {tile_size: BoardLayer}.
+        self.boards = OrderedDict([(tile_size, self.board)])
+        # Last position of the mouse dragging the board, None if not dragged.
+        self.drag_pos = None
+        self.tracker = TileTracker()
+        self.tracker.update(self.game_logic)
 
-        # Init Qt timer.
-        self.time = QBasicTimer()
+        # Commands in format (name, *args), executed in the order of input.
+        self.commands = deque()
+        # Times of the inputs not yet shown on the screen.
+        self.input_times = []
+        # Time from the input till the end of the frame showing it, in seconds.
+        self.latencies = deque(maxlen=1000)
+        self.report_latency = report_latency
 
         self.UI()
-        self.start()
+        self.schedule_bot()
 
     def UI(self):
         self.setWindowTitle('Jackal')
         self.setStyleSheet("background-color: rgb(3,102,196)")
-        self.update()
 
-        # Resize the widget to fit the game map.
-        self.setFixedSize(*self.map_shape)
-        self.resize(*self.map_shape)
+        # Resize the widget to fit the game map, if it fits the screen.
+        width, height = self.renderer.get_map_shape(self.game_logic.game_map)
+        screen = QApplication.primaryScreen().availableGeometry()
+        self.setMinimumSize(min(width, 256), min(height, 256))
+        self.resize(min(width, screen.width()), min(height, screen.height()))
         self.show()
 
-    def start(self):
-        self.time.start(20, self)
-        self.repaint()
+    def create_game(self):
+        seed = random.randrange(2 ** 32)
+        return GameLogic(self.num_of_players, seed=seed), seed
+
+    def set_game(self, game_logic, seed=None):
+        """Start playing the game, recording it to the replay log from scratch if it's set.
+
+        :param seed: seed of the map, the start position is recorded if None
+        """
+        self.game_logic = game_logic
+        if self.bot is not None:
+            for player in game_logic.players[-self.bots:]:
+                game_logic.controllers[player.color] = self.bot
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.replay_path is not None:
+            self.recorder = ReplayRecorder(game_logic, open(self.replay_path, 'wb'), seed)
+
+    def new_game(self):
+        self.set_game(*self.create_game())
+        # All the tiles are redrawn on the next refresh.
+        self.tracker.reset()
+
+    def save_game(self):
+        save(self.game_logic, self.save_path)
+
+    def load_game(self):
+        if not os.path.exists(self.save_path):
+            return
+        self.set_game(load(self.save_path))
+        self.tracker.reset()
+
+    def set_view(self, tile_size, offset):
+        """Move and zoom the board, it's centered if it's smaller than the window.
+
+        :param offset: position of the top left corner of the board in the window
+        """
+        map_shape = self.game_logic.game_map.get_map_shape()
+        offset = list(offset)
+        for i, window_size in enumerate((self.width(), self.height())):
+            board_size = map_shape[i] * tile_size
+            if board_size <= window_size:
+                offset[i] = (window_size - board_size) // 2
+            else:
+                offset[i] = min(0, max(window_size - board_size, round(offset[i])))
+        if tile_size == self.renderer.tile_size and tuple(offset) == self.renderer.offset:
+            return
+        self.renderer.set_view(tile_size, offset)
+        if tile_size != self.board.tile_size:
+            self.set_board(tile_size)
+        self.update()
+
+    def set_board(self, tile_size):
+        """Show the board layer of the tile size, drawing only the tiles changed since shown."""
+        board = self.boards.get(tile_size)
+        if board is None:
+            board = self.boards[tile_size] = BoardLayer(self.renderer, self.game_logic)
+            if len(self.boards) > self.n_boards:
+                self.boards.popitem(last=False)
+        else:
+            self.boards.move_to_end(tile_size)
+            board.update_tiles(self.game_logic, board.stale_tiles)
+            board.stale_tiles.clear()
+        self.board = board
+
+    def zoom(self, steps, pos=None):
+        """Zoom to the next zoom levels, keeping the point of the board under the position.
+
+        :param steps: number of the levels to zoom in, negative to zoom out
+        :param pos: (x, y) position in the window, its center if None
+        """
+        tile_size = self.renderer.tile_size
+        if steps > 0:
+            sizes = [size for size in self.zoom_levels if size > tile_size]
+            new_size = sizes[min(steps, len(sizes)) - 1] if sizes else tile_size
+        else:
+            sizes = [size for size in self.zoom_levels if size < tile_size]
+            new_size = sizes[-min(-steps, len(sizes))] if sizes else tile_size
+        if pos is None:
+            pos = (self.width() // 2, self.height() // 2)
+        scale = new_size / tile_size
+        self.set_view(new_size, [p - (p - o) * scale for p, o in zip(pos, self.renderer.offset)])
+
+    def fit_view(self):
+        """Zoom to the biggest zoom level showing the whole board."""
+        width, height = self.game_logic.game_map.get_map_shape()
+        fitting = [size for size in self.zoom_levels
+                   if size * width <= self.width() and size * height <= self.height()]
+        self.set_view(fitting[-1] if fitting else self.zoom_levels[0], self.renderer.offset)
+
+    def get_overlay_margin(self):
+        return math.ceil(self.renderer.get_pen_width(self.overlay_margin))
+
+    def refresh(self):
+        """Schedule the repaint of the tiles changed since the last frame."""
+        changed, changed_images = self.tracker.update(self.game_logic)
+        if not changed:
+            # Nothing to show, so no frame will be drawn.
+            self.input_times.clear()
+        # Redraw the opened tiles on the game map.
+        self.board.update_tiles(self.game_logic, changed_images)
+        for board in self.boards.values():
+            if board is not self.board:
+                board.stale_tiles.update(changed_images)
+        margin = self.get_overlay_margin()
+        for coords in changed:
+            self.update(self.renderer.get_tile_rect(coords, margin))
+        self.schedule_bot()
 
-    def update(self):
-        # Force the redrawing of the map on state update.
-        self.pixmap = None
+    def schedule_bot(self):
+        """Start the search of the computer player after the frame is drawn."""
+        controller = self.game_logic.get_controller()
+        if (self.bot_search is None and not self.game_logic.is_game_over()
+                and controller is not None):
+            self.bot_search = BotSearch(controller, self.game_logic)
+            # Emitted in the thread of the search, the action is made in the GUI thread.
+            self.bot_search.found.connect(self.apply_bot_action)
+            QTimer.singleShot(0, self.bot_search.start)
 
     def paintEvent(self, e):
         painter = QPainter(self)
-        # Redraw the game map if needed.
-        if self.pixmap is None:
-            self.pixmap = QPixmap(*self.map_shape)
-            self.pixmap.fill(QColor('transparent'))
-            pixmap_painter = QPainter(self.pixmap)
-            self.game_logic.display_map(pixmap_painter)
+        # Only the tiles in the repainted area and around it are drawn,
+        # Qt clips the drawing to the area.
+        tiles = self.renderer.get_tiles_in_rect(e.rect(), self.get_overlay_margin())
         # Draw the game map.
-        painter.drawPixmap(0, 0, self.pixmap)
+        self.board.draw(painter, e.rect())
         # Draw objects on map.
-        self.game_logic.display_objects_on_map(painter)
+        self.renderer.display_objects_on_map(painter, self.game_logic, tiles)
         # Draw possible turns.
-        self.game_logic.display_possible_turns(painter)
+        self.renderer.display_possible_turns(painter, self.game_logic, tiles)
         # Draw the players.
-        self.game_logic.display_players(painter)
+        self.renderer.display_players(painter, self.game_logic, tiles)
+        painter.end()
+        # Measure the latency of the inputs shown in this frame.
+        if self.input_times:
+            frame_time = time.perf_counter()
+            self.latencies.extend(frame_time - t for t in self.input_times)
+            self.input_times.clear()
 
     def keyPressEvent(self, e):
         pressed = e.key()
         if pressed == Qt.Key_Escape:
             self.close()
-        else:
-            self.key_press = pressed
+        elif pressed in self.__key_to_command:
+            self.push_command(*self.__key_to_command[pressed])
 
     def mousePressEvent(self, event):
-        # If field is changed, update the game map image.
-        if self.game_logic.mouse_click((event.x(), event.y())):
-            self.update()
-        self.repaint()
-
-    def timerEvent(self, e):
-        # Move
-        if self.key_press in self.__key_to_direction:
-            # If field is changed, update the game map image.
-            if self.game_logic.move_character(self.__key_to_direction[self.key_press]):
-                self.update()
-        elif self.key_press == Qt.Key_Return:
-            self.game_logic.pick_money()
-        # Next character.
-        elif self.key_press == Qt.Key_Alt:
-            self.game_logic.next_character()
-        # New game.
-        elif self.key_press == Qt.Key_R:
-            self.game_logic = GameLogic(self.num_of_players, tile_size=128)
-            self.update()
-        # If no click, do not refresh.
+        if event.button() == Qt.LeftButton:
+            coords = self.renderer.unscale_coords((event.x(), event.y()))
+            self.push_command('mouse_click', coords)
         else:
+            # The board is dragged with the other buttons.
+            self.drag_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self.drag_pos is None:
             return
-        self.key_press = ''
-        self.repaint()
+        delta = event.pos() - self.drag_pos
+        self.drag_pos = event.pos()
+        offset = self.renderer.offset
+        self.set_view(self.renderer.tile_size, (offset[0] + delta.x(), offset[1] + delta.y()))
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            self.drag_pos = None
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() // 120
+        if steps:
+            self.push_command('zoom', steps, (event.x(), event.y()))
+
+    def resizeEvent(self, event):
+        # Keep the board centered or inside the window.
+        self.set_view(self.renderer.tile_size, self.renderer.offset)
+
+    def push_command(self, name, *args):
+        """Queue the command, it is executed once the pending events are handled."""
+        if name not in self.__app_commands and self.game_logic.get_controller() is not None:
+            # Wait for the computer player.
+            return
+        if not self.commands:
+            QTimer.singleShot(0, self.run_commands)
+        self.commands.append((name, *args))
+        self.input_times.append(time.perf_counter())
+
+    def run_commands(self):
+        while self.commands:
+            name, *args = self.commands.popleft()
+            if name in self.__app_commands:
+                getattr(self, name)(*args)
+            else:
+                getattr(self.game_logic, name)(*args)
+        self.refresh()
+
+    def apply_bot_action(self, action):
+        """Make the action found by the computer player and schedule the next search."""
+        search, self.bot_search = self.bot_search, None
+        if search is None:
+            # The window is closed.
+            return
+        search.wait()
+        # The game could be replaced during the search.
+        if search.target is self.game_logic:
+            self.game_logic.make_action(*action)
+        self.refresh()
+
+    def get_latency_stats(self):
+        """Get the mean, 95th percentile and max input latency in ms."""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return {
+            'mean': 1000 * sum(latencies) / len(latencies),
+            'p95': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            'max': 1000 * latencies[-1],
+        }
+
+    def closeEvent(self, e):
+        stats = self.get_latency_stats()
+        if self.report_latency and stats is not None:
+            print('Input latency: ' + ', '.join(f'{name} {value:.1f} ms'
+                                                for name, value in stats.items()))
+            print(f'Turns cache: {self.game_logic.turns_cache_hits} hits, '
+                  f'{self.game_logic.turns_cache_misses} misses')
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.bot_search is not None:
+            # The found action is not made.
+            self.bot_search, search = None, self.bot_search
+            search.wait()
+        if self.bot is not None:
+            self.bot.close()
+        super().closeEvent(e)
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    ex = App(4, tile_size=128)
-    sys.exit(app.exec_())
+    profiler = None
+    if '--profile' in sys.argv:
+        profiler = Profiler(trace=True)
+        profiler.instrument()
+    bots = int(sys.argv[sys.argv.index('--bots') + 1]) if '--bots' in sys.argv else 0
+    replay_path = sys.argv[sys.argv.index('--replay') + 1] if '--replay' in sys.argv else None
+    ex = App(4, tile_size=128, report_latency='--latency' in sys.argv, bots=bots,
+             replay_path=replay_path)
+    exit_code = app.exec_()
+    if profiler is not None:
+        profiler.uninstrument()
+        print(profiler.format_totals())
+        profile_out = (sys.argv[sys.argv.index('--profile-out') + 1]
+                       if '--profile-out' in sys.argv else 'profiles')
+        profiler.write_json(os.path.join(profile_out, 'profile.json'))
+        profiler.write_chrome_trace(os.path.join(profile_out, 'profile.trace.json'))
+    sys.exit(exit_code)
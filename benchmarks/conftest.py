@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from code import GameLogic
+from code.data import Coords
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    # The benchmarks need the `benchmark` fixture of pytest-benchmark.
+    collect_ignore_glob = ['test_*.py']
+
+
+def play_random_turns(game_logic, n_actions, seed=0):
+    """Make random moves to get the board with some opened tiles."""
+    rng = random.Random(seed)
+    for _ in range(n_actions):
+        pos_turns = game_logic._get_possible_turns()
+        cur_char = game_logic._get_current_character()
+        game_logic.mouse_click(rng.choice(pos_turns) if pos_turns else cur_char.coords)
+    return game_logic
+
+
+@pytest.fixture
+def game_logic():
+    return GameLogic(4, seed=0)
+
+
+@pytest.fixture
+def played_game_logic():
+    return play_random_turns(GameLogic(4, seed=0), 300)
+
+
+@pytest.fixture
+def center():
+    return Coords(6, 6)
+
+
+# Sizes of the square boards of the scaling benchmarks.
+board_sizes = [13, 51, 101]
+
+
+@pytest.fixture(params=board_sizes, ids=lambda size: f'{size}x{size}')
+def board_game_logic(request):
+    """Game on the square board of each of `board_sizes`, with some opened tiles."""
+    return play_random_turns(GameLogic(4, seed=0, map_shape=(request.param, request.param)), 300)
@@ -0,0 +1,151 @@
+"""Benchmarks of the game engine.
+
+Save the baseline and compare the changes with it, see the README:
+```cmd
+python -m pytest benchmarks --benchmark-save=baseline
+python -m pytest benchmarks --benchmark-compare=0001 --benchmark-compare-fail=mean:15%
+```
+"""
+import numpy as np
+import pytest
+
+from code import GameMap
+from code.batch import BatchGame, sample_actions
+from code.behaviour import MoveTables, ChainAnalyzer
+from code.env import JackalEnv
+from code.simulate import play_game
+
+
+def set_tiles(game_logic, tile_type, direction=0):
+    """Open all the land tiles of the map with the given tile type."""
+    game_map = game_logic.game_map
+    for _, tile in game_map.enumerate_tiles():
+        if tile.tile_type != 'water':
+            tile.tile_type = tile_type
+            tile.direction = direction
+            tile.is_open = True
+    game_map.move_tables = MoveTables(game_map)
+
+
+def place_current_character(game_logic, coords, prev_coords):
+    cur_char = game_logic._get_current_character()
+    cur_char.move(prev_coords)
+    cur_char.move(coords)
+    return cur_char
+
+
+def test_map_generation(benchmark):
+    seeds = iter(range(10 ** 9))
+    benchmark(lambda: GameMap(seed=next(seeds)))
+
+
+@pytest.mark.parametrize('size', [13, 51, 101])
+def test_map_generation_scaling(benchmark, size):
+    seeds = iter(range(10 ** 9))
+    benchmark(lambda: GameMap(seed=next(seeds), map_shape=(size, size)))
+
+
+def generate_moves(game_logic):
+    """Get the turns of the current character bypassing the cache of `_get_possible_turns`."""
+    return game_logic._get_turns(game_logic._get_current_player(),
+                                 game_logic._get_current_character())
+
+
+@pytest.mark.parametrize('tile_type', sorted(GameMap.get_all_tiles()))
+def test_move_generation(benchmark, game_logic, center, tile_type):
+    game_map = game_logic.game_map
+    game_map[center].tile_type = tile_type
+    game_map[center].is_open = True
+    game_map.move_tables = MoveTables(game_map)
+    place_current_character(game_logic, center, center + (0, -1))
+    benchmark(generate_moves, game_logic)
+
+
+def test_move_generation_from_ship(benchmark, game_logic):
+    benchmark(generate_moves, game_logic)
+
+
+# Turns to the neighbours and to all the cells of the board.
+@pytest.mark.parametrize('tile_type', ['empty', 'plane'])
+def test_move_generation_scaling(benchmark, board_game_logic, tile_type):
+    game_map = board_game_logic.game_map
+    center = game_map.get_map_shape() // 2
+    game_map[center].tile_type = tile_type
+    game_map[center].is_open = True
+    game_map.move_tables = MoveTables(game_map)
+    place_current_character(board_game_logic, center, center + (0, -1))
+    benchmark(generate_moves, board_game_logic)
+
+
+def test_move_generation_cached(benchmark, game_logic):
+    game_logic._get_possible_turns()
+    benchmark(game_logic._get_possible_turns)
+
+
+# Layouts with the longest chain moves.
+@pytest.mark.parametrize('tile_type, direction', [
+    ('dir_uplr', 0),
+    ('dir_diagonal', 0),
+    ('dir_45_225', 90),
+    ('dir_0_135_270', 0),
+    ('ice_lake', 0),
+])
+def test_detect_cycles(benchmark, game_logic, center, tile_type, direction):
+    set_tiles(game_logic, tile_type, direction)
+    place_current_character(game_logic, center, center + (0, -1))
+
+    def detect_cycles():
+        # Not cached results are measured.
+        game_logic.chain_analyzer = ChainAnalyzer()
+        return game_logic.detect_cycles()
+
+    benchmark(detect_cycles)
+
+
+@pytest.mark.parametrize('tile_type', ['dir_uplr', 'ice_lake'])
+def test_detect_cycles_scaling(benchmark, board_game_logic, tile_type):
+    set_tiles(board_game_logic, tile_type)
+    center = board_game_logic.game_map.get_map_shape() // 2
+    place_current_character(board_game_logic, center, center + (0, -1))
+
+    def detect_cycles():
+        board_game_logic.chain_analyzer = ChainAnalyzer()
+        return board_game_logic.detect_cycles()
+
+    benchmark(detect_cycles)
+
+
+def test_detect_cycles_played(benchmark, played_game_logic):
+    def detect_cycles():
+        played_game_logic.chain_analyzer = ChainAnalyzer()
+        return played_game_logic.detect_cycles()
+
+    benchmark(detect_cycles)
+
+
+@pytest.mark.parametrize('policy', ['random', 'greedy_gold'])
+def test_game_throughput(benchmark, policy):
+    seeds = iter(range(10 ** 9))
+    benchmark.pedantic(lambda: play_game(0, next(seeds), policy=policy, max_turns=300),
+                       rounds=5, iterations=1, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('n_games', [64, 1024])
+def test_batch_step(benchmark, n_games):
+    batch = BatchGame.new(n_games, seed=0)
+    rng = np.random.default_rng(0)
+    benchmark(lambda: batch.step(sample_actions(batch.get_action_mask(), rng)))
+
+
+def test_env_step(benchmark):
+    env = JackalEnv(seed=0)
+    rng = np.random.default_rng(0)
+    _, info = env.reset()
+
+    def step():
+        nonlocal info
+        _, _, terminated, truncated, info = env.step(rng.choice(np.flatnonzero(info['action_mask'])))
+        if terminated or truncated:
+            _, info = env.reset()
+
+    benchmark(step)
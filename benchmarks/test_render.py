@@ -0,0 +1,51 @@
+"""Benchmarks of the offscreen rendering."""
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtCore import Qt
+
+from code.render import GameRenderer
+from code.render.export import render_frame, to_png
+
+
+@pytest.fixture(scope='module')
+def renderer():
+    app = QApplication.instance() or QApplication([])
+    yield GameRenderer(64)
+    del app
+
+
+def render(renderer, game_logic, *display_methods):
+    image = QImage(*renderer.get_map_shape(game_logic.game_map), QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    for display_method in display_methods:
+        display_method(painter, game_logic)
+    painter.end()
+    return image
+
+
+def test_display_map(benchmark, renderer, played_game_logic):
+    benchmark(render, renderer, played_game_logic, renderer.display_map)
+
+
+def test_display_players(benchmark, renderer, played_game_logic):
+    benchmark(render, renderer, played_game_logic, renderer.display_players)
+
+
+def test_display_frame(benchmark, renderer, played_game_logic):
+    benchmark(render, renderer, played_game_logic, renderer.display_frame)
+
+
+def test_display_map_scaling(benchmark, renderer, board_game_logic):
+    benchmark(render, renderer, board_game_logic, renderer.display_map)
+
+
+def test_export_frame(benchmark, renderer, played_game_logic):
+    benchmark(lambda: to_png(render_frame(renderer, played_game_logic)))
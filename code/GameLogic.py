@@ -1,20 +1,44 @@
-from collections import defaultdict
+import functools
 
 from code import GameMap
-from code.data import Coords, Player
-from code.behaviour import start_step, tile_type_to_is_final, get_possible_turns, get_tile_behavior, finish_step
+from code.data import GameState, Player, PositionIndex, objects_on_open, tile_types
+from code.data.state import zobrist_key
+from code.behaviour import start_step, get_possible_turns, finish_step, ChainAnalyzer
+from code.behaviour.ruleRegistry import step_rules
 
-from PyQt5.QtGui import QPainter
+# Zobrist field of the values of the turn, which are not stored in the `GameState`.
+_turn_field = len(GameState.hash_fields)
+
+
+def recorded(action):
+    """Append the calls of the action to the replay log of the game, if any."""
+    @functools.wraps(action)
+    def wrapper(self, *args):
+        result = action(self, *args)
+        if self.recorder is not None:
+            self.recorder.record(self, action.__name__, *args)
+        return result
+    return wrapper
 
 
 class GameLogic:
     """The main logic of the game."""
 
-    def __init__(self, num_of_players: int, tile_size: int = 64):
+    def __init__(self, num_of_players: int, seed=None, use_move_tables=True, map_shape=None,
+                 tiles=None):
+        """
+        :param num_of_players: number of players in the game
+        :param seed: seed of the map generator, random map if None
+        :param use_move_tables: get the turns from the precomputed `MoveTables`
+        :param map_shape: (width, height) of the map, `GameMap.default_map_shape` if None
+        :param tiles: tiles of the map in format {tile_type: amount}, see `GameMap`
+        """
         assert num_of_players >= 1 and num_of_players <= 4
+        self.use_move_tables = use_move_tables
 
         # Init the game map.
-        self.game_map = GameMap(tile_size=tile_size)
+        self.game_map = GameMap(seed=seed, map_shape=map_shape, tiles=tiles)
+        self.game_state = self.game_map.game_state
 
         # Open all tiles. (For Debug)
         # for x in range(0, 13):
@@ -26,17 +50,153 @@ class GameLogic:
         self.move_start_coords = None
         self.moved = False
         self.cycles = None
+        self.chain = None
+        self.chain_analyzer = ChainAnalyzer()
+        self.turn = 0
         self.cur_player = 0
         self.cur_character = 0
         self.players = []
+        self.position_index = PositionIndex()
         colors = Player._get_possible_colors()  # TODO: Shuffle colors?
         for i in range(num_of_players):
             start_coords = self.game_map.get_side_center_coords(side=i)
-            self.players.append(Player(colors[i], start_coords, side=i))
+            self.players.append(Player(colors[i], start_coords, side=i,
+                                       position_index=self.position_index,
+                                       game_state=self.game_state))
+        # Saved values of the fields which are not stored in the `GameState`.
+        self.__undo_stack = []
+        # Replay log of the actions, see `code.replay`.
+        self.recorder = None
+        # Policies choosing the actions of the computer players in format {color: policy},
+        # see `code.simulate` for the policy interface.
+        self.controllers = {}
+        self.__init_turns_cache()
+
+    def __init_turns_cache(self):
+        # Possible turns of the current character in format (key, turns).
+        self.__turns_cache = None
+        self.turns_cache_hits = 0
+        self.turns_cache_misses = 0
+
+    def __get_fields(self):
+        cycles = dict(self.cycles) if self.cycles is not None else None
+        return (self.move_start_coords, self.moved, cycles, self.chain, self.turn,
+                self.cur_player, self.cur_character)
+
+    def __set_fields(self, fields):
+        (self.move_start_coords, self.moved, self.cycles, self.chain, self.turn,
+         self.cur_player, self.cur_character) = fields
+
+    def _sync_with_state(self):
+        """Update the players and position index after the state is changed directly."""
+        self.position_index.clear()
+        for player in self.players:
+            player.sync_characters()
+
+    def snapshot(self):
+        """Remember the current position of the game. Takes O(1)."""
+        self.game_state.snapshot()
+        self.__undo_stack.append(self.__get_fields())
+
+    def restore(self):
+        """Return to the last remembered position of the game."""
+        self.game_state.restore()
+        self.__set_fields(self.__undo_stack.pop())
+        self._sync_with_state()
+
+    def discard(self):
+        """Forget the last remembered position, keeping the current one."""
+        self.game_state.discard()
+        self.__undo_stack.pop()
+
+    @classmethod
+    def from_state(cls, game_state, players, move_tables=None, use_move_tables=True):
+        """Create the game at the start of the turn from the state.
+
+        :param game_state: `GameState` with the map and the players
+        :param players: list of (color, side) of the players in the state
+        :param move_tables: tables of the same map, taken from the cache if None
+        """
+        game_logic = cls.__new__(cls)
+        game_logic.use_move_tables = use_move_tables
+        game_logic.game_state = game_state
+        game_logic.game_map = GameMap.from_state(game_state, move_tables)
+        game_logic.num_of_players = len(players)
+        game_logic.chain_analyzer = ChainAnalyzer()
+        game_logic.position_index = PositionIndex()
+        game_logic.players = [
+            Player.from_state(color, side, game_state, row, game_logic.position_index)
+            for row, (color, side) in enumerate(players)
+        ]
+        game_logic.__set_fields((None, False, None, None, 0, 0, 0))
+        game_logic.__undo_stack = []
+        game_logic.recorder = None
+        game_logic.controllers = {}
+        game_logic.__init_turns_cache()
+        return game_logic
+
+    def copy(self):
+        """Copy the game, the copy shares no state with the original.
+
+        Takes O(board), the map and the players are not recreated.
+        """
+        game_logic = GameLogic.from_state(self.game_state.copy(),
+                                          [(pl.color, pl.side) for pl in self.players],
+                                          self.game_map.move_tables, self.use_move_tables)
+        game_logic.chain_analyzer = self.chain_analyzer
+        game_logic.controllers = dict(self.controllers)
+        game_logic.__set_fields(self.__get_fields())
+        return game_logic
+
+    def __reduce__(self):
+        # Games are sent between processes in the compact binary format.
+        from code.serialization import encode, decode
+        return decode, (encode(self),)
+
+    @recorded
+    def mouse_click(self, coords):
+        """Move the current character to the clicked tile.
+
+        :param coords: map coords of the clicked tile
+        :return: True if some field is opened, False otherwise
+        """
+        return self._move_character(coords)
 
-    def mouse_click(self, pos):
-        mouse_coords = self.game_map.unscale_coords(pos)
-        return self._move_character(mouse_coords)
+    def make_action(self, action, coords=None):
+        """Make the action chosen by the policy.
+
+        :param action: one of ('move', 'pick_money', 'next_character')
+        :param coords: coords to move to for the 'move' action
+        """
+        if action == 'move':
+            return self.mouse_click(coords)
+        if action == 'pick_money':
+            return self.pick_money()
+        if action == 'next_character':
+            return self.next_character()
+        raise ValueError(f'Unknown action: {action}')
+
+    def get_hash(self):
+        """Get the 64-bit Zobrist hash of the position.
+
+        Positions reached by different move orders have the same hash.
+        The turn number is not hashed, so positions repeated in later
+        turns have the same hash too.
+        """
+        state = self.game_state
+        h = (state.hash ^ zobrist_key(_turn_field, 0, self.cur_player) ^
+             zobrist_key(_turn_field, 1, self.cur_character) ^
+             zobrist_key(_turn_field, 2, self.moved))
+        if self.move_start_coords is not None:
+            h ^= zobrist_key(_turn_field, 3, state.to_cell(self.move_start_coords))
+        if self.cycles:
+            for coords in self.cycles:
+                h ^= zobrist_key(_turn_field, 4, state.to_cell(coords))
+        return h
+
+    def get_controller(self):
+        """Get the policy of the current player, None if the player is a human."""
+        return self.controllers.get(self._get_current_player().color)
 
     def _get_current_player(self):
         return self.players[self.cur_player]
@@ -70,7 +230,7 @@ class GameLogic:
         # As this code executed only on user input.
         # Remove character if no possible turns from this point.
         if len(pos_turns) == 0 and cur_char.object != 'money':
-            cur_player.characters.remove(cur_char)
+            cur_player.remove_character(cur_char)
             self.next_player()
             return False
 
@@ -79,21 +239,20 @@ class GameLogic:
             finish_step(self.game_map, cur_player, cur_char, coords)
             self._get_current_character().move(coords)
             is_finalized = start_step(self.game_map, self.players, cur_player, cur_char)
-            # If first move and not finalized perform check for the cycle.
-            if not is_finalized and not self.moved:
-                cycle_starts = self.detect_cycles()
-                self.cycles = {cs: False for cs in cycle_starts}
-                self.move_start_coords = prev_coords
+            # If the turn continues, check if the character is trapped in a cycle.
+            if not is_finalized:
+                if not self.moved:
+                    self.move_start_coords = prev_coords
+                    self.cycles = {}
+                if self._is_trapped(cur_player, cur_char):
+                    # If stepped two times on the trapped tile, character can't leave the cycle.
+                    # Terminate the character and move to the next player.
+                    if coords in self.cycles:
+                        cur_player.remove_character(cur_char)
+                        is_finalized = True
+                    else:
+                        self.cycles[coords] = True
             self.moved = True
-            # If on the cycle starter, increase the counter.
-            if self.cycles and coords in self.cycles:
-                # If stepped two times, it means that you returned back to the cycle start.
-                # Terminate the character and move to the next player.
-                if self.cycles[coords]:
-                    cur_player.characters.remove(cur_char)
-                    is_finalized = True
-                else:
-                    self.cycles[coords] = True
             # if turn end, switch to next player.
             if is_finalized:
                 self.next_player()
@@ -103,67 +262,31 @@ class GameLogic:
                 return True
         return False
 
-    def detect_cycles(self):
-
-        def _return_leaves(tree):
-            """Return leaves of given tree.
-            """
-            res = set()
-            if isinstance(tree, Coords):
-                res.add(tree)
-            else:
-                for nodes in tree.values():
-                    for node in nodes:
-                        res.update(_return_leaves(node))
-            return res
-
-        def _detect_cycles(tree):
-            """Detect path cycles and return the start of them.
-            """
-            n_cycles, cycles = 0, []
-            if isinstance(tree, Coords):
-                return cycles
-            for coord, nodes in tree.items():
-                for node in nodes:
-                    leaves = _return_leaves(node)
-                    # If can only return to this coord, it's a loop.
-                    if coord in leaves and len(leaves) == 1:
-                        n_cycles += 1
-                    else:
-                        cycles.extend(_detect_cycles(node))
-                # If number of loops is equal to number of subtrees, this node is a start of the loop.
-                if nodes and n_cycles == len(nodes):
-                    cycles = [coord]
-            return cycles
-
-        path_tree, _ = self.get_path_tree()
-        return _detect_cycles(path_tree)
-
-    def get_path_tree(self, been_in=None):
-        been_in = been_in or set()
+    def _is_trapped(self, cur_player, cur_char):
+        """Check if the chain move can't be finished from the current character position.
+        """
+        node = ChainAnalyzer.get_node(self.game_map, cur_char.coords, cur_char.prev_coords)
+        is_trapped = self.chain.is_trapped(node) if self.chain is not None else None
+        # Analyze once per chain, unless the character left the analyzed nodes.
+        if is_trapped is None:
+            self.chain = self.chain_analyzer.analyze(self, cur_player, cur_char)
+            is_trapped = self.chain.is_trapped(node)
+        return is_trapped
+
+    def analyze_chain(self):
+        """Analyze the chain move of the current character.
+
+        :return: `ChainAnalysis` with the reachable resting cells and trapped cycles
+        """
         cur_char = self._get_current_character()
-        # Save state.
-        init_coord, init_prev = cur_char.coords, cur_char.prev_coords
-        paths = defaultdict(list)
-        # Get list of possible turns.
-        for coord in self._get_possible_turns():
-            # If not visited this tile yet, continue.
-            if coord not in been_in:
-                # If turn is not finalized in this tile, continue
-                if not tile_type_to_is_final[self.game_map[coord].tile_type]:
-                    been_in.add(coord)
-                    cur_char.move(coord)
-                    sub_paths, been_in = self.get_path_tree(been_in)
-                    # If no sub-paths, set coord as sub-path.
-                    if not sub_paths:
-                        sub_paths = coord
-                    paths[init_coord].append(sub_paths)
-                else:
-                    paths[init_coord].append(coord)
-        # Restore state.
-        cur_char.coords, cur_char.prev_coords = init_coord, init_prev
-        return paths, been_in
+        return self.chain_analyzer.analyze(self, self._get_current_player(), cur_char)
 
+    def detect_cycles(self):
+        """Get the cells of the cycles which the current character can't leave.
+        """
+        return self.analyze_chain().trapped_cells
+
+    @recorded
     def move_character(self, direction):
         """Move the current character ingiven direction.
 
@@ -181,6 +304,7 @@ class GameLogic:
             coords += (0, 1)
         return self._move_character(coords)
 
+    @recorded
     def pick_money(self):
         cur_char = self._get_current_character()
         cur_tile = self.game_map[cur_char.coords]
@@ -199,45 +323,69 @@ class GameLogic:
 
     def _get_possible_turns(self):
         """Get possible turns for current character.
+
+        Turns are cached until the state is changed or the other character
+        becomes the current one, so the returned list must not be changed.
         """
         # Getting character can change the current player.
         cur_char = self._get_current_character()
-        cur_player = self._get_current_player()
+        # Every change of the state changes its revision, including the rollbacks.
+        key = (self.game_state.revision, self.cur_player, self.cur_character)
+        if self.__turns_cache is not None and self.__turns_cache[0] == key:
+            self.turns_cache_hits += 1
+            return self.__turns_cache[1]
+        self.turns_cache_misses += 1
+        pos_turns = self._get_turns(self._get_current_player(), cur_char)
+        self.__turns_cache = key, pos_turns
+        return pos_turns
 
-        # Get possible turns.
+    def _get_turns(self, cur_player, cur_char):
+        """Get possible turns for the given character.
+        """
         args = self.game_map, self.players, cur_player, cur_char
-        pos_turns = get_possible_turns(*args)
+        if self.use_move_tables:
+            pos_turns = self.game_map.move_tables.get_possible_turns(*args)
+        else:
+            pos_turns = get_possible_turns(*args)
         # Accept turn only if you can step on this tile right now.
-        def can_step(coord): return get_tile_behavior(self.game_map[coord].tile_type)(*args, coord)
+        tile_type, width = self.game_state.tile_type, self.game_state.width
+        def can_step(coord): return step_rules[tile_type[coord[1] * width + coord[0]]](*args, coord)
         pos_turns = [coord for coord in pos_turns if can_step(coord)]
         return pos_turns
 
-    def display_map(self, painter: QPainter):
-        return self.game_map.display_map(painter)
-
-    def get_map_shape(self):
-        return self.game_map.scale_coords(self.game_map.get_map_shape())
-
-    def display_objects_on_map(self, painter: QPainter):
-        return self.game_map.display_objects_on_map(painter)
-
-    def display_players(self, painter: QPainter):
-        return self.game_map.display_players(painter, self.players, self._get_current_character())
-
-    def display_possible_turns(self, painter: QPainter):
-        pos_turns = self._get_possible_turns()
-        return self.game_map.display_possible_turns(painter, pos_turns)
+    def get_gold_left(self):
+        """Get the amount of gold that is not yet brought to the ships.
+        """
+        state = self.game_state
+        hidden_gold = [objects_on_open[tile_type].get('money', 0) for tile_type in tile_types]
+        gold = sum(state.gold)
+        for tile_type, is_open in zip(state.tile_type, state.is_open):
+            if not is_open:
+                gold += hidden_gold[tile_type]
+        for player in self.players:
+            for character in player.characters:
+                gold += character.object == 'money'
+        return gold
+
+    def is_game_over(self):
+        """The game is over if all gold is gone or no character can move anymore.
+        """
+        can_move = any(ch.state != 'trapped' for pl in self.players for ch in pl.characters)
+        return not can_move or self.get_gold_left() == 0
 
     def next_player(self):
         self.moved = False
         self.move_start_coords = None
         self.cycles = None
+        self.chain = None
+        self.turn += 1
         self.cur_player = (self.cur_player + 1) % self.num_of_players
         cur_player = self._get_current_player()
         # Perform `start_step` for each character.
         for cur_char in cur_player.characters:
             start_step(self.game_map, self.players, cur_player, cur_char)
 
+    @recorded
     def next_character(self):
         # Can move only if not yet moved.
         if not self.moved:
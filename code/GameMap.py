@@ -1,41 +1,23 @@
-import os
 import random
-from typing import List, Tuple
-import numpy as np
 
-from code.data import Player, Character, map_players_to_positions, Coords, Tile
-
-from PyQt5.QtGui import QPainter, QBrush, QPen, QColor, QImage
-from PyQt5.QtCore import Qt, QRect
-
-
-# @staticmethod
-def color_to_rgb(game_color):
-    return {
-        'red': (238, 29, 35, 170),
-        'white': (255, 255, 255, 170),
-        'black': (35, 31, 32, 170),
-        'yellow': (255, 221, 23, 170),
-        'green': (127, 255, 0, 170),
-    }[game_color]
+from code.data import Coords, Tile, GameState, get_tile_type_id
+from code.behaviour import MoveTables, get_move_tables
 
 
 class GameMap:
-    # Shape of the game map
-    @staticmethod
-    def get_map_shape():
-        return Coords(13, 13)
+    # Shape of the standard game map
+    default_map_shape = Coords(13, 13)
 
-    @staticmethod
-    def is_in_bounds(coord: Coords) -> bool:
-        for ax_val in coord:
-            if ax_val < 0 or ax_val > 12:
-                return False
-        return True
+    def get_map_shape(self):
+        return Coords(self.game_state.width, self.game_state.height)
+
+    def is_in_bounds(self, coord: Coords) -> bool:
+        x, y = coord
+        return 0 <= x < self.game_state.width and 0 <= y < self.game_state.height
 
     # All game tiles in format {tile_type}:{amount}
     @staticmethod
-    def __get_all_tiles():
+    def get_all_tiles():
         return {
             'empty': 40,
             'dir_straight': 3,
@@ -67,55 +49,157 @@ class GameMap:
             'money_5': 1,
         }
 
-    def __init__(self, tile_size):
-        self.tile_size = tile_size
+    @staticmethod
+    def get_scaled_tiles(map_shape):
+        """Get the tiles of `get_all_tiles` scaled to the land of the map shape.
+
+        Amounts are scaled proportionally and rounded down, the rest of the land is empty.
+        The standard map gets the tiles of `get_all_tiles`.
+
+        :return: dict in format {tile_type: amount}
+        """
+        n_land = len(GameMap.get_land_cells(map_shape))
+        all_tiles = GameMap.get_all_tiles()
+        n_tiles = sum(all_tiles.values())
+        tiles = {tile_type: amount * n_land // n_tiles for tile_type, amount in all_tiles.items()}
+        tiles['empty'] += n_land - sum(tiles.values())
+        return tiles
+
+    def __init__(self, seed=None, game_state: GameState = None, map_shape=None, tiles=None):
+        """
+        :param seed: seed of the map generator, `random.Random` or
+            `numpy.random.Generator` to draw the map from, random map if None
+        :param game_state: state to store the map in, new one if None
+        :param map_shape: (width, height) of the map, the shape of the state or
+            `default_map_shape` if None
+        :param tiles: tiles of the map in format {tile_type: amount}, one per land cell,
+            `get_scaled_tiles` of the shape if None
+        """
+        self.rng = seed if isinstance(seed, random.Random) or hasattr(seed, 'permutation') \
+            else random.Random(seed)
+        if game_state is None:
+            game_state = GameState(map_shape or self.default_map_shape)
+        elif map_shape is not None:
+            assert tuple(map_shape) == (game_state.width, game_state.height), \
+                'The shape of the map must be the shape of the state!'
+        self.game_state = game_state
+        if tiles is None:
+            tiles = self.get_scaled_tiles(self.get_map_shape())
+        # Tiles the map was drawn from, None if unknown.
+        self.tiles = tiles
         self.game_map = self.__create_map()
-        self.tile_images = self.load_tile_images('tile_images', self.tile_size)
+        self.move_tables = MoveTables(self)
+
+    @classmethod
+    def from_state(cls, game_state: GameState, move_tables: MoveTables = None):
+        """Create the view of the map already stored in the state.
+
+        :param move_tables: tables of the same map, taken from the cache if None
+        """
+        game_map = cls.__new__(cls)
+        game_map.rng = random.Random()
+        game_map.game_state = game_state
+        game_map.tiles = None
+        game_map.game_map = game_map.__create_views()
+        if move_tables is None:
+            move_tables = get_move_tables(game_map)
+        game_map.move_tables = move_tables
+        return game_map
+
+    @classmethod
+    def generate_batch(cls, n_maps, seed=None, map_shape=None, tiles=None):
+        """Generate maps from one random stream, the same for the same seed.
+
+        :param seed: seed, `random.Random` or `numpy.random.Generator`
+        :param map_shape: shape of the maps, see `GameMap`
+        :param tiles: tiles of the maps, see `GameMap`
+        :return: list of `GameMap`
+        """
+        rng = seed if isinstance(seed, random.Random) or hasattr(seed, 'permutation') \
+            else random.Random(seed)
+        return [cls(seed=rng, map_shape=map_shape, tiles=tiles) for _ in range(n_maps)]
+
+    @staticmethod
+    def get_land_cells(map_shape):
+        """Get the cells of the map shape which are not in water, built once per shape."""
+        map_shape = tuple(map_shape)
+        if map_shape not in GameMap.__land_cells:
+            width, height = map_shape
+            GameMap.__land_cells[map_shape] = [
+                y * width + x for y in range(height) for x in range(width)
+                if not GameMap.__is_in_water((x, y), map_shape)]
+        return GameMap.__land_cells[map_shape]
+
+    __land_cells = {}
 
     @staticmethod
-    def load_tile_images(path, tile_size):
-        """Load tile images from the given path and scale to the tile_size.
+    def get_tile_bag(map_shape=None, tiles=None):
+        """Get the land cells and the ids of all the land tiles, one id per tile.
+
+        Both are built once per shape and tiles, the tiles are in the order of `tiles`.
+
+        :param map_shape: shape of the map, `default_map_shape` if None
+        :param tiles: tiles in format {tile_type: amount}, `get_scaled_tiles` if None
         """
-        tile_images = {}
-        tile_types = set(GameMap.__get_all_tiles())
-        tile_types.update(['back', 'boat_black', 'boat_red',
-                           'boat_white', 'boat_yellow'])
-        for tile_type in tile_types:
-            tile_image = QImage(os.path.join(path, f'{tile_type}.png'))
-            tile_image = tile_image.scaled(tile_size, tile_size)
-            tile_images[tile_type] = tile_image
-        return tile_images
+        map_shape = tuple(map_shape or GameMap.default_map_shape)
+        if tiles is None:
+            tiles = GameMap.get_scaled_tiles(map_shape)
+        key = (map_shape, tuple(tiles.items()))
+        if key not in GameMap.__tile_bags:
+            land_cells = GameMap.get_land_cells(map_shape)
+            tile_ids = [get_tile_type_id(tile_type)
+                        for tile_type, amount in tiles.items()
+                        for _ in range(amount)]
+            assert len(tile_ids) == len(land_cells), \
+                'All tiles must be used during the map creation!'
+            GameMap.__tile_bags[key] = land_cells, tile_ids
+        return GameMap.__tile_bags[key]
+
+    __tile_bags = {}
 
     @staticmethod
-    def __is_in_water(coords):
-        """Check if this coordinates are in water."""
+    def generate_tiles(rng, map_shape=None, tiles=None):
+        """Draw the tile types and directions of a random map.
+
+        :param rng: `random.Random` or `numpy.random.Generator`
+        :param map_shape: shape of the map, `default_map_shape` if None
+        :param tiles: tiles in format {tile_type: amount}, `get_scaled_tiles` if None
+        :return: tuple of (tile type ids, direction ids) lists for each cell
+        """
+        map_shape = map_shape or GameMap.default_map_shape
+        n_cells = map_shape[0] * map_shape[1]
+        land_cells, tile_ids = GameMap.get_tile_bag(map_shape, tiles)
+        n_dirs = len(Tile.get_tile_dirs())
+        if isinstance(rng, random.Random):
+            tile_ids = tile_ids[:]
+            rng.shuffle(tile_ids)
+            directions = rng.choices(range(n_dirs), k=n_cells)
+        else:
+            tile_ids = [tile_ids[i] for i in rng.permutation(len(tile_ids)).tolist()]
+            directions = rng.integers(0, n_dirs, size=n_cells).tolist()
+        tile_types = [get_tile_type_id('water')] * n_cells
+        for cell, tile_id in zip(land_cells, tile_ids):
+            tile_types[cell] = tile_id
+        return tile_types, directions
+
+    @staticmethod
+    def __is_in_water(coords, map_shape):
+        """Check if this coordinates are in water, the border and the corners of the land."""
         x, y = coords
+        width, height = map_shape
         return (
             x == 0 or y == 0 or
-            x == 12 or y == 12 or
-            (x == 1 and y == 1) or
-            (x == 11 and y == 11) or
-            (x == 1 and y == 11) or
-            (x == 11 and y == 1)
+            x == width - 1 or y == height - 1 or
+            (x in (1, width - 2) and y in (1, height - 2))
         )
 
-    @staticmethod
-    def __prob_dist(tiles):
-        """Get the probability distribution of tiles."""
-        dist = []
-        total = sum(tiles.values())
-        for num in tiles.values():
-            dist.append(num / total)
-        return dist
-
-    @staticmethod
-    def get_side_center_coords(side):
+    def get_side_center_coords(self, side):
         """Get the starting coordinates for a given side.
         :param side: {0: <-, 1: ↑, 2: ->, 3: ↓}
         :return: tuple of coordinates (x, y)
         """
-        map_shape = GameMap.get_map_shape()
-        axis_centers = list(map(lambda x: int(np.floor(x / 2.0)), map_shape))
+        map_shape = self.get_map_shape()
+        axis_centers = [ax_size // 2 for ax_size in map_shape]
         return {
             0: Coords(0, axis_centers[1]),
             1: Coords(axis_centers[0], map_shape[1] - 1),
@@ -130,158 +214,36 @@ class GameMap:
         else:
             return self.game_map[idx]
 
-    def __create_map(self):
-        """Create a random game map.
+    def enumerate_tiles(self):
+        """Iterate over all tiles of the map.
 
-        :return: numpy array with Tile values."""
-        map_shape = GameMap.get_map_shape()
-        game_map = np.empty(map_shape, dtype=Tile)
-        tiles = GameMap.__get_all_tiles()
-        for x in range(map_shape[0]):
-            for y in range(map_shape[1]):
-                # Check if this is a water tile1
-                if self.__is_in_water((x, y)):
-                    tile_type = 'water'
-                else:
-                    tile_type = np.random.choice(
-                        list(tiles), 1, p=self.__prob_dist(tiles))[0]
-                    tiles[tile_type] -= 1
-
-                    # If no tiles of this type left, delete them
-                    if not tiles[tile_type]:
-                        del tiles[tile_type]
-
-                # Set random direction
-                tile_dir = random.sample(Tile.get_tile_dirs(), 1)[0]
-                game_map[x][y] = Tile(tile_type, tile_dir)
-                if tile_type == 'water':
-                    game_map[x][y].is_open = True
-
-        assert len(tiles) == 0, \
-            'All tiles must be used during the map creation!'
-        return game_map
+        :return: generator of (Coords, Tile) pairs
+        """
+        for x, column in enumerate(self.game_map):
+            for y, tile in enumerate(column):
+                yield Coords(x, y), tile
 
-    def get_tile_pixel_inds(self, coords):
-        x, y = coords
-        return (slice(*self.scale_coords(Coords(x, x + 1))),
-                slice(*self.scale_coords(Coords(y, y + 1))))
+    def __create_views(self):
+        """Create views of the tiles stored in the state.
+
+        :return: list of columns with Tile values."""
+        width, height = self.game_state.width, self.game_state.height
+        return [[Tile(self.game_state, y * width + x) for y in range(height)]
+                for x in range(width)]
 
-    def scale_coords(self, coords):
-        if not isinstance(coords, Coords):
-            coords = Coords(*coords)
-        return coords * self.tile_size
+    def __create_map(self):
+        """Create a random game map.
 
-    def unscale_coords(self, coords: Coords):
-        if not isinstance(coords, Coords):
-            coords = Coords(*coords)
-        return coords // self.tile_size
+        All the tiles are shuffled once, so the map takes O(number of tiles).
+
+        :return: list of columns with Tile values."""
+        tile_types, directions = self.generate_tiles(self.rng, self.get_map_shape(), self.tiles)
+        water_id = get_tile_type_id('water')
+        self.game_state.load_tiles(
+            tile_type=tile_types,
+            direction=directions,
+            is_open=[tile_type == water_id for tile_type in tile_types],
+            active=[1] * len(tile_types),
+        )
+        return self.__create_views()
 
-    def get_object_color(self, object_name):
-        return {
-            'money': QColor(32, 107, 40)
-        }[object_name]
-
-    def display_map(self, painter: QPainter):
-        for coord, tile in np.ndenumerate(self.game_map):
-            coord = Coords(*coord)
-            # TODO: Add 'water' tile image.
-            if tile.tile_type == 'water':
-                continue
-            if tile.is_open:
-                tile_img = self.tile_images[tile.tile_type]
-            else:
-                tile_img = self.tile_images['back']
-            # Move to the center of tile, rotate, move back
-            painter.translate(*self.scale_coords(coord + (0.5, 0.5)))
-            painter.rotate(tile.direction)
-            painter.drawImage(*self.scale_coords((-0.5, -0.5)), tile_img)
-            painter.resetTransform()
-
-    def display_objects_on_map(self, painter: QPainter):
-        for coord, tile in np.ndenumerate(self.game_map):
-            coord = Coords(*coord)
-            # Display objects
-            objects = self[coord].objects
-            self.display_objects(painter, coord, objects)
-
-    def display_objects(self, painter: QPainter, coord: Coords, objects):
-        painter.save()
-        for i, (obj_name, obj_counter) in enumerate(objects.items()):
-            # If no objects left, skip.
-            if obj_counter < 1:
-                continue
-            ellipse_size = self.tile_size / max(3, len(objects))
-            rect_pos = self.scale_coords(coord) + (i * ellipse_size, 0)
-            rect = QRect(*rect_pos, ellipse_size, ellipse_size)
-            # Draw ellipse
-            painter.setBrush(QBrush(self.get_object_color(obj_name), Qt.SolidPattern))
-            painter.drawEllipse(rect)
-            # Draw the amount
-            painter.setPen(QPen(QColor('black'), 3))
-            text = str(obj_counter)
-            text_br = painter.boundingRect(rect, Qt.AlignCenter, text)
-            painter.drawText(text_br, 1, text)
-        painter.restore()
-
-    def display_players(self, painter: QPainter,
-                        players: List[Player], cur_character: Character):
-
-        def get_character_color(color):
-            if character.ch_type == 'pirate':
-                return QColor(*color_to_rgb(color))
-            else:
-                raise NotImplemented('The color for non pirate characters is not yet defined.')
-
-        # Display each player's ship.
-        for player in players:
-            pl_boat = QImage(os.path.join('tile_images', f'boat_{player.color}.png'))
-            pl_boat = pl_boat.scaled(self.tile_size, self.tile_size)
-            painter.drawImage(*self.scale_coords(player.ship_coords), pl_boat)
-            # Display objects on ship.
-            self.display_objects(painter, player.ship_coords, player.objects)
-
-        # Extract positions.
-        positions = map_players_to_positions(players)
-        # Display the characters at each position.
-        for pos, characters in positions.items():
-            for i, (character, ch_color) in enumerate(characters):
-                ellipse_size = self.tile_size / len(characters)
-                painter.save()
-                painter.setBrush(QBrush(get_character_color(ch_color), Qt.SolidPattern))
-                rect_pos = self.scale_coords(pos) + i * ellipse_size
-                rect = QRect(*rect_pos, ellipse_size, ellipse_size)
-                painter.drawEllipse(rect)
-                # Display red circle if character is drunk/trapped.
-                if character.state in ['drunk', 'hangover', 'trapped']:
-                    painter.setBrush(Qt.NoBrush)
-                    color = 'red' if character.state in ['drunk', 'trapped'] else 'orange'
-                    painter.setPen(QPen(QColor(color), 15))
-                    painter.drawEllipse(rect)
-                # Display counter if character is on spinning tile.
-                elif 'spinning' in self[pos].tile_type:
-                    painter.setPen(QPen(QColor('black'), 3))
-                    text = str(character.spin_counter)
-                    text_br = painter.boundingRect(rect, Qt.AlignCenter, text)
-                    painter.drawText(text_br, 1, text)
-                # Display the object if character is holding one.
-                if character.object is not None:
-                    painter.setPen(Qt.NoPen)
-                    obj_pos = rect_pos + 1 / 3 * ellipse_size
-                    obj_rect = QRect(*obj_pos, ellipse_size / 3, ellipse_size / 3)
-                    painter.setBrush(QBrush(self.get_object_color(character.object), Qt.SolidPattern))
-                    painter.drawEllipse(obj_rect)
-                # Display the glow outside the current player.
-                if character is cur_character:
-                    painter.setBrush(Qt.NoBrush)
-                    painter.setPen(QPen(QColor(*color_to_rgb('green')), 5))
-                    painter.drawEllipse(rect)
-                painter.restore()
-
-    def display_possible_turns(self, painter: QPainter, poss_turns: List[Coords]):
-        for coord in poss_turns:
-            painter.save()
-            painter.setBrush(Qt.NoBrush)
-            painter.setPen(QPen(QColor(*color_to_rgb('green')), 5))
-            rect_size = self.tile_size
-            painter.drawRect(*(self.scale_coords(coord)), rect_size, rect_size)
-            painter.restore()
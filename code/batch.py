@@ -0,0 +1,893 @@
+"""Engine playing many games in lockstep with NumPy.
+
+The games are stored as stacked arrays, the legal moves of all of them are
+computed at once and every call of `BatchGame.step` makes one action in
+each game. The rules are the batched equivalents of the `code.behaviour`
+ones, `verify` plays random games in both engines and compares them.
+
+Usage example, compare the engines and measure the speed:
+```cmd
+python -m code.batch --verify -n 64 --actions 1000
+python -m code.batch -n 1024 --actions 500
+```
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from code import GameLogic
+from code.behaviour import canStep, endStep, moveTables, startStep
+from code.behaviour.ruleRegistry import tile_rules, get_rules_generation
+from code.data import Coords, GameState, Character, tile_types, get_tile_type_id
+
+ALIVE, DRUNK, HANGOVER, TRAPPED = (Character.possible_states().index(state)
+                                   for state in ('alive', 'drunk', 'hangover', 'trapped'))
+
+# Kinds of the turns of the tiles, the static ones are taken from the `ShapeTables`.
+TURNS_STATIC, TURNS_WATER, TURNS_BALOON, TURNS_PLANE, TURNS_CROCODILE, TURNS_ICE_LAKE, \
+    TURNS_SPINNING, TURNS_IF_ALIVE = range(8)
+_turn_kinds = {
+    moveTables.water: TURNS_WATER,
+    moveTables.baloon: TURNS_BALOON,
+    moveTables.plane: TURNS_PLANE,
+    moveTables.crocodile: TURNS_CROCODILE,
+    moveTables.ice_lake: TURNS_ICE_LAKE,
+    moveTables.spinning: TURNS_SPINNING,
+    moveTables.drinking_rum: TURNS_IF_ALIVE,
+}
+
+# Kinds of `canStep` rules of the tiles.
+STEP_DEFAULT, STEP_WATER, STEP_FORT = range(3)
+_step_kinds = {
+    canStep.default_behavior: STEP_DEFAULT,
+    canStep.water: STEP_WATER,
+    canStep.fort: STEP_FORT,
+}
+
+# Kinds of `startStep` rules of the tiles.
+START_DEFAULT, START_SPINNING, START_RUM, START_OGRE, START_ABORIGINE, START_TRAP, \
+    START_WATER = range(7)
+_start_kinds = {
+    startStep.default_start: START_DEFAULT,
+    startStep.spinning: START_SPINNING,
+    startStep.drinking_rum: START_RUM,
+    startStep.ogre: START_OGRE,
+    startStep.aborigine: START_ABORIGINE,
+    startStep.trap: START_TRAP,
+    startStep.water: START_WATER,
+}
+
+# Kinds of `endStep` rules of the tiles.
+FINISH_DEFAULT, FINISH_SPINNING, FINISH_PLANE, FINISH_WATER = range(4)
+_finish_kinds = {
+    endStep.default_end: FINISH_DEFAULT,
+    endStep.spinning: FINISH_SPINNING,
+    endStep.plane: FINISH_PLANE,
+    endStep.water: FINISH_WATER,
+}
+
+# Offsets of the ship moves by the side of the player, see `direction_offset`.
+_forward = np.array([(1, 0), (0, -1), (-1, 0), (0, 1)])
+_left = _forward[:, ::-1]
+_right = -_left
+
+
+class RuleTables:
+    """Rules of the tile types as arrays indexed by the tile type id."""
+
+    # Max number of the static turns of a tile.
+    max_turns = 8
+
+    def __init__(self, map_shape):
+        tables = moveTables.get_shape_tables(map_shape)
+        self.width, self.height = map_shape
+        self.n_cells = n_cells = tables.n_cells
+        self.n_types = len(tile_types)
+        self.water = get_tile_type_id('water')
+
+        def kinds(name, kind_by_rule):
+            """Get the kinds of the rules, the rules registered by plugins are not batched."""
+            res = []
+            for rules in tile_rules:
+                rule = getattr(rules, name)
+                if rule not in kind_by_rule:
+                    raise ValueError(f'Rule {rule.__name__} of the tile type {rules.tile_type} '
+                                     'is not supported by the batch engine.')
+                res.append(kind_by_rule[rule])
+            return np.array(res, np.int8)
+
+        # Tiles without the dynamic mask have the static turns.
+        self.turn_kind = kinds('dynamic_mask', {None: TURNS_STATIC, **_turn_kinds})
+        self.step_kind = kinds('can_step', _step_kinds)
+        self.start_kind = kinds('start', _start_kinds)
+        self.finish_kind = kinds('finish', _finish_kinds)
+        self.is_final = np.array([rules.is_final for rules in tile_rules])
+        self.prev_dependent = np.array([rules.prev_dependent for rules in tile_rules])
+        self.max_spin = np.array([rules.max_spin for rules in tile_rules], np.int8)
+        self.hidden_money = np.array([rules.objects.get('money', 0) for rules in tile_rules],
+                                     np.int32)
+        # Tiles from which the character can step into the water, same as in `canStep.water`.
+        self.water_source = np.array([
+            'dir' in tile_type or tile_type in ['water', 'cannon', 'horses', 'ice_lake', 'plane']
+            for tile_type in tile_types
+        ])
+
+        # Static turns in format [row, direction, cell, turn], -1 for no turn. Row 0 holds
+        # the neighbours used by all the tiles without the static turns.
+        static_types = [rules.tile_type for rules in tile_rules if rules.dynamic_mask is None
+                        and rules.static_mask is not moveTables.neighbours]
+        self.turn_row = np.zeros(self.n_types, np.int32)
+        self.static_targets = np.full((len(static_types) + 1, 4, n_cells, self.max_turns), -1,
+                                      np.int32)
+        for cell in range(n_cells):
+            self.__set_targets(0, slice(None), cell, tables.neighbours[cell])
+        for row, tile_type in enumerate(static_types, 1):
+            self.turn_row[get_tile_type_id(tile_type)] = row
+            for direction in range(4):
+                for cell in range(n_cells):
+                    self.__set_targets(row, direction, cell,
+                                       tables.get_static_mask(tile_type, direction * 90, cell))
+
+    def __set_targets(self, row, direction, cell, mask):
+        cells = []
+        while mask:
+            low_bit = mask & -mask
+            cells.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        if len(cells) > self.max_turns:
+            raise ValueError(f'Static turns of the row {row} are not supported by the batch '
+                             f'engine, the max number of them is {self.max_turns}.')
+        self.static_targets[row, direction, cell, :len(cells)] = cells
+
+
+_rule_tables = {}
+
+
+def get_rule_tables(map_shape):
+    """Get the rule tables of the map shape, built once per shape and registered rules."""
+    key = (tuple(map_shape), get_rules_generation())
+    if key not in _rule_tables:
+        _rule_tables[key] = RuleTables(map_shape)
+    return _rule_tables[key]
+
+
+class BatchGame:
+    """Games with the same map shape and number of players in stacked arrays.
+
+    Cells are `y * width + x` as in the `GameState`. Each player has
+    `max_characters` slots for the characters, `ch_seq` keeps the order in
+    which the characters were added, so the n-th alive character of the
+    player is the same as in `Player.characters`.
+
+    Actions are the cells to move the current character to,
+    `pick_money_action` and `next_character_action`.
+    """
+
+    max_characters = 3
+
+    def __init__(self, games):
+        """Stack the games of the scalar engine.
+
+        :param games: list of `GameLogic` with the same map shape and players
+        """
+        first = games[0]
+        self.n_games = n_games = len(games)
+        self.num_of_players = n_players = first.num_of_players
+        self.width, self.height = first.game_state.width, first.game_state.height
+        self.n_cells = n_cells = self.width * self.height
+        self.rules = get_rule_tables((self.width, self.height))
+        self.players = [(pl.color, pl.side) for pl in first.players]
+        self.sides = np.array([pl.side for pl in first.players])
+        self.pick_money_action = n_cells
+        self.next_character_action = n_cells + 1
+        self.n_actions = n_cells + 2
+
+        self.tile_type = np.zeros((n_games, n_cells), np.uint8)
+        self.direction = np.zeros((n_games, n_cells), np.uint8)
+        self.is_open = np.zeros((n_games, n_cells), bool)
+        self.active = np.zeros((n_games, n_cells), bool)
+        self.gold = np.zeros((n_games, n_cells), np.int32)
+        self.ship = np.zeros((n_games, n_players), np.int32)
+        self.ship_gold = np.zeros((n_games, n_players), np.int32)
+        ch_shape = (n_games, n_players, self.max_characters)
+        self.ch_cell = np.zeros(ch_shape, np.int32)
+        self.ch_prev = np.zeros(ch_shape, np.int32)
+        self.ch_state = np.zeros(ch_shape, np.int8)
+        self.ch_spin = np.zeros(ch_shape, np.int8)
+        self.ch_object = np.zeros(ch_shape, bool)
+        self.ch_alive = np.zeros(ch_shape, bool)
+        self.ch_seq = np.zeros(ch_shape, np.int32)
+        # Number of the characters ever added to the game.
+        self.n_added = np.zeros(n_games, np.int32)
+        self.turn = np.zeros(n_games, np.int32)
+        self.cur_player = np.zeros(n_games, np.int32)
+        self.cur_character = np.zeros(n_games, np.int32)
+        self.moved = np.zeros(n_games, bool)
+        self.move_start = np.full(n_games, -1, np.int32)
+        # Trapped cells visited during the chain move.
+        self.cycles = np.zeros((n_games, n_cells), bool)
+        # Analysis of the current chain move in format {(cell, prev): is_trapped}, or None.
+        self.chains = [None] * n_games
+        for i, game in enumerate(games):
+            self.__load_game(i, game)
+        # Gold on the closed tiles.
+        self.hidden_gold = np.where(self.is_open, 0, self.rules.hidden_money[self.tile_type]).sum(1)
+
+    @classmethod
+    def new(cls, n_games, num_of_players=4, seed=None, map_shape=None):
+        """Create the games at their start, the maps are drawn from one random stream.
+
+        :param map_shape: (width, height) of the maps, the standard map if None
+        """
+        rng = random.Random(seed)
+        return cls([GameLogic(num_of_players, seed=rng, map_shape=map_shape)
+                    for _ in range(n_games)])
+
+    def __load_game(self, i, game):
+        state = game.game_state
+        self.tile_type[i] = np.frombuffer(state.tile_type, np.uint8)
+        self.direction[i] = np.frombuffer(state.direction, np.uint8)
+        self.is_open[i] = np.frombuffer(state.is_open, np.uint8)
+        self.active[i] = np.frombuffer(state.active, np.uint8)
+        self.gold[i] = state.gold
+        for q, player in enumerate(game.players):
+            self.ship[i, q] = state.to_cell(player.ship_coords)
+            self.ship_gold[i, q] = player.objects['money']
+            assert len(player.characters) <= self.max_characters
+            for s, ch in enumerate(player.characters):
+                self.ch_cell[i, q, s] = state.to_cell(ch.coords)
+                self.ch_prev[i, q, s] = state.to_cell(ch.prev_coords)
+                self.ch_state[i, q, s] = state.ch_state[ch.row]
+                self.ch_spin[i, q, s] = ch.spin_counter
+                self.ch_object[i, q, s] = ch.object is not None
+                self.ch_alive[i, q, s] = True
+                self.ch_seq[i, q, s] = ch.row
+        self.n_added[i] = state.n_characters
+        self.turn[i] = game.turn
+        self.cur_player[i] = game.cur_player
+        self.cur_character[i] = game.cur_character
+        self.moved[i] = game.moved
+        if game.move_start_coords is not None:
+            self.move_start[i] = state.to_cell(game.move_start_coords)
+        for coords in game.cycles or ():
+            self.cycles[i, state.to_cell(coords)] = True
+
+    def to_coords(self, cell):
+        return Coords(int(cell) % self.width, int(cell) // self.width)
+
+    def to_game(self, i):
+        """Create the scalar game of the position of the game `i`."""
+        state = GameState((self.width, self.height))
+        state.load_tiles(tile_type=self.tile_type[i].tolist(), direction=self.direction[i].tolist(),
+                         is_open=self.is_open[i].tolist(), active=self.active[i].tolist(),
+                         gold=self.gold[i].tolist())
+        for q in range(self.num_of_players):
+            state.add_player(self.to_coords(self.ship[i, q]))
+            state.set(state.ship_gold, q, int(self.ship_gold[i, q]))
+        # Characters are added in their order, so the rows keep it.
+        for q, s in sorted(zip(*np.nonzero(self.ch_alive[i])),
+                           key=lambda slot: self.ch_seq[i][slot]):
+            row = state.add_character(self.to_coords(self.ch_cell[i, q, s]), 0, owner=q)
+            prev_x, prev_y = self.to_coords(self.ch_prev[i, q, s])
+            state.set(state.ch_prev_x, row, prev_x)
+            state.set(state.ch_prev_y, row, prev_y)
+            state.set(state.ch_state, row, int(self.ch_state[i, q, s]))
+            state.set(state.ch_spin, row, int(self.ch_spin[i, q, s]))
+            state.set(state.ch_object, row, int(self.ch_object[i, q, s]))
+        game = GameLogic.from_state(state, self.players)
+        game.turn = int(self.turn[i])
+        game.cur_player = int(self.cur_player[i])
+        game.cur_character = int(self.cur_character[i])
+        game.moved = bool(self.moved[i])
+        if self.move_start[i] >= 0:
+            game.move_start_coords = self.to_coords(self.move_start[i])
+        if self.moved[i]:
+            game.cycles = {self.to_coords(cell): True for cell in np.nonzero(self.cycles[i])[0]}
+        return game
+
+    def get_gold_left(self):
+        """Get the amount of gold that is not yet brought to the ships in each game."""
+        return (self.gold.sum(1) + self.hidden_gold +
+                (self.ch_alive & self.ch_object).sum((1, 2)))
+
+    def is_game_over(self):
+        """Check which games are over, see `GameLogic.is_game_over`."""
+        can_move = (self.ch_alive & (self.ch_state != TRAPPED)).any((1, 2))
+        return ~can_move | (self.get_gold_left() == 0)
+
+    def get_legal_mask(self):
+        """Get the cells the current character of each game can move to.
+
+        Switches to the next player in the games where the current player
+        has no alive characters, as `GameLogic._get_possible_turns` does.
+
+        :return: bool array of shape (n_games, n_cells), no turns in the games that are over
+        """
+        mask = np.zeros((self.n_games, self.n_cells), bool)
+        games = np.nonzero(~self.is_game_over())[0]
+        self._resolve(games)
+        players, slots = self.cur_player[games], self._get_current_slots(games)
+        mask[games] = self._get_character_turns(games, players, slots)
+        return mask
+
+    def get_action_mask(self):
+        """Get the legal actions of each game.
+
+        The character without turns leaves the game by moving to its own
+        cell, unless it holds the gold which has to be dropped first.
+
+        :return: bool array of shape (n_games, n_actions)
+        """
+        mask = np.zeros((self.n_games, self.n_actions), bool)
+        games = np.nonzero(~self.is_game_over())[0]
+        self._resolve(games)
+        players, slots = self.cur_player[games], self._get_current_slots(games)
+        turns = self._get_character_turns(games, players, slots)
+        cells = self.ch_cell[games, players, slots]
+        carrying = self.ch_object[games, players, slots]
+        mask[games, :self.n_cells] = turns
+        stuck = ~turns.any(1) & ~carrying
+        mask[games[stuck], cells[stuck]] = True
+        mask[games, self.pick_money_action] = carrying | (self.gold[games, cells] > 0)
+        mask[games, self.next_character_action] = ~self.moved[games]
+        return mask
+
+    def step(self, actions):
+        """Make one action in each game, the games that are over are skipped.
+
+        :param actions: int array of shape (n_games,), -1 to skip the game
+        """
+        actions = np.asarray(actions)
+        games = np.nonzero((actions >= 0) & ~self.is_game_over())[0]
+        self._resolve(games)
+        actions = actions[games]
+        players, slots = self.cur_player[games], self._get_current_slots(games)
+        move = actions < self.n_cells
+        self._move(games[move], players[move], slots[move], actions[move])
+        pick = actions == self.pick_money_action
+        self._pick_money(games[pick], players[pick], slots[pick])
+        self._next_character(games[actions == self.next_character_action])
+
+    def _resolve(self, games):
+        """Skip the players without alive characters and reset the character counter,
+        as `GameLogic._get_alive_characters` does."""
+        for _ in range(3 * self.num_of_players + 1):
+            alive = self.__get_alive(games)
+            empty = ~alive.any(1)
+            if not empty.any():
+                break
+            self._next_player(games[empty])
+        n_alive = self.__get_alive(games).sum(1)
+        self.cur_character[games[self.cur_character[games] >= n_alive]] = 0
+
+    def __get_alive(self, games):
+        players = self.cur_player[games]
+        return self.ch_alive[games, players] & (self.ch_state[games, players] == ALIVE)
+
+    def _get_current_slots(self, games):
+        """Get the slots of the current characters, the games must be resolved."""
+        seq = np.where(self.__get_alive(games), self.ch_seq[games, self.cur_player[games]],
+                       np.iinfo(np.int32).max)
+        order = np.argsort(seq, axis=1, kind='stable')
+        return order[np.arange(len(games)), self.cur_character[games]]
+
+    def _next_player(self, games):
+        self.moved[games] = False
+        self.move_start[games] = -1
+        self.cycles[games] = False
+        for i in games:
+            self.chains[i] = None
+        self.turn[games] += 1
+        self.cur_player[games] = (self.cur_player[games] + 1) % self.num_of_players
+        # Start the step of each character of the player in the order they were added,
+        # including the ones added during it.
+        players = self.cur_player[games]
+        last = np.full(len(games), -1)
+        no_character = np.iinfo(np.int32).max
+        while len(games):
+            seq = self.ch_seq[games, players]
+            seq = np.where(self.ch_alive[games, players] & (seq > last[:, None]), seq, no_character)
+            slots = seq.argmin(1)
+            last = seq[np.arange(len(games)), slots]
+            found = last != no_character
+            games, players, slots, last = games[found], players[found], slots[found], last[found]
+            self._start_step(games, players, slots)
+
+    def _get_character_turns(self, games, players, slots):
+        return self._get_turns(games, players, self.ch_cell[games, players, slots],
+                               self.ch_prev[games, players, slots],
+                               self.ch_state[games, players, slots],
+                               self.ch_spin[games, players, slots],
+                               self.ch_object[games, players, slots])
+
+    def _get_turns(self, games, players, cells, prevs, states, spins, carrying):
+        """Get the turns from the cells, see `MoveTables` and `canStep`.
+
+        :return: bool array of shape (len(games), n_cells)
+        """
+        rules, width, height = self.rules, self.width, self.height
+        tile_type = self.tile_type[games, cells]
+        kind = rules.turn_kind[tile_type]
+        targets = rules.static_targets[rules.turn_row[tile_type], self.direction[games, cells],
+                                       cells]
+        ships = self.ship[games, players]
+
+        def only(sel, target):
+            targets[sel] = -1
+            targets[sel, 0] = target
+
+        sel = np.nonzero(kind == TURNS_WATER)[0]
+        if len(sel):
+            on_ship = cells[sel] == ships[sel]
+            swim = sel[~on_ship]
+            swim_targets = targets[swim]
+            is_water = self.tile_type[games[swim, None], swim_targets] == rules.water
+            targets[swim] = np.where((swim_targets >= 0) & is_water, swim_targets, -1)
+            sail = sel[on_ship]
+            targets[sail] = -1
+            targets[sail, :3] = self.__get_ship_turns(games[sail], players[sail], cells[sail])
+        sel = kind == TURNS_BALOON
+        only(sel, ships[sel])
+        sel = kind == TURNS_CROCODILE
+        only(sel, prevs[sel])
+        sel = kind == TURNS_ICE_LAKE
+        x = 2 * (cells[sel] % width) - prevs[sel] % width
+        y = 2 * (cells[sel] // width) - prevs[sel] // width
+        only(sel, np.where((x >= 0) & (x < width) & (y >= 0) & (y < height), y * width + x, -1))
+        sel = (kind == TURNS_SPINNING) & (spins < rules.max_spin[tile_type])
+        only(sel, cells[sel])
+        targets[(kind == TURNS_IF_ALIVE) & (states != ALIVE)] = -1
+
+        # Only the turns the character can step on are kept.
+        targets[~self.__can_step(games, players, tile_type, carrying, targets)] = -1
+        # The last column collects the missing turns.
+        mask = np.zeros((len(games), self.n_cells + 1), bool)
+        mask[np.arange(len(games))[:, None], targets] = True
+        mask = mask[:, :-1]
+        # The active plane can fly to any cell.
+        sel = np.nonzero((kind == TURNS_PLANE) & self.active[games, cells])[0]
+        if len(sel):
+            all_cells = np.broadcast_to(np.arange(self.n_cells), (len(sel), self.n_cells))
+            mask[sel] = self.__can_step(games[sel], players[sel], tile_type[sel], carrying[sel],
+                                        all_cells)
+        return mask
+
+    def __get_ship_turns(self, games, players, cells):
+        """Get the forward, left and right turns of the ship, -1 for no turn."""
+        width, height = self.width, self.height
+        x, y = cells % width, cells // width
+        sides = self.sides[players]
+
+        def to_cell(dx, dy):
+            new_x, new_y = x + dx, y + dy
+            in_bounds = (new_x >= 0) & (new_x < width) & (new_y >= 0) & (new_y < height)
+            return np.where(in_bounds, new_y * width + new_x, -1)
+
+        forward = _forward[sides]
+        res = [to_cell(forward[:, 0], forward[:, 1])]
+        # Can move left/right till ship will be on the shore.
+        for offset in (_left[sides], _right[sides]):
+            side_cell = to_cell(offset[:, 0], offset[:, 1])
+            shore = to_cell(offset[:, 0] + forward[:, 0], offset[:, 1] + forward[:, 1])
+            is_shore = (shore >= 0) & (self.tile_type[games, shore] != self.rules.water)
+            res.append(np.where(is_shore, side_cell, -1))
+        return np.stack(res, axis=1)
+
+    def __has_enemies(self, games, players, targets):
+        """Check if the characters of the other players are on the target cells."""
+        is_enemy = (self.ch_alive[games] &
+                    (np.arange(self.num_of_players)[None, :, None] != players[:, None, None]))
+        # The size is explicit, as the selection of the games can be empty.
+        n_characters = self.ch_cell.shape[1] * self.ch_cell.shape[2]
+        enemy_cells = np.where(is_enemy, self.ch_cell[games], -1).reshape(len(games), 1,
+                                                                          n_characters)
+        return (targets[:, :, None] == enemy_cells).any(2)
+
+    def __can_step(self, games, players, tile_type, carrying, targets):
+        """Check if the characters can step on the target cells, see `canStep`.
+
+        :param tile_type: tile types of the cells of the characters
+        :param targets: int array of shape (len(games), n_targets)
+        """
+        rules = self.rules
+        rows = games[:, None]
+        kind = rules.step_kind[self.tile_type[rows, targets]]
+        enemies = self.__has_enemies(games, players, targets)
+        carrying = carrying[:, None]
+        default = ~(carrying & enemies) & (~carrying | self.is_open[rows, targets])
+        water = ((targets == self.ship[games, players][:, None]) |
+                 rules.water_source[tile_type][:, None])
+        fort = ~carrying & ~enemies
+        return np.where(kind == STEP_WATER, water, np.where(kind == STEP_FORT, fort, default))
+
+    def _move(self, games, players, slots, targets):
+        """Move the current characters, see `GameLogic._move_character`."""
+        turns = self._get_character_turns(games, players, slots)
+        # Remove the character if no possible turns from this point.
+        leave = ~turns.any(1) & ~self.ch_object[games, players, slots]
+        self.ch_alive[games[leave], players[leave], slots[leave]] = False
+        self._next_player(games[leave])
+
+        can_move = turns[np.arange(len(games)), targets]
+        games, players, slots, targets = (games[can_move], players[can_move], slots[can_move],
+                                          targets[can_move])
+        prev_cells = self.ch_cell[games, players, slots]
+        self._finish_step(games, players, slots, targets)
+        self.ch_prev[games, players, slots] = self.ch_cell[games, players, slots]
+        self.ch_cell[games, players, slots] = targets
+        is_final = self._start_step(games, players, slots)
+
+        # If the turn continues, check if the character is trapped in a cycle.
+        chain = np.nonzero(~is_final)[0]
+        start = chain[~self.moved[games[chain]]]
+        self.move_start[games[start]] = prev_cells[start]
+        self.cycles[games[start]] = False
+        trapped = chain[self.__is_trapped(games[chain], players[chain], slots[chain])]
+        # If stepped two times on the trapped tile, character can't leave the cycle.
+        dead = trapped[self.cycles[games[trapped], targets[trapped]]]
+        self.cycles[games[trapped], targets[trapped]] = True
+        self.ch_alive[games[dead], players[dead], slots[dead]] = False
+        is_final[dead] = True
+
+        self.moved[games] = True
+        self._next_player(games[is_final])
+        # Open the tiles.
+        closed = ~self.is_open[games, targets]
+        games, targets = games[closed], targets[closed]
+        self.is_open[games, targets] = True
+        money = self.rules.hidden_money[self.tile_type[games, targets]]
+        self.gold[games, targets] += money
+        self.hidden_gold[games] -= money
+
+    def _pick_money(self, games, players, slots):
+        cells = self.ch_cell[games, players, slots]
+        # If already moved, bring the gold to the starting tile of this move.
+        drop = self.ch_object[games, players, slots]
+        drop_cells = np.where(self.moved[games], self.move_start[games], cells)
+        self.gold[games[drop], drop_cells[drop]] += 1
+        self.ch_object[games[drop], players[drop], slots[drop]] = False
+        take = ~drop & (self.gold[games, cells] > 0)
+        self.gold[games[take], cells[take]] -= 1
+        self.ch_object[games[take], players[take], slots[take]] = True
+
+    def _next_character(self, games):
+        # Can switch only if not yet moved.
+        games = games[~self.moved[games]]
+        n_alive = self.__get_alive(games).sum(1)
+        self.cur_character[games] = (self.cur_character[games] + 1) % n_alive
+
+    def _finish_step(self, games, players, slots, targets):
+        """Finish the step on the current tile, see `endStep`."""
+        cells = self.ch_cell[games, players, slots]
+        tile_type = self.tile_type[games, cells]
+        kind = self.rules.finish_kind[tile_type]
+
+        sel = kind == FINISH_SPINNING
+        spins = self.ch_spin[games[sel], players[sel], slots[sel]]
+        self.ch_spin[games[sel], players[sel], slots[sel]] = np.where(
+            spins < self.rules.max_spin[tile_type[sel]], spins + 1, -1)
+
+        sel = kind == FINISH_PLANE
+        self.active[games[sel], cells[sel]] = False
+
+        # If want to move the ship, move everyone on it.
+        sel = ((kind == FINISH_WATER) & (cells == self.ship[games, players]) &
+               (self.tile_type[games, targets] == self.rules.water))
+        games, players, cells, targets = games[sel], players[sel], cells[sel], targets[sel]
+        self.ship[games, players] = targets
+        rows, on_ship = np.nonzero(self.ch_alive[games, players] &
+                                   (self.ch_cell[games, players] == cells[:, None]))
+        self.ch_prev[games[rows], players[rows], on_ship] = cells[rows]
+        self.ch_cell[games[rows], players[rows], on_ship] = targets[rows]
+
+    def _start_step(self, games, players, slots):
+        """Start the step on the tile of the characters, see `startStep`.
+
+        :return: bool array, True if the turn is finished
+        """
+        cells = self.ch_cell[games, players, slots]
+        tile_type = self.tile_type[games, cells]
+        kind = self.rules.start_kind[tile_type]
+        # Other characters on the same tile.
+        others = self.ch_alive[games] & (self.ch_cell[games] == cells[:, None, None])
+        others[np.arange(len(games)), players, slots] = False
+        enemies = others & (np.arange(self.num_of_players)[None, :, None] != players[:, None, None])
+
+        for start_kind, start in [
+            (START_DEFAULT, self.__start_default),
+            (START_SPINNING, self.__start_spinning),
+            (START_RUM, self.__start_rum),
+            (START_OGRE, self.__start_ogre),
+            (START_ABORIGINE, self.__start_aborigine),
+            (START_TRAP, self.__start_trap),
+            (START_WATER, self.__start_water),
+        ]:
+            sel = kind == start_kind
+            if sel.any():
+                start(games[sel], players[sel], slots[sel], cells[sel], others[sel], enemies[sel])
+        return self.rules.is_final[tile_type]
+
+    def __kick(self, games, cells, kicked):
+        """Send the characters to their ships, the dropped gold stays on the tile."""
+        rows, owners, slots = np.nonzero(kicked)
+        games_, cells = games[rows], cells[rows]
+        self.ch_prev[games_, owners, slots] = self.ch_cell[games_, owners, slots]
+        self.ch_cell[games_, owners, slots] = self.ship[games_, owners]
+        self.ch_spin[games_, owners, slots] = -1
+        np.add.at(self.gold, (games_, cells), self.ch_object[games_, owners, slots])
+        self.ch_object[games_, owners, slots] = False
+
+    def __start_default(self, games, players, slots, cells, others, enemies):
+        self.__kick(games, cells, enemies)
+
+    def __start_spinning(self, games, players, slots, cells, others, enemies):
+        spins = np.maximum(self.ch_spin[games, players, slots], 1)
+        self.ch_spin[games, players, slots] = spins
+        # Kick other players on the same spin subtile to their ship.
+        self.__kick(games, cells, enemies & (self.ch_spin[games] == spins[:, None, None]))
+
+    def __start_rum(self, games, players, slots, cells, others, enemies):
+        rows, owners, other_slots = np.nonzero(enemies)
+        self.ch_state[games[rows], owners, other_slots] = ALIVE
+        self.__kick(games, cells, enemies)
+        states = self.ch_state[games, players, slots]
+        drunk = (states == ALIVE) & (self.ch_prev[games, players, slots] != cells)
+        sober = states == HANGOVER
+        self.ch_state[games, players, slots] = np.select(
+            [drunk, states == DRUNK, sober], [DRUNK, HANGOVER, ALIVE], states)
+        self.ch_prev[games[sober], players[sober], slots[sober]] = cells[sober]
+
+    def __start_ogre(self, games, players, slots, cells, others, enemies):
+        self.gold[games, cells] += self.ch_object[games, players, slots]
+        self.ch_object[games, players, slots] = False
+        self.ch_alive[games, players, slots] = False
+
+    def __start_aborigine(self, games, players, slots, cells, others, enemies):
+        add = self.ch_alive[games, players].sum(1) < self.max_characters
+        games, players, cells = games[add], players[add], cells[add]
+        new_slots = self.ch_alive[games, players].argmin(1)
+        new = games, players, new_slots
+        self.ch_cell[new] = self.ch_prev[new] = cells
+        self.ch_state[new] = ALIVE
+        self.ch_spin[new] = -1
+        self.ch_object[new] = False
+        self.ch_alive[new] = True
+        self.ch_seq[new] = self.n_added[games]
+        self.n_added[games] += 1
+
+    def __start_trap(self, games, players, slots, cells, others, enemies):
+        is_smn_trapped = (others & (self.ch_state[games] == TRAPPED)).any((1, 2))
+        # Untrap all other characters and kick the other players.
+        rows, owners, other_slots = np.nonzero(others)
+        self.ch_state[games[rows], owners, other_slots] = ALIVE
+        self.ch_prev[games[rows], owners, other_slots] = cells[rows]
+        self.__kick(games, cells, enemies)
+        # If noone was trapped, you get trapped.
+        trapped = ~is_smn_trapped & (self.ch_prev[games, players, slots] != cells)
+        self.ch_state[games, players, slots] = np.where(trapped, TRAPPED, ALIVE)
+        free = ~trapped
+        self.ch_prev[games[free], players[free], slots[free]] = cells[free]
+
+    def __start_water(self, games, players, slots, cells, others, enemies):
+        ships = self.ship[games] == cells[:, None]
+        has_ship = ships.any(1)
+        ship_players = ships.argmax(1)
+        # The ship gets the gold, the character on the other player's ship dies.
+        self.ship_gold[games[has_ship], ship_players[has_ship]] += \
+            self.ch_object[games[has_ship], players[has_ship], slots[has_ship]]
+        dead = has_ship & (ship_players != players)
+        self.ch_alive[games[dead], players[dead], slots[dead]] = False
+        # Otherwise the other players on the same tile die.
+        killed = enemies & ~dead[:, None, None]
+        rows, owners, other_slots = np.nonzero(killed & has_ship[:, None, None])
+        np.add.at(self.ship_gold, (games[rows], ship_players[rows]),
+                  self.ch_object[games[rows], owners, other_slots])
+        self.ch_object[games[rows], owners, other_slots] = False
+        rows, owners, other_slots = np.nonzero(killed)
+        self.ch_alive[games[rows], owners, other_slots] = False
+        self.ch_object[games, players, slots] = False
+
+    def __is_trapped(self, games, players, slots):
+        """Check if the chain moves can't be finished, see `GameLogic._is_trapped`.
+
+        The analysis is reused during the chain move, unless the character
+        left the analyzed nodes.
+        """
+        cells = self.ch_cell[games, players, slots]
+        prevs = np.where(self.rules.prev_dependent[self.tile_type[games, cells]],
+                         self.ch_prev[games, players, slots], cells)
+        nodes = list(zip(cells.tolist(), prevs.tolist()))
+        missing = np.array([self.chains[game] is None or node not in self.chains[game]
+                            for game, node in zip(games, nodes)], bool)
+        if missing.any():
+            chains = self.__analyze_chains(games[missing], players[missing], cells[missing],
+                                           prevs[missing],
+                                           self.ch_object[games[missing], players[missing],
+                                                          slots[missing]])
+            for game, chain in zip(games[missing], chains):
+                self.chains[game] = chain
+        return np.array([self.chains[game][node] for game, node in zip(games, nodes)], bool)
+
+    def __analyze_chains(self, games, players, cells, prevs, carrying):
+        """Find the chain nodes from which no final tile is reachable.
+
+        Nodes of all the games are expanded together level by level, then
+        reaching a final tile is propagated back over the found edges.
+
+        :return: list of {(cell, prev): is_trapped} for each game
+        """
+        rules = self.rules
+        index = {}
+        node_rows, node_cells, node_prevs = [], [], []
+
+        def add_nodes(rows, cells, prevs):
+            new = []
+            for node in zip(rows.tolist(), cells.tolist(), prevs.tolist()):
+                if node not in index:
+                    index[node] = len(node_rows)
+                    new.append(len(node_rows))
+                    node_rows.append(node[0])
+                    node_cells.append(node[1])
+                    node_prevs.append(node[2])
+            return new
+
+        frontier = add_nodes(np.arange(len(games)), cells, prevs)
+        edges, reaches_final = [], []
+        while frontier:
+            frontier = np.array(frontier)
+            rows = np.array(node_rows)[frontier]
+            from_cells, from_prevs = np.array(node_cells)[frontier], np.array(node_prevs)[frontier]
+            # The chain character is alive and not spinning.
+            n_nodes = len(frontier)
+            turns = self._get_turns(games[rows], players[rows], from_cells, from_prevs,
+                                    np.full(n_nodes, ALIVE), np.full(n_nodes, -1), carrying[rows])
+            sources, targets = np.nonzero(turns)
+            tile_type = self.tile_type[games[rows[sources]], targets]
+            is_final = rules.is_final[tile_type]
+            reaches_final.extend(frontier[sources[is_final]].tolist())
+            sources, targets = sources[~is_final], targets[~is_final]
+            tile_type = tile_type[~is_final]
+            target_prevs = np.where(rules.prev_dependent[tile_type], from_cells[sources], targets)
+            new_frontier = add_nodes(rows[sources], targets, target_prevs)
+            for source, node in zip(frontier[sources].tolist(),
+                                    zip(rows[sources].tolist(), targets.tolist(),
+                                        target_prevs.tolist())):
+                edges.append((source, index[node]))
+            frontier = new_frontier
+
+        good = np.zeros(len(node_rows), bool)
+        good[reaches_final] = True
+        if edges:
+            sources, targets = np.array(edges).T
+            while True:
+                new_good = good.copy()
+                new_good[sources[good[targets]]] = True
+                if (new_good == good).all():
+                    break
+                good = new_good
+        chains = [{} for _ in range(len(games))]
+        for node, i in index.items():
+            row, cell, prev = node
+            chains[row][cell, prev] = not good[i]
+        return chains
+
+
+def sample_actions(mask, rng):
+    """Pick one of the legal actions of each game at random, -1 if there are none.
+
+    :param mask: bool array got from `BatchGame.get_action_mask`
+    :param rng: `numpy.random.Generator`
+    """
+    scores = rng.random(mask.shape) * mask
+    return np.where(mask.any(1), scores.argmax(1), -1)
+
+
+def get_position(game_logic):
+    """Get the position of the scalar game in the form comparable between the games."""
+    state = game_logic.game_state
+    tiles = tuple(bytes(getattr(state, field)) for field in GameState.tile_fields)
+    players = tuple(
+        (tuple(pl.ship_coords), pl.objects['money'],
+         tuple((tuple(ch.coords), tuple(ch.prev_coords), ch.state, ch.spin_counter, ch.object)
+               for ch in pl.characters))
+        for pl in game_logic.players
+    )
+    move_start = game_logic.move_start_coords
+    return (tiles, players, game_logic.turn, game_logic.cur_player, game_logic.cur_character,
+            game_logic.moved, move_start and tuple(move_start),
+            frozenset(map(tuple, game_logic.cycles or ())))
+
+
+def make_action(game_logic, batch, action):
+    """Make the action of the batch engine in the scalar game."""
+    if action == batch.pick_money_action:
+        game_logic.pick_money()
+    elif action == batch.next_character_action:
+        game_logic.next_character()
+    elif action >= 0:
+        game_logic.mouse_click(batch.to_coords(action))
+
+
+def verify(n_games=64, n_actions=1000, seed=0, num_of_players=4, map_shape=None):
+    """Play random games in both engines and compare them after each action.
+
+    :return: number of the compared positions
+    :raise AssertionError: on the first difference
+    """
+    rng = random.Random(seed)
+    games = [GameLogic(num_of_players, seed=rng, map_shape=map_shape) for _ in range(n_games)]
+    batch = BatchGame([game.copy() for game in games])
+    np_rng = np.random.default_rng(seed)
+    n_positions = 0
+    for n in range(n_actions):
+        is_over = batch.is_game_over()
+        legal = batch.get_legal_mask()
+        for i, game in enumerate(games):
+            assert game.is_game_over() == is_over[i], f'Game {i}, action {n}: game over differs.'
+            if is_over[i]:
+                continue
+            turns = sorted(game.game_state.to_cell(coords) for coords in game._get_possible_turns())
+            assert turns == np.nonzero(legal[i])[0].tolist(), \
+                f'Game {i}, action {n}: turns differ.'
+            assert get_position(game) == get_position(batch.to_game(i)), \
+                f'Game {i}, action {n}: positions differ.'
+            n_positions += 1
+        if is_over.all():
+            break
+        actions = sample_actions(batch.get_action_mask(), np_rng)
+        for game, action in zip(games, actions.tolist()):
+            make_action(game, batch, action)
+        batch.step(actions)
+    return n_positions
+
+
+def bench(n_games, n_actions, seed=0, num_of_players=4, map_shape=None):
+    """Measure the actions per second of both engines on random actions."""
+    batch = BatchGame.new(n_games, num_of_players, seed=seed, map_shape=map_shape)
+    games = [batch.to_game(i) for i in range(n_games)]
+    np_rng = np.random.default_rng(seed)
+    all_actions = []
+    start = time.perf_counter()
+    for _ in range(n_actions):
+        actions = sample_actions(batch.get_action_mask(), np_rng)
+        batch.step(actions)
+        all_actions.append(actions.tolist())
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for actions in all_actions:
+        for game, action in zip(games, actions):
+            if action >= 0 and not game.is_game_over():
+                game._get_possible_turns()
+                make_action(game, batch, action)
+    scalar_time = time.perf_counter() - start
+    n_made = sum(action >= 0 for actions in all_actions for action in actions)
+    return n_made / batch_time, n_made / scalar_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play random games with the batch engine.')
+    parser.add_argument('-n', '--games', type=int, default=256, help='number of games')
+    parser.add_argument('-p', '--players', type=int, default=4, help='number of players')
+    parser.add_argument('--actions', type=int, default=500, help='number of steps')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--map-shape', type=int, nargs=2, default=None,
+                        metavar=('WIDTH', 'HEIGHT'), help='shape of the maps, 13 13 by default')
+    parser.add_argument('--verify', action='store_true',
+                        help='compare the positions with the scalar engine after each action')
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        n_positions = verify(args.games, args.actions, args.seed, args.players, args.map_shape)
+        print(f'{n_positions} positions are the same in both engines', file=sys.stderr)
+    else:
+        batch_speed, scalar_speed = bench(args.games, args.actions, args.seed, args.players,
+                                          args.map_shape)
+        print(f'Batch engine: {batch_speed:.0f} actions/s, '
+              f'scalar engine: {scalar_speed:.0f} actions/s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,8 @@
-from code.behaviour.startStep import start_step, tile_type_to_is_final
+from code.behaviour.startStep import start_step
 from code.behaviour.canStep import get_tile_behavior
 from code.behaviour.possibleTurns import get_possible_turns
-from code.behaviour.endStep import finish_step
\ No newline at end of file
+from code.behaviour.endStep import finish_step
+from code.behaviour.moveTables import MoveTables, get_move_tables
+from code.behaviour.chainAnalyzer import ChainAnalyzer, ChainAnalysis
+from code.behaviour.ruleRegistry import TileRules
+from code.behaviour.tileRules import register_tile_type, get_tile_rules
@@ -1,16 +1,13 @@
-from collections import defaultdict
-
-from code.data import map_players_to_positions
+from code.behaviour.ruleRegistry import step_rules
+from code.data import get_tile_type_id
 
 
 def default_behavior(game_map, players, cur_player, cur_char, coords):
     # If character is holding money, he can't kick others.
     if cur_char.object == 'money':
-        characters = map_players_to_positions(players).get(coords, [])
-        for character, pl_color in characters:
-            if pl_color != cur_player.color:
-                return False
-    
+        if cur_player.position_index.has_enemies(coords, cur_player.color):
+            return False
+
     # Can if character is not holding money or tile is already open.
     return cur_char.object != 'money' or game_map[coords].is_open
 
@@ -28,22 +25,8 @@ def water(game_map, players, cur_player, cur_char, coords):
 def fort(game_map, players, cur_player, cur_char, coords):
     if cur_char.object is not None:
         return False
-    characters = map_players_to_positions(players).get(coords, [])
-    for character, pl_color in characters:
-        if pl_color != cur_player.color:
-            return False
-    return True
-
-
-__tile_type_to_behavior = {
-    'empty': default_behavior,
-    'water': water,
-    'fort': fort,
-    'aborigine': fort,
-}
+    return not cur_player.position_index.has_enemies(coords, cur_player.color)
 
 
 def get_tile_behavior(tile_type):
-    tile_type_to_behavior = defaultdict(lambda: default_behavior)
-    tile_type_to_behavior.update(__tile_type_to_behavior)
-    return tile_type_to_behavior[tile_type]
+    return step_rules[get_tile_type_id(tile_type)]
@@ -0,0 +1,150 @@
+from code.data import TranspositionTable
+from code.behaviour.ruleRegistry import is_final_rules, prev_dependent_rules
+
+
+class ChainCharacter:
+    """Character moving through the chain, used instead of the real one
+    so the analysis doesn't change the game state."""
+
+    def __init__(self, coords, prev_coords, object):
+        self.coords = coords
+        self.prev_coords = prev_coords
+        self.object = object
+        self.state = 'alive'
+        self.spin_counter = -1
+
+
+class ChainAnalysis:
+    """Result of the analysis of the chain move.
+
+    Nodes of the chain are the (coords, prev_coords) pairs of the non-final
+    tiles, `prev_coords` is None if the tile turns don't depend on it.
+    """
+
+    def __init__(self, start, resting_cells, trapped_nodes, nodes):
+        self.start = start
+        # Final tiles reachable from the start.
+        self.resting_cells = resting_cells
+        # Nodes from which no final tile is reachable.
+        self.trapped_nodes = trapped_nodes
+        self.nodes = nodes
+
+    @property
+    def trapped_cells(self):
+        return {coords for coords, _ in self.trapped_nodes}
+
+    def is_trapped(self, node):
+        """Check if the chain can't be finished from the node.
+
+        :return: None if the node is not reachable from the start
+        """
+        if node not in self.nodes:
+            return None
+        return node in self.trapped_nodes
+
+
+class ChainAnalyzer:
+    """Finds where the chain moves over the non-final tiles can end.
+
+    The chain is a directed graph of nodes with the possible turns as edges.
+    Strongly connected components are found in one pass of Tarjan's
+    algorithm, the component is trapped if no final tile is reachable
+    from it. Results are cached by the Zobrist hash of the state and the
+    start node, so they are reused after the rollbacks of the state and for
+    the states reached by different move orders.
+    """
+
+    def __init__(self, cache_size=256):
+        self.cache_size = cache_size
+        self.cache = TranspositionTable(cache_size)
+
+    @staticmethod
+    def get_node(game_map, coords, prev_coords):
+        # Turns of some tiles depend on the previous coords of the character.
+        if prev_dependent_rules[game_map[coords].tile_type_id]:
+            return coords, prev_coords
+        return coords, None
+
+    def analyze(self, game_logic, cur_player, cur_char):
+        """Analyze the chain move of the character from its current position.
+        """
+        game_map = game_logic.game_map
+        start = self.get_node(game_map, cur_char.coords, cur_char.prev_coords)
+        key = (game_logic.game_state.hash, cur_player.row, cur_char.object, start)
+        analysis = self.cache.get(key)
+        if analysis is None:
+            analysis = self.__analyze(game_logic, cur_player, cur_char, start)
+            # Bigger chains are kept longer.
+            self.cache.store(key, analysis, depth=len(analysis.nodes))
+        return analysis
+
+    def __analyze(self, game_logic, cur_player, cur_char, start):
+        game_map = game_logic.game_map
+
+        def get_edges(node):
+            """Get the next nodes and the final cells reachable in one turn."""
+            coords, prev_coords = node
+            ch = ChainCharacter(coords, prev_coords or coords, cur_char.object)
+            next_nodes, final_cells = [], set()
+            for turn in game_logic._get_turns(cur_player, ch):
+                if is_final_rules[game_map[turn].tile_type_id]:
+                    final_cells.add(turn)
+                else:
+                    next_nodes.append(self.get_node(game_map, turn, coords))
+            return next_nodes, final_cells
+
+        # Iterative Tarjan's algorithm.
+        index, low, on_stack, stack = {}, {}, set(), []
+        edges, resting, trapped = {}, {}, set()
+        work = [(start, 0)]
+        while work:
+            node, child_i = work.pop()
+            if child_i == 0:
+                index[node] = low[node] = len(index)
+                stack.append(node)
+                on_stack.add(node)
+                edges[node], resting[node] = get_edges(node)
+            next_nodes = edges[node]
+            # Continue with the next child not yet visited.
+            while child_i < len(next_nodes):
+                child = next_nodes[child_i]
+                child_i += 1
+                if child not in index:
+                    work.append((node, child_i))
+                    work.append((child, 0))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                # All children are visited.
+                for child in next_nodes:
+                    if child in on_stack:
+                        low[node] = min(low[node], low[child])
+                if low[node] == index[node]:
+                    self.__close_component(node, stack, on_stack, edges, resting, trapped)
+        return ChainAnalysis(start, resting[start], trapped, set(index))
+
+    @staticmethod
+    def __close_component(root, stack, on_stack, edges, resting, trapped):
+        """Pop the component from the stack and compute its resting cells.
+
+        Components are closed after all the components reachable from them.
+        """
+        component = []
+        while True:
+            node = stack.pop()
+            on_stack.discard(node)
+            component.append(node)
+            if node == root:
+                break
+        members = set(component)
+        cells = set()
+        for node in component:
+            cells |= resting[node]
+            for child in edges[node]:
+                if child not in members:
+                    cells |= resting[child]
+        for node in component:
+            resting[node] = cells
+            if not cells:
+                trapped.add(node)
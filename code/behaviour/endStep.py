@@ -1,6 +1,4 @@
-from collections import defaultdict
-
-from code.data import Tile
+from code.behaviour.ruleRegistry import finish_rules, max_spin_rules
 
 
 def default_end(game_map, cur_player, cur_char, coords):
@@ -8,7 +6,7 @@ def default_end(game_map, cur_player, cur_char, coords):
 
 
 def spinning(game_map, cur_player, cur_char, coords):
-    max_spin = Tile.get_max_spin(game_map[cur_char.coords].tile_type)
+    max_spin = max_spin_rules[game_map[cur_char.coords].tile_type_id]
     if cur_char.spin_counter < max_spin:
         cur_char.spin_counter += 1
     else:
@@ -31,20 +29,5 @@ def water(game_map, cur_player, cur_char, coords):
                 char.move(coords)
 
 
-__tile_type_to_step = {
-    'spinning_2': spinning,
-    'spinning_3': spinning,
-    'spinning_4': spinning,
-    'spinning_5': spinning,
-    'plane': plane,
-    'water': water,
-}
-
-
-tile_type_to_step = defaultdict(lambda: default_end)
-tile_type_to_step.update(__tile_type_to_step)
-
-
 def finish_step(game_map, cur_player, cur_char, coords):
-    tile_type = game_map[cur_char.coords].tile_type
-    tile_type_to_step[tile_type](game_map, cur_player, cur_char, coords)
+    finish_rules[game_map[cur_char.coords].tile_type_id](game_map, cur_player, cur_char, coords)
@@ -0,0 +1,281 @@
+from collections import OrderedDict
+
+from code.behaviour.ruleRegistry import (static_mask_rules, dynamic_mask_rules, max_spin_rules,
+                                         get_rules_generation)
+from code.data import (Tile, get_cell_coords, direction_offset, straight_offset, diagonal_offset,
+                       tile_types, get_tile_type_id)
+
+
+class ShapeTables:
+    """Move targets of every cell for a given map shape.
+
+    Cell (x, y) is stored as the bit `y * width + x`, so the set bits of a
+    mask are iterated in the same order as `default_turns` produces them.
+    """
+
+    def __init__(self, map_shape):
+        self.width, self.height = map_shape
+        self.n_cells = self.width * self.height
+        self.full = (1 << self.n_cells) - 1
+        self.cell_coords = get_cell_coords(map_shape)
+        dirs = Tile.get_tile_dirs()
+        self.neighbours = [self.offsets_mask(coords, [(x, y) for y in range(-1, 2)
+                                                      for x in range(-1, 2) if x or y])
+                           for coords in self.cell_coords]
+        self.horses = [self.offsets_mask(coords, [(-1, -2), (-2, -1), (-1, 2), (2, -1),
+                                                  (1, -2), (-2, 1), (1, 2), (2, 1)])
+                       for coords in self.cell_coords]
+        self.straight = {d: [self.coords_mask([straight_offset(coords, d)])
+                             for coords in self.cell_coords] for d in dirs}
+        self.diagonal = {d: [self.coords_mask([diagonal_offset(coords, d)])
+                             for coords in self.cell_coords] for d in dirs}
+        self.cannon = {d: [self.coords_mask([self.__cannon_target(coords, d)])
+                           for coords in self.cell_coords] for d in dirs}
+        # Masks of the static tiles in format {(tile_type, direction, cell): mask},
+        # computed with the rules of the generation.
+        self.__static_masks = {}
+        self.__rules_generation = get_rules_generation()
+        # Turns from the ship in format {water_mask: ship_turns}.
+        self.ship_turns = {}
+
+    def __cannon_target(self, coords, direction):
+        x, y = coords
+        return {
+            0: (x, 0),
+            90: (self.width - 1, y),
+            180: (x, self.height - 1),
+            270: (0, y),
+        }[direction]
+
+    def get_static_mask(self, tile_type, direction, cell):
+        """Get the turns of the static tile, computed once per shape."""
+        if self.__rules_generation != get_rules_generation():
+            self.__static_masks.clear()
+            self.__rules_generation = get_rules_generation()
+        key = (tile_type, direction, cell)
+        mask = self.__static_masks.get(key)
+        if mask is None:
+            static_mask = static_mask_rules[get_tile_type_id(tile_type)] or neighbours
+            mask = self.__static_masks[key] = static_mask(self, direction, cell)
+        return mask
+
+    def is_in_bounds(self, coords):
+        x, y = coords
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def to_cell(self, coords):
+        x, y = coords
+        return y * self.width + x
+
+    def coords_mask(self, coords_list):
+        """Get the mask of the given coords, skipping the ones out of bounds."""
+        mask = 0
+        for coords in coords_list:
+            if self.is_in_bounds(coords):
+                mask |= 1 << self.to_cell(coords)
+        return mask
+
+    def offsets_mask(self, coords, offsets):
+        return self.coords_mask([coords + offset for offset in offsets])
+
+    def mask_to_coords(self, mask):
+        cell_coords, res = self.cell_coords, []
+        while mask:
+            low_bit = mask & -mask
+            res.append(cell_coords[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return res
+
+
+def neighbours(tables, direction, cell):
+    return tables.neighbours[cell]
+
+
+def dir_straight(tables, direction, cell):
+    return tables.straight[direction][cell]
+
+
+def dir_0_180(tables, direction, cell):
+    return (tables.straight[direction][cell] |
+            tables.straight[(direction + 180) % 360][cell])
+
+
+def dir_uplr(tables, direction, cell):
+    mask = 0
+    for straight in tables.straight.values():
+        mask |= straight[cell]
+    return mask
+
+
+def dir_45(tables, direction, cell):
+    return tables.diagonal[direction][cell]
+
+
+def dir_45_225(tables, direction, cell):
+    return (tables.diagonal[direction][cell] |
+            tables.diagonal[(direction + 180) % 360][cell])
+
+
+def dir_diagonal(tables, direction, cell):
+    mask = 0
+    for diagonal in tables.diagonal.values():
+        mask |= diagonal[cell]
+    return mask
+
+
+def dir_0_135_270(tables, direction, cell):
+    return (tables.straight[direction][cell] |
+            tables.diagonal[(direction + 90) % 360][cell] |
+            tables.straight[(direction + 270) % 360][cell])
+
+
+def cannon(tables, direction, cell):
+    return tables.cannon[direction][cell]
+
+
+def horses(tables, direction, cell):
+    return tables.horses[cell]
+
+
+def water(move_tables, game_map, cur_player, cur_char, cell):
+    tables = move_tables.tables
+    if cur_char.coords == cur_player.ship_coords:
+        return move_tables.ship_turns[cur_player.side][cell]
+    return tables.neighbours[cell] & move_tables.water_mask
+
+
+def baloon(move_tables, game_map, cur_player, cur_char, cell):
+    return move_tables.tables.coords_mask([cur_player.ship_coords])
+
+
+def plane(move_tables, game_map, cur_player, cur_char, cell):
+    if not game_map[cur_char.coords].active:
+        return move_tables.tables.neighbours[cell]
+    return move_tables.tables.full
+
+
+def crocodile(move_tables, game_map, cur_player, cur_char, cell):
+    return move_tables.tables.coords_mask([cur_char.prev_coords])
+
+
+def ice_lake(move_tables, game_map, cur_player, cur_char, cell):
+    diff = cur_char.coords - cur_char.prev_coords
+    return move_tables.tables.coords_mask([cur_char.coords + diff])
+
+
+def spinning(move_tables, game_map, cur_player, cur_char, cell):
+    max_spin = max_spin_rules[game_map[cur_char.coords].tile_type_id]
+    if cur_char.spin_counter >= max_spin:
+        return move_tables.tables.neighbours[cell]
+    return 1 << cell
+
+
+def drinking_rum(move_tables, game_map, cur_player, cur_char, cell):
+    if cur_char.state == 'alive':
+        return move_tables.tables.neighbours[cell]
+    return 0
+
+
+_shape_tables = {}
+
+
+def get_shape_tables(map_shape):
+    """Get the tables for the map shape, they are built once per shape."""
+    map_shape = tuple(map_shape)
+    if map_shape not in _shape_tables:
+        _shape_tables[map_shape] = ShapeTables(map_shape)
+    return _shape_tables[map_shape]
+
+
+class MoveTables:
+    """Possible turns of every cell of the given map.
+
+    Turns of the tiles that depend only on the tile type and direction are
+    computed once on map creation with their static mask rules, the rest
+    are computed with their dynamic mask rules, see `register_tile_type`.
+    Produces the same turns as `get_possible_turns`.
+    """
+
+    def __init__(self, game_map):
+        self.tables = tables = get_shape_tables(game_map.get_map_shape())
+        state = game_map.game_state
+        self.water_mask = 0
+        self.cell_turns = [None] * tables.n_cells
+        # Coords of the static turns, converted from the masks on the first use,
+        # as the bit operations take the time of the size of the board.
+        self.cell_turn_coords = [None] * tables.n_cells
+        self.cell_behavior = [None] * tables.n_cells
+        water_id = get_tile_type_id('water')
+        for cell, (tile_type_id, direction) in enumerate(zip(state.tile_type, state.direction)):
+            if tile_type_id == water_id:
+                self.water_mask |= 1 << cell
+            dynamic_mask = dynamic_mask_rules[tile_type_id]
+            if dynamic_mask is not None:
+                self.cell_behavior[cell] = dynamic_mask
+            else:
+                self.cell_turns[cell] = tables.get_static_mask(tile_types[tile_type_id],
+                                                               direction * 90, cell)
+        # Turns from the ship for each side of the map, the ship is always in water.
+        # Maps with the same water share them.
+        if self.water_mask not in tables.ship_turns:
+            tables.ship_turns[self.water_mask] = [
+                [self.__ship_turns(coords, side) if self.water_mask >> cell & 1 else 0
+                 for cell, coords in enumerate(tables.cell_coords)]
+                for side in range(4)
+            ]
+        self.ship_turns = tables.ship_turns[self.water_mask]
+
+    def __ship_turns(self, coords, side):
+        tables = self.tables
+
+        def is_shore(coords):
+            return (tables.is_in_bounds(coords) and
+                    not self.water_mask >> tables.to_cell(coords) & 1)
+
+        # Can move only forward or left/right with the ship.
+        res = [direction_offset(coords, side, 'forward')]
+        # Can move left/right till ship will be on the shore.
+        for direction in ('left', 'right'):
+            side_coords = direction_offset(coords, side, direction)
+            if is_shore(direction_offset(side_coords, side, 'forward')):
+                res.append(side_coords)
+        return tables.coords_mask(res)
+
+    def get_turns_mask(self, game_map, cur_player, cur_char):
+        cell = self.tables.to_cell(cur_char.coords)
+        mask = self.cell_turns[cell]
+        if mask is None:
+            mask = self.cell_behavior[cell](self, game_map, cur_player, cur_char, cell)
+        return mask
+
+    def get_possible_turns(self, game_map, players, cur_player, cur_char):
+        """Get the turns of the character, the returned list must not be changed."""
+        cell = self.tables.to_cell(cur_char.coords)
+        turns = self.cell_turn_coords[cell]
+        if turns is None:
+            mask = self.cell_turns[cell]
+            if mask is None:
+                mask = self.cell_behavior[cell](self, game_map, cur_player, cur_char, cell)
+                return self.tables.mask_to_coords(mask)
+            turns = self.cell_turn_coords[cell] = self.tables.mask_to_coords(mask)
+        return turns
+
+
+_move_tables = OrderedDict()
+
+
+def get_move_tables(game_map, cache_size=64):
+    """Get the tables of the map, shared by the maps with the same tiles.
+
+    Used when the same map is decoded many times, e.g. in other processes.
+    """
+    state = game_map.game_state
+    key = (state.width, state.height, state.tile_type.tobytes(), state.direction.tobytes(),
+           get_rules_generation())
+    if key in _move_tables:
+        _move_tables.move_to_end(key)
+    else:
+        _move_tables[key] = MoveTables(game_map)
+        if len(_move_tables) > cache_size:
+            _move_tables.popitem(last=False)
+    return _move_tables[key]
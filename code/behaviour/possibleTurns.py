@@ -1,7 +1,5 @@
-from collections import defaultdict
-
-from code.behaviour import get_tile_behavior
-from code.data import Tile, Coords, direction_offset, straight_offset, diagonal_offset
+from code.behaviour.ruleRegistry import turn_rules, max_spin_rules
+from code.data import Coords, direction_offset, straight_offset, diagonal_offset
 
 
 def default_turns(game_map, cur_player, cur_char):
@@ -95,25 +93,27 @@ def baloon(game_map, cur_player, cur_char):
 def plane(game_map, cur_player, cur_char):
     if not game_map[cur_char.coords].active:
         return default_turns(game_map, cur_player, cur_char)
+    width, height = game_map.get_map_shape()
     pos_turns = []
-    for x in range(0, 13):
-        for y in range(0, 13):
+    for x in range(0, width):
+        for y in range(0, height):
             pos_turns.append((x, y))
     return pos_turns
 
 
 def cannon(game_map, cur_player, cur_char):
-    cur_coords = cur_char.coords.copy()
-    direction = game_map[cur_coords].direction
+    x, y = cur_char.coords
+    width, height = game_map.get_map_shape()
+    direction = game_map[cur_char.coords].direction
     if direction == 0:
-        cur_coords[1] = 0
+        y = 0
     elif direction == 180:
-        cur_coords[1] = 12
+        y = height - 1
     elif direction == 90:
-        cur_coords[0] = 12
+        x = width - 1
     elif direction == 270:
-        cur_coords[0] = 0
-    return [cur_coords]
+        x = 0
+    return [Coords(x, y)]
 
 
 def crocodile(game_map, cur_player, cur_char):
@@ -133,7 +133,7 @@ def horses(game_map, cur_player, cur_char):
 
 
 def spinning(game_map, cur_player, cur_char):
-    max_spin = Tile.get_max_spin(game_map[cur_char.coords].tile_type)
+    max_spin = max_spin_rules[game_map[cur_char.coords].tile_type_id]
     if cur_char.spin_counter >= max_spin:
         return default_turns(game_map, cur_player, cur_char)
     return [cur_char.coords]
@@ -151,38 +151,10 @@ def trap(game_map, cur_player, cur_char):
     return []
 
 
-__tile_type_to_turns = {
-    'water': water,
-    'dir_straight': dir_straight,
-    'dir_0_180': dir_0_180,
-    'dir_uplr': dir_uplr,
-    'dir_45': dir_45,
-    'dir_45_225': dir_45_225,
-    'dir_diagonal': dir_diagonal,
-    'dir_0_135_270': dir_0_135_270,
-    'baloon': baloon,
-    'plane': plane,
-    'cannon': cannon,
-    'crocodile': crocodile,
-    'ice_lake': ice_lake,
-    'horses': horses,
-    'spinning_2': spinning,
-    'spinning_3': spinning,
-    'spinning_4': spinning,
-    'spinning_5': spinning,
-    'drinking_rum': drinking_rum,
-    'trap': trap,
-}
-
-
-tile_type_to_turns = defaultdict(lambda: default_turns)
-tile_type_to_turns.update(__tile_type_to_turns)
-
-
 def get_possible_turns(game_map, players, cur_player, cur_char):
-    tile_type = game_map[cur_char.coords].tile_type
+    tile_type_id = game_map[cur_char.coords].tile_type_id
     # Get the list of possible turns.
-    pos_turns = tile_type_to_turns[tile_type](game_map, cur_player, cur_char)
+    pos_turns = turn_rules[tile_type_id](game_map, cur_player, cur_char)
     # XXX: Force turns into Coords format.
     pos_turns = [Coords(*coords) for coords in pos_turns]
     # Accept turn only if it in map bounds.
@@ -0,0 +1,74 @@
+"""Rules of the tile types compiled into the lists indexed by the tile type id.
+
+The rules are declared in `code.behaviour.tileRules`, the rule modules
+dispatch by the id stored in the `GameState` with a list index.
+"""
+
+
+class TileRules:
+    """All the rules of one tile type, see `register_tile_type`."""
+
+    __slots__ = ('tile_type', 'turns', 'can_step', 'start', 'finish', 'is_final', 'max_spin',
+                 'objects', 'prev_dependent', 'static_mask', 'dynamic_mask')
+
+    def __init__(self, tile_type, turns, can_step, start, finish, is_final, max_spin, objects,
+                 prev_dependent, static_mask, dynamic_mask):
+        self.tile_type = tile_type
+        self.turns = turns
+        self.can_step = can_step
+        self.start = start
+        self.finish = finish
+        self.is_final = is_final
+        self.max_spin = max_spin
+        self.objects = objects
+        self.prev_dependent = prev_dependent
+        self.static_mask = static_mask
+        self.dynamic_mask = dynamic_mask
+
+    def __repr__(self):
+        return f'<TileRules: {self.tile_type}>'
+
+
+# Rules of the tile types by their ids.
+tile_rules = []
+turn_rules = []
+step_rules = []
+start_rules = []
+finish_rules = []
+is_final_rules = []
+max_spin_rules = []
+prev_dependent_rules = []
+static_mask_rules = []
+dynamic_mask_rules = []
+
+__tables = {
+    'turns': turn_rules,
+    'can_step': step_rules,
+    'start': start_rules,
+    'finish': finish_rules,
+    'is_final': is_final_rules,
+    'max_spin': max_spin_rules,
+    'prev_dependent': prev_dependent_rules,
+    'static_mask': static_mask_rules,
+    'dynamic_mask': dynamic_mask_rules,
+}
+# Number of the compiled rules, the caches built from the rules are keyed by it.
+__generation = 0
+
+
+def get_rules_generation():
+    """Get the number changed on every registration of the rules."""
+    return __generation
+
+
+def compile_rules(tile_type_id, rules: TileRules):
+    """Put the rules of the tile type into the dispatch lists."""
+    global __generation
+    __generation += 1
+    while len(tile_rules) <= tile_type_id:
+        tile_rules.append(None)
+        for table in __tables.values():
+            table.append(None)
+    tile_rules[tile_type_id] = rules
+    for name, table in __tables.items():
+        table[tile_type_id] = getattr(rules, name)
@@ -0,0 +1,121 @@
+"""Declarations of the rules of all the tile types.
+
+Each tile type is declared once with `register_tile_type`, the rules are
+compiled into the dispatch lists of `code.behaviour.ruleRegistry`.
+
+Usage example, a tile moving the character back to its ship:
+```python
+def portal_turns(game_map, cur_player, cur_char):
+    return [cur_player.ship_coords]
+
+register_tile_type('portal', turns=portal_turns, is_final=False)
+game_map[coords].tile_type = 'portal'
+# Turns of the tiles are compiled on map creation.
+game_map.move_tables = MoveTables(game_map)
+```
+"""
+from code.behaviour import canStep, endStep, moveTables, possibleTurns, startStep
+from code.behaviour.ruleRegistry import TileRules, compile_rules, tile_rules
+from code.data import add_tile_type, get_tile_type_id, objects_on_open, tile_max_spin
+
+
+def _turns_to_mask(turns):
+    """Get the dynamic mask rule of `MoveTables` computing the turns with the turns rule."""
+    def dynamic_mask(move_tables, game_map, cur_player, cur_char, cell):
+        return move_tables.tables.coords_mask(turns(game_map, cur_player, cur_char))
+    dynamic_mask.__name__ = f'{turns.__name__}_mask'
+    return dynamic_mask
+
+
+def register_tile_type(tile_type, turns=None, can_step=None, start=None, finish=None,
+                       is_final=True, max_spin=0, objects=None, prev_dependent=False,
+                       static_mask=None, dynamic_mask=None):
+    """Declare the rules of the tile type, replacing the rules registered before.
+
+    Rules are used by the maps created after the registration.
+
+    :param turns: function (game_map, cur_player, cur_char) -> list of turns,
+        turns to the neighbours if None
+    :param can_step: function (game_map, players, cur_player, cur_char, coords) -> bool
+        checking if the character can step on the tile, `canStep.default_behavior` if None
+    :param start: function (game_map, players, cur_player, cur_char) called when the
+        character steps on the tile, `startStep.default_start` if None
+    :param finish: function (game_map, cur_player, cur_char, coords) called when the
+        character leaves the tile, `endStep.default_end` if None
+    :param is_final: whether the turn ends on the tile, otherwise the character moves on
+    :param max_spin: number of the moves needed to leave the spinning tile
+    :param objects: objects appearing on the tile when it's opened, e.g. {'money': 2}
+    :param prev_dependent: whether the turns depend on the previous coords of the character
+    :param static_mask: function (shape_tables, direction, cell) -> mask of the turns
+        depending only on the position and direction of the tile, see `MoveTables`
+    :param dynamic_mask: function (move_tables, game_map, cur_player, cur_char, cell) -> mask
+        of the turns, computed from `turns` if neither of the masks is given
+    :return: id of the tile type
+    """
+    if static_mask is None and dynamic_mask is None:
+        if turns is None:
+            static_mask = moveTables.neighbours
+        else:
+            dynamic_mask = _turns_to_mask(turns)
+    rules = TileRules(
+        tile_type,
+        turns=turns or possibleTurns.default_turns,
+        can_step=can_step or canStep.default_behavior,
+        start=start or startStep.default_start,
+        finish=finish or endStep.default_end,
+        is_final=is_final,
+        max_spin=max_spin,
+        objects=dict(objects or {}),
+        prev_dependent=prev_dependent,
+        static_mask=static_mask,
+        dynamic_mask=dynamic_mask,
+    )
+    tile_type_id = add_tile_type(tile_type)
+    compile_rules(tile_type_id, rules)
+    objects_on_open[tile_type] = rules.objects
+    if max_spin:
+        tile_max_spin[tile_type] = max_spin
+    else:
+        tile_max_spin.pop(tile_type, None)
+    return tile_type_id
+
+
+def get_tile_rules(tile_type):
+    """Get the `TileRules` of the tile type."""
+    return tile_rules[get_tile_type_id(tile_type)]
+
+
+# Ids are given in the order of the registration, so they are the same in all processes.
+# Saved games store the names of the ids, see `code.serialization`.
+register_tile_type('water', turns=possibleTurns.water, can_step=canStep.water,
+                   start=startStep.water, finish=endStep.water, dynamic_mask=moveTables.water)
+register_tile_type('empty')
+for _tile_type in ('dir_straight', 'dir_45', 'dir_45_225', 'dir_0_180', 'dir_0_135_270',
+                   'dir_diagonal', 'dir_uplr'):
+    register_tile_type(_tile_type, turns=getattr(possibleTurns, _tile_type), is_final=False,
+                       static_mask=getattr(moveTables, _tile_type))
+register_tile_type('horses', turns=possibleTurns.horses, is_final=False,
+                   static_mask=moveTables.horses)
+for _max_spin in range(2, 6):
+    register_tile_type(f'spinning_{_max_spin}', turns=possibleTurns.spinning,
+                       start=startStep.spinning, finish=endStep.spinning, max_spin=_max_spin,
+                       dynamic_mask=moveTables.spinning)
+register_tile_type('ice_lake', turns=possibleTurns.ice_lake, is_final=False, prev_dependent=True,
+                   dynamic_mask=moveTables.ice_lake)
+register_tile_type('trap', turns=possibleTurns.trap, start=startStep.trap,
+                   dynamic_mask=moveTables.drinking_rum)
+register_tile_type('cannon', turns=possibleTurns.cannon, is_final=False,
+                   static_mask=moveTables.cannon)
+register_tile_type('fort', can_step=canStep.fort)
+register_tile_type('aborigine', can_step=canStep.fort, start=startStep.aborigine)
+register_tile_type('drinking_rum', turns=possibleTurns.drinking_rum, start=startStep.drinking_rum,
+                   dynamic_mask=moveTables.drinking_rum)
+register_tile_type('crocodile', turns=possibleTurns.crocodile, is_final=False,
+                   prev_dependent=True, dynamic_mask=moveTables.crocodile)
+register_tile_type('ogre', start=startStep.ogre)
+register_tile_type('baloon', turns=possibleTurns.baloon, is_final=False,
+                   dynamic_mask=moveTables.baloon)
+register_tile_type('plane', turns=possibleTurns.plane, finish=endStep.plane,
+                   dynamic_mask=moveTables.plane)
+for _amount in range(1, 6):
+    register_tile_type(f'money_{_amount}', objects={'money': _amount})
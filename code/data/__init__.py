@@ -1,3 +1,7 @@
-from code.data.coords import Coords, direction_offset, straight_offset, diagonal_offset
-from code.data.tile import Tile
-from code.data.characters import Player, Character, map_players_to_positions
+from code.data.coords import (Coords, get_cell_coords, direction_offset, straight_offset,
+                              diagonal_offset)
+from code.data.state import GameState
+from code.data.tile import (Tile, objects_on_open, tile_max_spin, tile_types, add_tile_type,
+                            get_tile_type_id)
+from code.data.characters import Player, Character, PositionIndex
+from code.data.transposition import TranspositionTable
@@ -1,8 +1,52 @@
-from collections import defaultdict, Counter
+from collections import defaultdict
+
+from code.data.state import GameState
+from code.data.tile import GoldObjects
+
+
+class PositionIndex:
+    """Characters of all players by their coords.
+
+    Updated by `Character` on every change of its coords, so the occupancy
+    of a tile is known without scanning all the characters.
+    """
+
+    def __init__(self):
+        self.__positions = defaultdict(list)
+
+    def add(self, character):
+        self.__positions[character.coords].append((character, character.color))
+
+    def remove(self, character):
+        coords = character.coords
+        characters = self.__positions[coords]
+        for i, (other, _) in enumerate(characters):
+            if other is character:
+                del characters[i]
+                break
+        if not characters:
+            del self.__positions[coords]
+
+    def get(self, coords, default=None):
+        """Get the list of (character, player color) pairs on the given coords."""
+        characters = self.__positions.get(coords)
+        if characters is None:
+            return default
+        return list(characters)
+
+    def has_enemies(self, coords, color):
+        """Check if characters of other players are on the given coords."""
+        return any(pl_color != color for _, pl_color in self.__positions.get(coords, ()))
+
+    def items(self):
+        return self.__positions.items()
+
+    def clear(self):
+        self.__positions.clear()
 
 
 class Character:
-    """Game character.
+    """View of one game character of the `GameState`.
     Possible `ch_types` are: `pirate`.
     """
 
@@ -15,27 +59,101 @@ class Character:
             'trapped',
         ]
 
-    def __init__(self, coords, ch_type: str):
-        self.coords = coords
-        self.ch_type = ch_type
-        self.state = 'alive'
-        self.spin_counter = -1
-        self.prev_coords = coords
-        self.object = None
+    @staticmethod
+    def possible_types():
+        return [
+            'pirate',
+        ]
+
+    # Objects that character can hold.
+    __objects = [None, 'money']
+
+    def __init__(self, game_state: GameState, row, color=None, position_index: PositionIndex = None):
+        self.game_state = game_state
+        self.row = row
+        self.color = color
+        self.position_index = position_index
+        if position_index is not None:
+            position_index.add(self)
+
+    @property
+    def cell(self):
+        """Cell id `y * width + x` of the character."""
+        state, row = self.game_state, self.row
+        return state.ch_y[row] * state.width + state.ch_x[row]
+
+    @property
+    def coords(self):
+        return self.game_state.get_coords(self.game_state.ch_x[self.row],
+                                          self.game_state.ch_y[self.row])
+
+    @coords.setter
+    def coords(self, coords):
+        if self.position_index is not None:
+            self.position_index.remove(self)
+        x, y = coords
+        self.game_state.set(self.game_state.ch_x, self.row, x)
+        self.game_state.set(self.game_state.ch_y, self.row, y)
+        if self.position_index is not None:
+            self.position_index.add(self)
+
+    @property
+    def prev_coords(self):
+        return self.game_state.get_coords(self.game_state.ch_prev_x[self.row],
+                                          self.game_state.ch_prev_y[self.row])
+
+    @prev_coords.setter
+    def prev_coords(self, coords):
+        x, y = coords
+        self.game_state.set(self.game_state.ch_prev_x, self.row, x)
+        self.game_state.set(self.game_state.ch_prev_y, self.row, y)
+
+    @property
+    def ch_type(self):
+        return self.possible_types()[self.game_state.ch_type[self.row]]
+
+    @property
+    def state(self):
+        return self.possible_states()[self.game_state.ch_state[self.row]]
+
+    @state.setter
+    def state(self, state):
+        self.game_state.set(self.game_state.ch_state, self.row, self.possible_states().index(state))
+
+    @property
+    def spin_counter(self):
+        return self.game_state.ch_spin[self.row]
+
+    @spin_counter.setter
+    def spin_counter(self, spin_counter):
+        self.game_state.set(self.game_state.ch_spin, self.row, spin_counter)
+
+    @property
+    def object(self):
+        return self.__objects[self.game_state.ch_object[self.row]]
+
+    @object.setter
+    def object(self, object):
+        self.game_state.set(self.game_state.ch_object, self.row, self.__objects.index(object))
 
     def move(self, coords, is_kicked=False):
         self.prev_coords = self.coords
         self.coords = coords
         if is_kicked:
+            # Kicked character starts over from the ship.
+            self.spin_counter = -1
             dropped_object = self.object
             self.object = None
             return dropped_object
         else:
             return None
 
+    def __repr__(self):
+        return f'<Character: {self.color} {self.ch_type} at {self.coords}>'
+
 
 class Player:
-    """Game player."""
+    """View of one game player of the `GameState`."""
 
     @staticmethod
     def _get_possible_colors():
@@ -46,13 +164,51 @@ class Player:
             'yellow',
         ]
 
-    def __init__(self, color, start_coords, side):
+    def __init__(self, color, start_coords, side,
+                 position_index: PositionIndex = None, game_state: GameState = None):
+        """
+        :param color: color of the player
+        :param start_coords: coords of the ship
+        :param side: side of the map with the ship
+        :param position_index: index of characters, can be shared with other players
+        :param game_state: state to store the player in, can be shared with other players
+        """
         self.color = color
         self.side = side
-        self.ship_coords = start_coords
-        self.objects = Counter()
-        self.characters = [Character(start_coords, ch_type='pirate')
-                           for _ in range(3)]
+        self.game_state = game_state if game_state is not None else GameState((0, 0))
+        self.position_index = position_index if position_index is not None else PositionIndex()
+        self.row = self.game_state.add_player(start_coords)
+        self.objects = GoldObjects(self.game_state, self.game_state.ship_gold, self.row)
+        self.characters = []
+        self.__views = {}
+        for _ in range(3):
+            self.add_character(start_coords, ch_type='pirate')
+
+    @classmethod
+    def from_state(cls, color, side, game_state: GameState, row, position_index: PositionIndex):
+        """Create the view of the player already stored in the state."""
+        player = cls.__new__(cls)
+        player.color = color
+        player.side = side
+        player.game_state = game_state
+        player.position_index = position_index
+        player.row = row
+        player.objects = GoldObjects(game_state, game_state.ship_gold, row)
+        player.characters = []
+        player.__views = {}
+        player.sync_characters()
+        return player
+
+    @property
+    def ship_coords(self):
+        return self.game_state.get_coords(self.game_state.ship_x[self.row],
+                                          self.game_state.ship_y[self.row])
+
+    @ship_coords.setter
+    def ship_coords(self, coords):
+        x, y = coords
+        self.game_state.set(self.game_state.ship_x, self.row, x)
+        self.game_state.set(self.game_state.ship_y, self.row, y)
 
     def get_object_from(self, character: Character):
         if character.object is not None:
@@ -60,14 +216,37 @@ class Player:
         character.object = None
 
     def add_character(self, start_coords, ch_type):
-        self.characters.append(Character(start_coords, ch_type))
+        ch_type = Character.possible_types().index(ch_type)
+        row = self.game_state.add_character(start_coords, ch_type, owner=self.row)
+        character = Character(self.game_state, row, self.color, self.position_index)
+        self.__views[row] = character
+        self.characters.append(character)
+
+    def remove_character(self, character: Character):
+        self.characters.remove(character)
+        self.position_index.remove(character)
+        character.position_index = None
+        self.game_state.set(self.game_state.ch_alive, character.row, 0)
 
+    def sync_characters(self):
+        """Update the characters after the state is changed directly.
 
-# @staticmethod
-def map_players_to_positions(players):
-    # TODO: Find a better way to understand if players are on the same tile.
-    positions = defaultdict(list)
-    for player in players:
-        for character in player.characters:
-            positions[character.coords].append((character, player.color))
-    return positions
+        Views of the characters are kept, so the same character is always the
+        same object. Alive characters are added to the position index.
+        """
+        state = self.game_state
+        for row in [row for row in self.__views if row >= state.n_characters]:
+            del self.__views[row]
+        self.characters = []
+        for row in range(state.n_characters):
+            if state.ch_owner[row] != self.row:
+                continue
+            if row not in self.__views:
+                self.__views[row] = Character(state, row, self.color)
+            character = self.__views[row]
+            if state.ch_alive[row]:
+                character.position_index = self.position_index
+                self.position_index.add(character)
+                self.characters.append(character)
+            else:
+                character.position_index = None
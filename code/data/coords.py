@@ -1,118 +1,109 @@
-from collections.abc import Iterable
-import operator
-
-
-class Coords(Iterable):
-    """Class for coords and math associated with them."""
-
-    def __init__(self, x, y):
-        self.coords = x, y
-
-    def __perform_op(self, operation, other, inplace=False, from_right=False):
-        x, y = self.coords
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        if from_right:
-            x, y, other = *other, (x, y)
-        # TODO: Better comment for the assert.
-        assert len(other) == 2, "Length should be two."
-        x = operation(x, other[0])
-        y = operation(y, other[1])
-        if inplace:
-            self.coords = x, y
-        return Coords(x, y)
+_new = tuple.__new__
 
-    def get_coords(self):
-        return self.coords
 
-    def set_coords(self, x, y):
-        self.coords = x, y
+def _pair(other):
+    """Get the (x, y) values of the operand, numbers are used for both axes."""
+    try:
+        x, y = other
+    except TypeError:
+        return other, other
+    return x, y
 
-    def __getitem__(self, idx):
-        return self.coords[idx]
 
-    def __setitem__(self, idx, value):
-        new_coords = list(self.coords)
-        new_coords[idx] = value
-        self.coords = tuple(new_coords)
+class Coords(tuple):
+    """Class for coords and math associated with them.
 
-    def copy(self):
-        return Coords(*self.coords)
+    Coords are immutable (x, y) tuples, so they are hashed and compared as
+    the plain tuples. Coords of the map cells are interned, see `get_cell_coords`.
+    """
 
-    def __iter__(self):
-        for val in self.coords:
-            yield val
+    __slots__ = ()
 
-    def __len__(self):
-        return 2
+    def __new__(cls, x, y):
+        return _new(cls, (x, y))
 
-    def __repr__(self):
-        return f'<Coords: {self.coords}>'
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def get_coords(self):
+        return tuple(self)
 
-    def __hash__(self):
-        return hash(self.coords)
+    def copy(self):
+        return self
 
-    def __eq__(self, other):
-        if type(other) is type(self):
-            return self.coords == other.coords
-        else:
-            return self.coords[0] == other[0] and self.coords[1] == other[1]
+    def __repr__(self):
+        return f'<Coords: {tuple(self)}>'
 
     def __add__(self, other):
-        return self.__perform_op(operator.add, other)
+        x, y = _pair(other)
+        return _new(Coords, (self[0] + x, self[1] + y))
     __radd__ = __add__
 
     def __mul__(self, other):
-        return self.__perform_op(operator.mul, other)
+        x, y = _pair(other)
+        return _new(Coords, (self[0] * x, self[1] * y))
     __rmul__ = __mul__
 
     def __neg__(self):
-        return Coords(-self.coords[0], -self.coords[1])
+        return _new(Coords, (-self[0], -self[1]))
 
     def __sub__(self, other):
-        return self.__perform_op(operator.sub, other)
+        x, y = _pair(other)
+        return _new(Coords, (self[0] - x, self[1] - y))
 
     def __rsub__(self, other):
-        return self.__perform_op(operator.sub, other, from_right=True)
+        x, y = _pair(other)
+        return _new(Coords, (x - self[0], y - self[1]))
 
     def __floordiv__(self, other):
-        return self.__perform_op(operator.floordiv, other)
+        x, y = _pair(other)
+        return _new(Coords, (self[0] // x, self[1] // y))
 
     def __rfloordiv__(self, other):
-        return self.__perform_op(operator.floordiv, other, from_right=True)
+        x, y = _pair(other)
+        return _new(Coords, (x // self[0], y // self[1]))
+
+
+_cell_coords = {}
+
+
+def get_cell_coords(map_shape):
+    """Get the list of the Coords of the cells `y * width + x` of the map shape.
+
+    The list is built once per shape, so the engine converts the cell ids
+    to Coords without creating new objects.
+    """
+    map_shape = tuple(map_shape)
+    if map_shape not in _cell_coords:
+        width, height = map_shape
+        _cell_coords[map_shape] = [Coords(cell % width, cell // width)
+                                   for cell in range(width * height)]
+    return _cell_coords[map_shape]
+
+
+# Offsets from the ship in format {(side, direction): offset}, by default forward.
+_forward_offsets = {0: Coords(1, 0), 1: Coords(0, -1), 2: Coords(-1, 0), 3: Coords(0, 1)}
+_direction_offsets = {}
+for _side, _offset in _forward_offsets.items():
+    _direction_offsets[_side, 'forward'] = _offset
+    _direction_offsets[_side, 'backwards'] = -_offset
+    _direction_offsets[_side, 'left'] = Coords(_offset[1], _offset[0])
+    _direction_offsets[_side, 'right'] = Coords(-_offset[1], -_offset[0])
+
+_straight_offsets = {0: (0, -1), 90: (1, 0), 180: (0, 1), 270: (-1, 0)}
+_diagonal_offsets = {0: (1, -1), 90: (1, 1), 180: (-1, 1), 270: (-1, -1)}
 
 
 def direction_offset(coords, side, direction):
-    offset = Coords(*{  # by default forward
-        0: (1, 0),
-        1: (0, -1),
-        2: (-1, 0),
-        3: (0, 1)
-    }[side])
-    if direction == 'backwards':
-        offset = -offset
-    elif direction == 'left':
-        offset = Coords(*(reversed(offset)))
-    elif direction == 'right':
-        offset = Coords(*reversed(-offset))
-    elif direction != 'forward':
+    offset = _direction_offsets.get((side, direction))
+    if offset is None:
         raise ValueError('Unknown direction')
     return coords + offset
 
 
 def straight_offset(coords, direction):
-    return coords + {
-        0: (0, -1),
-        90: (1, 0),
-        180: (0, 1),
-        270: (-1, 0),
-    }[direction]
+    return coords + _straight_offsets[direction]
 
 
 def diagonal_offset(coords, direction):
-    return coords + {
-        0: (1, -1),
-        90: (1, 1),
-        180: (-1, 1),
-        270: (-1, -1),
-    }[direction]
+    return coords + _diagonal_offsets[direction]
@@ -0,0 +1,309 @@
+import struct
+import sys
+from array import array
+from itertools import count
+
+from code.data.coords import Coords, get_cell_coords
+
+
+# Revisions are unique among all the states of the process.
+_revisions = count()
+
+_mask64 = (1 << 64) - 1
+# Random 64-bit keys in format {(field, idx, value): key}, filled on demand.
+_zobrist_keys = {}
+
+
+def zobrist_key(field, idx, value):
+    """Get the Zobrist key of the value of the item, the same in all processes.
+
+    :param field: index of the field in `GameState.hash_fields`, bigger
+        indices can be used for the values stored outside of the state
+    """
+    key = field, idx, value
+    z = _zobrist_keys.get(key)
+    if z is None:
+        # SplitMix64 of the packed item.
+        z = ((field << 48) ^ (idx << 24) ^ (value & 0xffffff)) + 0x9e3779b97f4a7c15 & _mask64
+        z = (z ^ z >> 30) * 0xbf58476d1ce4e5b9 & _mask64
+        z = (z ^ z >> 27) * 0x94d049bb133111eb & _mask64
+        z = _zobrist_keys[key] = z ^ z >> 31
+    return z
+
+
+# Maps the packed tile flags to the direction, is_open and active values.
+_unpack_direction = bytes(flags & 3 for flags in range(256))
+_unpack_is_open = bytes(flags >> 2 & 1 for flags in range(256))
+_unpack_active = bytes(flags >> 3 & 1 for flags in range(256))
+
+
+class GameState:
+    """Compact state of the game stored in flat arrays.
+
+    Tiles are stored by cell `y * width + x`, characters and players by
+    rows. `Tile`, `Character` and `Player` are views over these arrays.
+    All changes made during the play go through `set`, so the state can be
+    rolled back to any of its snapshots.
+
+    The state keeps its 64-bit Zobrist `hash`, the xor of the keys of all the
+    items, updated incrementally on every change. Equal states have equal
+    hashes, however the changes leading to them were made.
+    """
+
+    tile_fields = ('tile_type', 'direction', 'is_open', 'active', 'gold')
+    character_fields = ('ch_x', 'ch_y', 'ch_prev_x', 'ch_prev_y', 'ch_type',
+                        'ch_state', 'ch_spin', 'ch_object', 'ch_owner', 'ch_alive')
+    player_fields = ('ship_x', 'ship_y', 'ship_gold')
+    hash_fields = tile_fields + character_fields + player_fields
+
+    __typecodes = {
+        'tile_type': 'B', 'direction': 'B', 'is_open': 'B', 'active': 'B', 'gold': 'H',
+        'ch_x': 'h', 'ch_y': 'h', 'ch_prev_x': 'h', 'ch_prev_y': 'h', 'ch_type': 'B',
+        'ch_state': 'B', 'ch_spin': 'b', 'ch_object': 'B', 'ch_owner': 'B', 'ch_alive': 'B',
+        'ship_x': 'h', 'ship_y': 'h', 'ship_gold': 'H',
+    }
+
+    def __init__(self, map_shape):
+        self.width, self.height = map_shape
+        # Shared Coords of the cells.
+        self.cell_coords = get_cell_coords(map_shape)
+        n_cells = self.width * self.height
+        for field in self.tile_fields:
+            setattr(self, field, array(self.__typecodes[field], [0]) * n_cells)
+        for field in self.character_fields + self.player_fields:
+            setattr(self, field, array(self.__typecodes[field]))
+        # Old values of the changed items in format (values, idx, old_value).
+        self.journal = []
+        # Journal lengths at the moments of snapshots.
+        self.marks = []
+        # Changed on every change of the state.
+        self.revision = next(_revisions)
+        self.__init_hash()
+
+    def __init_hash(self, hash=None):
+        # Field indices in format {id(values): field}.
+        self.__field_ids = {id(getattr(self, field)): i for i, field in enumerate(self.hash_fields)}
+        # Hashes at the moments of snapshots.
+        self.__hash_marks = []
+        self.hash = self.compute_hash() if hash is None else hash
+
+    def compute_hash(self):
+        """Compute the Zobrist hash of the state from scratch. Takes O(board)."""
+        h = 0
+        for field_id, field in enumerate(self.hash_fields):
+            for idx, value in enumerate(getattr(self, field)):
+                h ^= zobrist_key(field_id, idx, value)
+        return h
+
+    def __hash_row(self, fields, row):
+        for field in fields:
+            values = getattr(self, field)
+            self.hash ^= zobrist_key(self.__field_ids[id(values)], row, values[row])
+
+    def to_cell(self, coords):
+        x, y = coords
+        return y * self.width + x
+
+    def get_coords(self, x, y):
+        """Get the shared Coords of the cell, new ones if they are out of the map."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cell_coords[y * self.width + x]
+        return Coords(x, y)
+
+    @property
+    def n_characters(self):
+        return len(self.ch_x)
+
+    @property
+    def n_players(self):
+        return len(self.ship_x)
+
+    def set(self, values, idx, value):
+        """Change the value in one of the state arrays."""
+        old_value = values[idx]
+        if self.marks:
+            self.journal.append((values, idx, old_value))
+        values[idx] = value
+        field, value = self.__field_ids[id(values)], values[idx]
+        # Keys are taken from the cache directly, as it's the hottest path of the play.
+        keys = _zobrist_keys
+        self.hash ^= ((keys.get((field, idx, old_value)) or zobrist_key(field, idx, old_value)) ^
+                      (keys.get((field, idx, value)) or zobrist_key(field, idx, value)))
+        self.revision = next(_revisions)
+
+    def load_tiles(self, **fields):
+        """Replace all the values of the given tile fields, e.g. on map creation.
+
+        Changes are not journaled, so it can't be used between snapshots.
+        """
+        assert not self.marks, 'Tiles can be loaded only without snapshots.'
+        for field, values in fields.items():
+            assert field in self.tile_fields
+            getattr(self, field)[:] = array(self.__typecodes[field], values)
+        self.hash = self.compute_hash()
+        self.revision = next(_revisions)
+
+    def add_player(self, ship_coords):
+        """Add the player row and return its index."""
+        x, y = ship_coords
+        self.ship_x.append(x)
+        self.ship_y.append(y)
+        self.ship_gold.append(0)
+        self.__hash_row(self.player_fields, self.n_players - 1)
+        return self.n_players - 1
+
+    def add_character(self, coords, ch_type, owner):
+        """Add the character row and return its index."""
+        if self.marks:
+            # Added rows are removed on restore.
+            self.journal.append((None, self.n_characters, None))
+        x, y = coords
+        row = {
+            'ch_x': x, 'ch_y': y, 'ch_prev_x': x, 'ch_prev_y': y, 'ch_type': ch_type,
+            'ch_state': 0, 'ch_spin': -1, 'ch_object': 0, 'ch_owner': owner, 'ch_alive': 1,
+        }
+        for field in self.character_fields:
+            getattr(self, field).append(row[field])
+        self.__hash_row(self.character_fields, self.n_characters - 1)
+        self.revision = next(_revisions)
+        return self.n_characters - 1
+
+    def __truncate_characters(self, n_characters):
+        for field in self.character_fields:
+            del getattr(self, field)[n_characters:]
+
+    def snapshot(self):
+        """Remember the current state to restore it later. Takes O(1)."""
+        self.marks.append(len(self.journal))
+        self.__hash_marks.append(self.hash)
+
+    def restore(self):
+        """Roll back to the last snapshot. Takes O(number of changes)."""
+        mark = self.marks.pop()
+        journal = self.journal
+        while len(journal) > mark:
+            values, idx, old_value = journal.pop()
+            if values is None:
+                self.__truncate_characters(idx)
+            else:
+                values[idx] = old_value
+        self.hash = self.__hash_marks.pop()
+        self.revision = next(_revisions)
+
+    def get_changes(self):
+        """Get the values changed since the last snapshot.
+
+        :return: list of (field, idx, value) with the current values, or None
+            if characters were added, as the rows can't be sent as changes
+        """
+        fields = {id(getattr(self, field)): field for field in self.hash_fields}
+        changes = {}
+        for values, idx, _ in self.journal[self.marks[-1]:]:
+            if values is None:
+                return None
+            changes[fields[id(values)], idx] = values[idx]
+        return [(field, idx, value) for (field, idx), value in changes.items()]
+
+    def apply_changes(self, changes):
+        """Apply the changes got with `get_changes` from the other state."""
+        for field, idx, value in changes:
+            self.set(getattr(self, field), idx, value)
+
+    def discard(self):
+        """Forget the last snapshot, keeping the changes made after it."""
+        self.marks.pop()
+        self.__hash_marks.pop()
+        if not self.marks:
+            self.journal.clear()
+
+    # Sizes of the map and the tables in format (width, height, players, characters, gold tiles).
+    __header = struct.Struct('<HHBHH')
+
+    def tobytes(self):
+        """Encode the state without the snapshots to bytes.
+
+        Tile type and packed direction/open/active flags take one byte per
+        tile each, gold is stored only for the tiles with gold, players and
+        characters are stored as their arrays. Values are little-endian.
+        """
+        gold = array('H')
+        for cell, amount in enumerate(self.gold):
+            if amount:
+                gold.extend((cell, amount))
+        flags = bytes(direction | is_open << 2 | active << 3 for direction, is_open, active
+                      in zip(self.direction, self.is_open, self.active))
+        chunks = [
+            self.__header.pack(self.width, self.height, self.n_players,
+                               self.n_characters, len(gold) // 2),
+            self.tile_type.tobytes(), flags, gold,
+            *(getattr(self, field) for field in self.player_fields + self.character_fields),
+        ]
+        if sys.byteorder == 'big':
+            chunks = [chunk[:] for chunk in chunks]
+            for chunk in chunks:
+                if isinstance(chunk, array):
+                    chunk.byteswap()
+        return b''.join(chunks)
+
+    @classmethod
+    def frombytes(cls, data, offset=0):
+        """Decode the state encoded with `tobytes`.
+
+        Each array is filled with one copy of its slice of the buffer
+        (`array.frombytes` copies the bytes), without decoding the values one
+        by one. The state owns its arrays and doesn't keep the buffer.
+
+        :param data: bytes-like object
+        :param offset: position of the state in the data
+        :return: tuple of (state, offset after the state)
+        """
+        data = memoryview(data)
+        width, height, n_players, n_characters, n_gold = cls.__header.unpack_from(data, offset)
+        offset += cls.__header.size
+        state = cls.__new__(cls)
+        state.width, state.height = width, height
+        state.cell_coords = get_cell_coords((width, height))
+        n_cells = width * height
+
+        def read(typecode, n_items):
+            nonlocal offset
+            values = array(typecode)
+            n_bytes = n_items * values.itemsize
+            values.frombytes(data[offset:offset + n_bytes])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset += n_bytes
+            return values
+
+        state.tile_type = read('B', n_cells)
+        flags = data[offset:offset + n_cells].tobytes()
+        offset += n_cells
+        state.direction = array('B', flags.translate(_unpack_direction))
+        state.is_open = array('B', flags.translate(_unpack_is_open))
+        state.active = array('B', flags.translate(_unpack_active))
+        state.gold = array(cls.__typecodes['gold'], [0]) * n_cells
+        gold = read('H', 2 * n_gold)
+        for cell, amount in zip(gold[::2], gold[1::2]):
+            state.gold[cell] = amount
+        for field in cls.player_fields:
+            setattr(state, field, read(cls.__typecodes[field], n_players))
+        for field in cls.character_fields:
+            setattr(state, field, read(cls.__typecodes[field], n_characters))
+        state.journal = []
+        state.marks = []
+        state.revision = next(_revisions)
+        state.__init_hash()
+        return state, offset
+
+    def copy(self):
+        """Copy of the state without the snapshots. Takes O(board)."""
+        state = GameState.__new__(GameState)
+        state.width, state.height = self.width, self.height
+        state.cell_coords = self.cell_coords
+        for field in self.hash_fields:
+            setattr(state, field, getattr(self, field)[:])
+        state.journal = []
+        state.marks = []
+        state.revision = next(_revisions)
+        state.__init_hash(self.hash)
+        return state
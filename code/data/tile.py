@@ -1,19 +1,79 @@
-from collections import Counter, defaultdict
+from collections import defaultdict
 
 
-__objects_on_open = {
-    'money_1': {'money': 1},
-    'money_2': {'money': 2},
-    'money_3': {'money': 3},
-    'money_4': {'money': 4},
-    'money_5': {'money': 5},
-}
-
+# Objects appearing on the tiles when they are opened and the number of
+# steps of the spinning tiles, filled by `code.behaviour.register_tile_type`.
 objects_on_open = defaultdict(dict)
-objects_on_open.update(__objects_on_open)
+tile_max_spin = {}
+
+
+# Ids of the tile types in the `GameState`, added by `code.behaviour.register_tile_type`.
+tile_types = []
+tile_type_ids = {}
+
+
+def add_tile_type(tile_type):
+    """Get the id of the tile type, giving the next id to the new type."""
+    if tile_type not in tile_type_ids:
+        tile_type_ids[tile_type] = len(tile_types)
+        tile_types.append(tile_type)
+    return tile_type_ids[tile_type]
+
+
+def get_tile_type_id(tile_type):
+    """Get the id of the registered tile type.
+
+    :raise KeyError: if the tile type is not registered
+    """
+    try:
+        return tile_type_ids[tile_type]
+    except KeyError:
+        raise KeyError(f'Unknown tile type: {tile_type!r}, register it with '
+                       f'`register_tile_type`.') from None
+
+
+class GoldObjects:
+    """Objects lying on the tile or the ship.
+
+    Behaves like a `Counter` of objects, but the only object in the game
+    is money, which is stored in the given `GameState` array.
+    """
+
+    def __init__(self, game_state, values, idx):
+        self.game_state = game_state
+        self.values = values
+        self.idx = idx
+
+    def __getitem__(self, obj_name):
+        if obj_name != 'money':
+            return 0
+        return self.values[self.idx]
+
+    def __setitem__(self, obj_name, value):
+        if obj_name != 'money':
+            raise KeyError(f'Unknown object: {obj_name}')
+        self.game_state.set(self.values, self.idx, value)
+
+    def __contains__(self, obj_name):
+        return self[obj_name] > 0
+
+    def __len__(self):
+        return int(self['money'] > 0)
+
+    def items(self):
+        return [('money', self['money'])] if self['money'] > 0 else []
+
+    def update(self, objects):
+        if isinstance(objects, dict):
+            objects = [obj_name for obj_name, num in objects.items() for _ in range(num)]
+        for obj_name in objects:
+            self[obj_name] += 1
 
 
 class Tile:
+    """View of one tile of the `GameState`."""
+
+    __slots__ = ('game_state', 'cell')
 
     @staticmethod
     def get_tile_dirs():
@@ -27,24 +87,55 @@ class Tile:
 
     @staticmethod
     def get_max_spin(tile_type):
-        return {
-            'spinning_2': 2,
-            'spinning_3': 3,
-            'spinning_4': 4,
-            'spinning_5': 5,
-        }[tile_type]
-
-    def __init__(self, tile_type, direction):
-        self.tile_type = tile_type
-        self.direction = direction
-        self.is_open = False
-        self.objects = Counter()
-        self.active = True
+        return tile_max_spin[tile_type]
+
+    def __init__(self, game_state, cell):
+        self.game_state = game_state
+        self.cell = cell
+
+    @property
+    def objects(self):
+        return GoldObjects(self.game_state, self.game_state.gold, self.cell)
+
+    @property
+    def tile_type_id(self):
+        return self.game_state.tile_type[self.cell]
+
+    @property
+    def tile_type(self):
+        return tile_types[self.game_state.tile_type[self.cell]]
+
+    @tile_type.setter
+    def tile_type(self, tile_type):
+        self.game_state.set(self.game_state.tile_type, self.cell, get_tile_type_id(tile_type))
+
+    @property
+    def direction(self):
+        return self.game_state.direction[self.cell] * 90
+
+    @direction.setter
+    def direction(self, direction):
+        self.game_state.set(self.game_state.direction, self.cell, direction // 90)
+
+    @property
+    def is_open(self):
+        return bool(self.game_state.is_open[self.cell])
+
+    @is_open.setter
+    def is_open(self, is_open):
+        self.game_state.set(self.game_state.is_open, self.cell, is_open)
+
+    @property
+    def active(self):
+        return bool(self.game_state.active[self.cell])
+
+    @active.setter
+    def active(self, active):
+        self.game_state.set(self.game_state.active, self.cell, active)
 
     def open(self):
         self.is_open = True
         self.objects.update(objects_on_open[self.tile_type])
-        pass
 
     def add_object(self, object: str):
         if object:
@@ -0,0 +1,80 @@
+class TranspositionTable:
+    """Bounded table of the values of positions, keyed by their hashes.
+
+    Positions reached by different move orders have the same Zobrist hash
+    (see `GameState.hash` and `GameLogic.get_hash`), so the work done for
+    one of them is reused for the others.
+
+    The table has a fixed number of buckets of two entries. The first entry
+    keeps the value of the biggest depth, i.e. the most expensive one to
+    recompute, the second one keeps the most recent value. A new value
+    replaces the first entry if its depth is not smaller, the replaced
+    value is moved to the second entry.
+    """
+
+    def __init__(self, size=1 << 16):
+        """
+        :param size: maximum number of the stored values
+        """
+        self.n_buckets = max(1, size // 2)
+        self.__keys = [None] * (2 * self.n_buckets)
+        self.__values = [None] * (2 * self.n_buckets)
+        self.__depths = [0] * (2 * self.n_buckets)
+        self.__len = 0
+        self.hits = 0
+        self.misses = 0
+        # Number of the values overwritten by the values of other positions.
+        self.replacements = 0
+
+    def __len__(self):
+        return self.__len
+
+    def __contains__(self, key):
+        i = 2 * (hash(key) % self.n_buckets)
+        keys = self.__keys
+        return keys[i] == key or keys[i + 1] == key
+
+    def get(self, key, default=None):
+        """Get the value of the position, `default` if it's not stored."""
+        i = 2 * (hash(key) % self.n_buckets)
+        keys = self.__keys
+        if keys[i] != key:
+            i += 1
+            if keys[i] != key:
+                self.misses += 1
+                return default
+        self.hits += 1
+        return self.__values[i]
+
+    def store(self, key, value, depth=0):
+        """Store the value of the position.
+
+        :param key: hash of the position, any hashable key can be used
+        :param depth: cost of the value, the values of the bigger depths are kept longer
+        """
+        i = 2 * (hash(key) % self.n_buckets)
+        keys, values, depths = self.__keys, self.__values, self.__depths
+        if keys[i] is None or keys[i] == key:
+            self.__len += keys[i] is None
+        elif keys[i + 1] != key and depth >= depths[i]:
+            # Keep the replaced value as the most recent one.
+            self.__discard(i + 1)
+            keys[i + 1], values[i + 1], depths[i + 1] = keys[i], values[i], depths[i]
+        else:
+            i += 1
+            if keys[i] != key:
+                self.__discard(i)
+        keys[i], values[i], depths[i] = key, value, depth
+
+    def __discard(self, i):
+        if self.__keys[i] is None:
+            self.__len += 1
+        else:
+            self.replacements += 1
+
+    def clear(self):
+        n_entries = 2 * self.n_buckets
+        self.__keys = [None] * n_entries
+        self.__values = [None] * n_entries
+        self.__depths = [0] * n_entries
+        self.__len = 0
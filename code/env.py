@@ -0,0 +1,198 @@
+"""Gym-style environment of the game for the reinforcement learning.
+
+The board is encoded into the fixed-shape planes of shape (n_planes, height,
+width), see `JackalEnv.plane_names`. The observation and the action mask are
+written into the same preallocated arrays on every step, copy them to keep.
+
+Usage example:
+```python
+env = JackalEnv(opponent_policy='greedy_gold', seed=0)
+observation, info = env.reset()
+done = False
+while not done:
+    action = rng.choice(np.flatnonzero(info['action_mask']))
+    observation, reward, terminated, truncated, info = env.step(action)
+    done = terminated or truncated
+```
+"""
+import random
+
+import numpy as np
+
+from code import GameLogic, GameMap
+from code.data import Coords, tile_types
+from code.simulate import policies
+
+
+class JackalEnv:
+    """Environment with the `reset()` and `step(action)` methods of Gym.
+
+    Actions are the cells `y * width + x` to move the current character to,
+    `pick_money_action` and `next_character_action`, the same as of
+    `code.batch.BatchGame`. The character without turns leaves the game by
+    moving to its own cell, unless it holds the gold which has to be
+    dropped first.
+
+    Without the opponent policy the agent plays for all the players and the
+    observation is from the side of the current player. Otherwise the agent
+    plays for the first player, the rest are played by the policy.
+    The reward is the gold brought to the ship of the agent during the step.
+    """
+
+    def __init__(self, num_of_players=4, opponent_policy=None, seed=None, max_turns=1000,
+                 map_shape=None):
+        """
+        :param opponent_policy: name of the policy of `code.simulate` or the policy itself
+        :param seed: seed of the maps and the opponents
+        :param max_turns: number of turns after which the game is truncated
+        :param map_shape: (width, height) of the maps, `GameMap.default_map_shape` if None
+        """
+        self.num_of_players = num_of_players
+        if isinstance(opponent_policy, str):
+            opponent_policy = policies[opponent_policy]
+        self.opponent_policy = opponent_policy
+        self.max_turns = max_turns
+        self.rng = random.Random(seed)
+        self.game_logic = None
+
+        self.map_shape = map_shape
+        width, height = map_shape or GameMap.default_map_shape
+        self.width, self.height = width, height
+        self.n_cells = n_cells = width * height
+        self.pick_money_action = n_cells
+        self.next_character_action = n_cells + 1
+        self.n_actions = n_cells + 2
+        self.plane_names = (
+            [f'tile_{tile_type}' for tile_type in tile_types] +
+            ['closed', 'direction_0', 'direction_90', 'direction_180', 'direction_270',
+             'active', 'gold', 'current_character', 'possible_turns', 'moved'] +
+            [f'{name}_{i}' for i in range(num_of_players)
+             for name in ('characters', 'carried_gold', 'ship')]
+        )
+        self.n_planes = len(self.plane_names)
+        self.__planes = {name: i for i, name in enumerate(self.plane_names)}
+        self.observation = np.zeros((self.n_planes, height, width), np.float32)
+        self.action_mask = np.zeros(self.n_actions, bool)
+        # Views of the observation with the cells in one axis.
+        self.__cell_planes = self.observation.reshape(self.n_planes, n_cells)
+        self.__tile_type_ids = np.arange(len(tile_types))[:, None]
+        self.__one_hot = np.zeros((len(tile_types), n_cells), bool)
+        self.__closed = np.zeros(n_cells, bool)
+
+    def reset(self, seed=None):
+        """Start the new game.
+
+        :param seed: seed of the maps and the opponents from now on
+        :return: tuple of (observation, info)
+        """
+        if seed is not None:
+            self.rng = random.Random(seed)
+        self.game_logic = GameLogic(self.num_of_players, seed=self.rng, map_shape=self.map_shape)
+        state = self.game_logic.game_state
+        # Tiles are never resized, so the views stay valid till the end of the game.
+        self.__tile_type = np.frombuffer(state.tile_type, np.uint8)
+        self.__direction = np.frombuffer(state.direction, np.uint8)
+        self.__is_open = np.frombuffer(state.is_open, np.uint8)
+        self.__active = np.frombuffer(state.active, np.uint8)
+        self.__gold = np.frombuffer(state.gold, np.uint16)
+        self.__play_opponents()
+        self.__update()
+        return self.observation, self.__get_info()
+
+    def step(self, action):
+        """Make the action of the agent and the actions of the opponents after it.
+
+        :param action: int action, must be legal in the `action_mask`
+        :return: tuple of (observation, reward, terminated, truncated, info)
+        """
+        if self.game_logic is None:
+            raise ValueError('Call `reset` before `step`.')
+        action = int(action)
+        if not 0 <= action < self.n_actions or not self.action_mask[action]:
+            raise ValueError(f'Illegal action: {action}')
+        game_logic = self.game_logic
+        player = game_logic._get_current_player()
+        gold = player.objects['money']
+        if action == self.pick_money_action:
+            game_logic.pick_money()
+        elif action == self.next_character_action:
+            game_logic.next_character()
+        else:
+            game_logic.mouse_click(Coords(action % self.width, action // self.width))
+        self.__play_opponents()
+        reward = float(player.objects['money'] - gold)
+        self.__update()
+        terminated = game_logic.is_game_over()
+        truncated = not terminated and game_logic.turn >= self.max_turns
+        return self.observation, reward, terminated, truncated, self.__get_info()
+
+    def __play_opponents(self):
+        game_logic = self.game_logic
+        if self.opponent_policy is None:
+            return
+        while not game_logic.is_game_over() and game_logic.turn < self.max_turns:
+            # Getting the character can change the current player.
+            game_logic._get_current_character()
+            if game_logic.cur_player == 0:
+                break
+            game_logic.make_action(*self.opponent_policy(game_logic, self.rng))
+
+    def __get_info(self):
+        return {
+            'action_mask': self.action_mask,
+            'player': self.game_logic.cur_player,
+            'turn': self.game_logic.turn,
+        }
+
+    def __update(self):
+        """Write the observation and the action mask of the current position."""
+        game_logic, planes, cell_planes = self.game_logic, self.__planes, self.__cell_planes
+        state = game_logic.game_state
+        self.observation.fill(0)
+        self.action_mask.fill(False)
+        if game_logic.is_game_over():
+            return
+
+        # Tiles, the types of the closed ones are hidden.
+        closed = np.equal(self.__is_open, 0, out=self.__closed)
+        one_hot = np.equal(self.__tile_type_ids, self.__tile_type, out=self.__one_hot)
+        one_hot[:, closed] = False
+        n_types = len(one_hot)
+        cell_planes[:n_types] = one_hot
+        cell_planes[planes['closed']] = closed
+        direction = planes['direction_0']
+        for i in range(4):
+            np.equal(self.__direction, i, out=one_hot[i])
+            one_hot[i, closed] = False
+            cell_planes[direction + i] = one_hot[i]
+        cell_planes[planes['active']] = self.__active
+        cell_planes[planes['gold']] = self.__gold
+
+        # Players from the side of the current one.
+        pos_turns = game_logic._get_possible_turns()
+        cur_player = game_logic.cur_player
+        for i in range(self.num_of_players):
+            player = game_logic.players[(cur_player + i) % self.num_of_players]
+            characters, carried_gold = cell_planes[planes[f'characters_{i}']], \
+                cell_planes[planes[f'carried_gold_{i}']]
+            for character in player.characters:
+                cell = state.to_cell(character.coords)
+                characters[cell] += 1
+                carried_gold[cell] += character.object is not None
+            cell_planes[planes[f'ship_{i}'], state.to_cell(player.ship_coords)] = 1
+
+        # Current character and its turns.
+        cur_char = game_logic._get_current_character()
+        cell = state.to_cell(cur_char.coords)
+        cell_planes[planes['current_character'], cell] = 1
+        turns = [state.to_cell(coords) for coords in pos_turns]
+        cell_planes[planes['possible_turns'], turns] = 1
+        cell_planes[planes['moved']] = game_logic.moved
+
+        mask = self.action_mask
+        mask[turns] = True
+        carrying = cur_char.object is not None
+        if not turns and not carrying:
+            mask[cell] = True
+        mask[self.pick_money_action] = carrying or self.__gold[cell] > 0
+        mask[self.next_character_action] = not game_logic.moved
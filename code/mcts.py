@@ -0,0 +1,311 @@
+"""Computer player choosing the actions with Monte Carlo tree search.
+
+Usage example, search from the start of the game on 4 processes:
+```cmd
+python -m code.mcts --seed 0 --iterations 2000 -j 4
+```
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from code import GameLogic
+from code.data import TranspositionTable
+from code.simulate import policies, _should_pick_money
+
+
+def get_actions(game_logic):
+    """Get the actions possible in the position.
+
+    Before the first move of the turn the action can be made by any
+    alive character, so the actions are in format (action, coords, character).
+    """
+    characters = game_logic._get_alive_characters()
+    cur_character = game_logic.cur_character
+    ch_indices = [cur_character] if game_logic.moved else range(len(characters))
+    actions = []
+    for i in ch_indices:
+        game_logic.cur_character = i
+        cur_char = characters[i]
+        pos_turns = game_logic._get_possible_turns()
+        actions.extend(('move', coords, i) for coords in pos_turns)
+        if not pos_turns:
+            # Drop the money to be able to leave the character, or leave it.
+            if cur_char.object is not None:
+                actions.append(('pick_money', None, i))
+            else:
+                actions.append(('move', cur_char.coords, i))
+        elif _should_pick_money(game_logic, cur_char):
+            actions.append(('pick_money', None, i))
+    game_logic.cur_character = cur_character
+    return actions
+
+
+def make_action(game_logic, action):
+    """Make the action got from `get_actions`."""
+    name, coords, character = action
+    while game_logic.cur_character != character:
+        game_logic.next_character()
+    game_logic.make_action(name, coords)
+
+
+def evaluate(game_logic):
+    """Get the score of each player in [0, 1], the scores sum to 1.
+
+    The score counts the gold on the ship, the gold carried by the
+    characters at a half and the alive characters.
+    """
+    scores = []
+    for player in game_logic.players:
+        alive = [ch for ch in player.characters if ch.state != 'trapped']
+        carried = sum(ch.object == 'money' for ch in alive)
+        scores.append(player.objects['money'] + 0.5 * carried + 0.3 * len(alive) + 0.01)
+    total = sum(scores)
+    return [score / total for score in scores]
+
+
+class Node:
+    """Node of the search tree, the position after the action of the parent."""
+
+    __slots__ = ('player', 'actions', 'children', 'visits', 'values')
+
+    def __init__(self, game_logic):
+        self.player = game_logic.cur_player
+        self.actions = None
+        # Children in format {action: Node}.
+        self.children = {}
+        self.visits = 0
+        # Sum of the scores of each player.
+        self.values = [0.] * game_logic.num_of_players
+
+    def select(self, c):
+        """Select the child with the best UCT for the player of the node."""
+        log_visits = math.log(self.visits)
+        player = self.player
+        return max(self.children.items(),
+                   key=lambda item: (item[1].values[player] / item[1].visits +
+                                     c * math.sqrt(log_visits / item[1].visits)))
+
+
+class MCTS:
+    """Monte Carlo tree search over the game positions.
+
+    The positions are changed in place and rolled back with
+    `GameLogic.snapshot`/`restore`, so the iteration doesn't copy the game.
+    Nodes are shared by the positions reached by different move orders,
+    they are found by `GameLogic.get_hash` in the transposition table.
+    """
+
+    def __init__(self, rollout_policy='greedy_gold', rollout_turns=40, max_rollout_actions=600,
+                 c=0.7, seed=None, table_size=1 << 16):
+        """
+        :param rollout_policy: name of the policy of the rollouts, one of `code.simulate.policies`
+        :param rollout_turns: number of turns played in a rollout before the evaluation
+        :param max_rollout_actions: number of actions after which the rollout is stopped
+        :param c: exploration constant of UCT
+        :param table_size: maximum number of the nodes in the transposition table
+        """
+        self.rollout_policy = policies[rollout_policy]
+        self.rollout_turns = rollout_turns
+        self.max_rollout_actions = max_rollout_actions
+        self.c = c
+        self.rng = random.Random(seed)
+        self.nodes = TranspositionTable(table_size)
+
+    def search(self, game_logic, iterations=None, time_limit=None):
+        """Search from the position of the game, the game is not changed.
+
+        :param iterations: number of the iterations, unlimited if None
+        :param time_limit: time of the search in seconds, unlimited if None
+        :return: tuple of (root node, number of iterations made)
+        """
+        assert iterations is not None or time_limit is not None, 'Search needs a budget.'
+        game_logic = game_logic.copy()
+        game_logic.controllers = {}
+        self.nodes.clear()
+        root = Node(game_logic)
+        self.nodes.store(game_logic.get_hash(), root)
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        n_iterations = 0
+        while ((iterations is None or n_iterations < iterations) and
+               (deadline is None or time.perf_counter() < deadline)):
+            game_logic.snapshot()
+            self.iterate(game_logic, root)
+            game_logic.restore()
+            n_iterations += 1
+        return root, n_iterations
+
+    def iterate(self, game_logic, root):
+        node, path = root, [root]
+        # Select the leaf.
+        while node.actions is not None and not node.actions and node.children:
+            action, node = node.select(self.c)
+            make_action(game_logic, action)
+            if node in path:
+                # Transpositions can make cycles, play out the repeated position.
+                break
+            path.append(node)
+        else:
+            # Expand it.
+            if not game_logic.is_game_over():
+                if node.actions is None:
+                    node.actions = get_actions(game_logic)
+                    self.rng.shuffle(node.actions)
+                if node.actions:
+                    action = node.actions.pop()
+                    make_action(game_logic, action)
+                    child = node.children[action] = self.get_node(game_logic)
+                    if child not in path:
+                        path.append(child)
+        # Play it out and update the path.
+        scores = self.rollout(game_logic)
+        for node in path:
+            node.visits += 1
+            for i, score in enumerate(scores):
+                node.values[i] += score
+
+    def get_node(self, game_logic):
+        """Get the node of the position, creating it if it's not in the table."""
+        key = game_logic.get_hash()
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(game_logic)
+            self.nodes.store(key, node)
+        return node
+
+    def rollout(self, game_logic):
+        end_turn = game_logic.turn + self.rollout_turns
+        for _ in range(self.max_rollout_actions):
+            if game_logic.is_game_over() or game_logic.turn >= end_turn:
+                break
+            game_logic.make_action(*self.rollout_policy(game_logic, self.rng))
+        return evaluate(game_logic)
+
+
+def _search_worker(args):
+    game_logic, mcts_params, iterations, time_limit = args
+    root, n_iterations = MCTS(**mcts_params).search(game_logic, iterations, time_limit)
+    stats = {action: (child.visits, child.values[root.player])
+             for action, child in root.children.items()}
+    return stats, n_iterations
+
+
+class MCTSPlayer:
+    """Policy of the computer player, can be set as `GameLogic.controllers`.
+
+    With several processes, each of them searches its own tree from the
+    position and the visits of the root actions are summed.
+    """
+
+    def __init__(self, iterations=None, time_limit=1., processes=1, seed=None, **mcts_params):
+        """
+        :param iterations: number of the iterations per action of each process
+        :param time_limit: time of the search per action in seconds
+        :param processes: number of processes of the search
+        :param mcts_params: parameters of `MCTS`
+        """
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.processes = processes
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.mcts_params = mcts_params
+        self.pool = None
+        # Primitive actions left of the chosen one, with the turn and player they are for.
+        self.__plan = deque()
+        self.__plan_for = None
+        # Stats of the last search.
+        self.n_iterations = 0
+        self.rollouts_per_second = 0.
+
+    def search(self, game_logic):
+        """Search for the best action.
+
+        :return: action in format (action, coords, character)
+        """
+        start = time.perf_counter()
+        tasks = []
+        for i in range(self.processes):
+            self.seed += 1
+            tasks.append((game_logic, dict(self.mcts_params, seed=self.seed),
+                          self.iterations, self.time_limit))
+        if self.processes == 1:
+            results = [_search_worker(tasks[0])]
+        else:
+            if self.pool is None:
+                self.pool = Pool(self.processes)
+            results = self.pool.map(_search_worker, tasks)
+        visits = {}
+        for stats, _ in results:
+            for action, (n_visits, _) in stats.items():
+                visits[action] = visits.get(action, 0) + n_visits
+        self.n_iterations = sum(n_iterations for _, n_iterations in results)
+        self.rollouts_per_second = self.n_iterations / (time.perf_counter() - start)
+        return max(visits, key=visits.get)
+
+    def __call__(self, game_logic, rng=None):
+        """Choose the action in the format of `code.simulate` policies."""
+        # The hash of the state is the same in the copies of the game, e.g. searched in a thread.
+        key = (game_logic.turn, game_logic.cur_player, game_logic.game_state.hash)
+        if not self.__plan or self.__plan_for != key:
+            self.__plan.clear()
+            name, coords, character = self.search(game_logic)
+            # Switch to the character first.
+            n_switches = (character - game_logic.cur_character) % len(game_logic._get_alive_characters())
+            self.__plan.extend([('next_character', None)] * n_switches)
+            self.__plan.append((name, coords))
+        self.__plan_for = key
+        return self.__plan.popleft()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+
+def play_match(seed, mcts_player, opponent='greedy_gold', max_turns=300):
+    """Play the game of the MCTS player as red against the opponent policy.
+
+    :return: gold of each player
+    """
+    game_logic = GameLogic(4, seed=seed)
+    game_logic.controllers = {pl.color: policies[opponent] for pl in game_logic.players}
+    game_logic.controllers['red'] = mcts_player
+    rng = random.Random(seed)
+    while not game_logic.is_game_over() and game_logic.turn < max_turns:
+        game_logic.make_action(*game_logic.get_controller()(game_logic, rng))
+    return {pl.color: pl.objects['money'] for pl in game_logic.players}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search the action with MCTS.')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the game')
+    parser.add_argument('--iterations', type=int, default=None, help='iterations per process')
+    parser.add_argument('--time', type=float, default=1., help='search time per action')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes')
+    parser.add_argument('--rollout-policy', choices=policies, default='greedy_gold')
+    parser.add_argument('--match', type=int, default=0,
+                        help='play the games against the greedy bots instead')
+    args = parser.parse_args(argv)
+
+    time_limit = None if args.iterations is not None else args.time
+    player = MCTSPlayer(args.iterations, time_limit, args.jobs, seed=args.seed,
+                        rollout_policy=args.rollout_policy)
+    try:
+        if args.match:
+            for seed in range(args.seed, args.seed + args.match):
+                print(f'Game {seed}: {play_match(seed, player)}')
+        else:
+            action = player.search(GameLogic(4, seed=args.seed))
+            print(f'Best action: {action}')
+        print(f'{player.n_iterations} rollouts, {player.rollouts_per_second:.0f} rollouts/s',
+              file=sys.stderr)
+    finally:
+        player.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Opt-in timing of the hot paths of the game.
+
+Usage example:
+```python
+profiler = Profiler(trace=True)
+with profiler:
+    play_game(0, seed=0)
+profiler.write_json('profiles/profile.json')
+profiler.write_chrome_trace('profiles/profile.trace.json')
+```
+The trace can be opened in `chrome://tracing` or Perfetto.
+"""
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from code import GameLogic
+
+
+# Instrumented functions in format (module, owner, attribute), the owner is
+# the name of the class or None for the functions of the module.
+engine_targets = [
+    ('code.GameLogic', 'GameLogic', '_get_possible_turns'),
+    ('code.GameLogic', 'GameLogic', 'detect_cycles'),
+    ('code.behaviour.chainAnalyzer', 'ChainAnalyzer', 'analyze'),
+    ('code.GameLogic', None, 'start_step'),
+    ('code.GameLogic', None, 'finish_step'),
+]
+
+render_targets = [
+    ('code.render.renderer', 'GameRenderer', 'display_map'),
+    ('code.render.renderer', 'GameRenderer', 'display_tile'),
+    ('code.render.renderer', 'GameRenderer', 'display_objects_on_map'),
+    ('code.render.renderer', 'GameRenderer', 'display_objects'),
+    ('code.render.renderer', 'GameRenderer', 'display_players'),
+    ('code.render.renderer', 'GameRenderer', 'display_possible_turns'),
+]
+
+
+def get_default_targets():
+    """Get the engine targets and the render ones if Qt is available."""
+    try:
+        importlib.import_module('code.render.renderer')
+    except ImportError:
+        return list(engine_targets)
+    return engine_targets + render_targets
+
+
+class Profiler:
+    """Records the wall time and number of calls of the instrumented functions.
+
+    Functions are wrapped only inside the `with` block, so there is no
+    overhead when the profiler is not used. Stats are aggregated by the
+    turn of the game in which the call was made.
+    """
+
+    def __init__(self, targets=None, trace=False):
+        """
+        :param targets: functions to instrument, `get_default_targets()` if None
+        :param trace: keep every call to export it as a Chrome trace
+        """
+        self.targets = get_default_targets() if targets is None else targets
+        self.trace = trace
+        # Stats in format {turn: {name: [calls, total seconds]}}.
+        self.stats = defaultdict(lambda: defaultdict(lambda: [0, 0.]))
+        # Calls in format (name, turn, start, duration).
+        self.events = []
+        self.turn = 0
+        self.start_time = time.perf_counter()
+        self.__originals = []
+
+    def __enter__(self):
+        self.instrument()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstrument()
+
+    def instrument(self):
+        for module_name, owner_name, attr in self.targets:
+            module = importlib.import_module(module_name)
+            owner = module if owner_name is None else getattr(module, owner_name)
+            func = vars(owner)[attr]
+            name = attr if owner_name is None else f'{owner_name}.{attr}'
+            self.__originals.append((owner, attr, func))
+            setattr(owner, attr, self.__wrap(name, func))
+
+    def uninstrument(self):
+        while self.__originals:
+            owner, attr, func = self.__originals.pop()
+            setattr(owner, attr, func)
+
+    def __wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Take the turn from the game logic passed to the call.
+            for arg in args[:2]:
+                if isinstance(arg, GameLogic):
+                    self.turn = arg.turn
+                    break
+            turn = self.turn
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                stats = self.stats[turn][name]
+                stats[0] += 1
+                stats[1] += duration
+                if self.trace:
+                    self.events.append((name, turn, start, duration))
+        return wrapper
+
+    def get_totals(self):
+        """Get the stats of all the turns in format {name: [calls, total seconds]}."""
+        totals = defaultdict(lambda: [0, 0.])
+        for turn_stats in self.stats.values():
+            for name, (calls, total) in turn_stats.items():
+                totals[name][0] += calls
+                totals[name][1] += total
+        return totals
+
+    def to_dict(self):
+        def stats_to_dict(stats):
+            return {name: {'calls': calls, 'total_ms': 1000 * total,
+                           'mean_us': 1e6 * total / calls}
+                    for name, (calls, total) in sorted(stats.items())}
+
+        return {
+            'totals': stats_to_dict(self.get_totals()),
+            'turns': {turn: stats_to_dict(stats) for turn, stats in sorted(self.stats.items())},
+        }
+
+    @staticmethod
+    def __open(path):
+        """Open the file for writing, creating its directory."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return open(path, 'w')
+
+    def write_json(self, path):
+        with self.__open(path) as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def write_chrome_trace(self, path):
+        """Write the calls in the Chrome trace event format."""
+        if not self.trace:
+            raise ValueError('Calls are kept only with `trace=True`.')
+        pid, tid = os.getpid(), threading.get_ident()
+        trace_events = [
+            {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+             'ts': 1e6 * (start - self.start_time), 'dur': 1e6 * duration,
+             'args': {'turn': turn}}
+            for name, turn, start, duration in self.events
+        ]
+        with self.__open(path) as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file)
+
+    def format_totals(self):
+        """Format the totals as a table sorted by the total time."""
+        lines = [f'{"function":<40}{"calls":>10}{"total ms":>12}{"mean us":>10}']
+        totals = sorted(self.get_totals().items(), key=lambda item: -item[1][1])
+        for name, (calls, total) in totals:
+            lines.append(f'{name:<40}{calls:>10}{1000 * total:>12.1f}{1e6 * total / calls:>10.1f}')
+        return '\n'.join(lines)
@@ -0,0 +1,3 @@
+from code.render.renderer import GameRenderer, color_to_rgb
+from code.render.layers import BoardLayer, TileTracker
+from code.render.atlas import SpritePyramid, TileAtlas, get_sprite_pyramid, get_tile_atlas
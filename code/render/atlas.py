@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+
+from code.data import Tile, tile_types
+
+from PyQt5.QtGui import QImage, QPainter, QTransform
+from PyQt5.QtCore import Qt, QRect, QRectF
+
+
+def get_image_path(images_path, name, placeholder='back'):
+    """Get the path of the image, the placeholder is used for the names without the image file."""
+    path = os.path.join(images_path, f'{name}.png')
+    if not os.path.exists(path):
+        path = os.path.join(images_path, f'{placeholder}.png')
+    return path
+
+
+class SpritePyramid:
+    """Smooth-scaled copies of the tile images, halved in size from level to level.
+
+    Images of any size are scaled from the nearest bigger level, so a big
+    downscale never skips the pixels of the source image.
+    """
+
+    def __init__(self, images_path, names, max_size=256, min_size=8):
+        """
+        :param names: names of the images, without the extension
+        :param max_size: size of the first level, the biggest size of the sprites
+        :param min_size: size of the last level
+        """
+        self.sizes = []
+        size = max_size
+        while size >= min_size:
+            self.sizes.append(size)
+            size //= 2
+        # Levels in format {name: [image of each of the sizes]}.
+        self.levels = {}
+        for name in names:
+            image = QImage(get_image_path(images_path, name))
+            level = [image.scaled(max_size, max_size, transformMode=Qt.SmoothTransformation)]
+            for size in self.sizes[1:]:
+                level.append(level[-1].scaled(size, size, transformMode=Qt.SmoothTransformation))
+            self.levels[name] = level
+
+    def get(self, name, size) -> QImage:
+        """Get the image of the size, scaled from the nearest bigger level."""
+        level = self.levels[name]
+        i = len(self.sizes) - 1
+        while i > 0 and self.sizes[i] < size:
+            i -= 1
+        if self.sizes[i] == size:
+            return level[i]
+        return level[i].scaled(size, size, transformMode=Qt.SmoothTransformation)
+
+
+_pyramids = {}
+
+
+def get_sprite_pyramid(images_path):
+    """Get the pyramid of the tile images, it is built again after a new tile type is registered."""
+    key = (os.path.abspath(images_path), len(tile_types))
+    if key not in _pyramids:
+        _pyramids[key] = SpritePyramid(images_path, sorted(TileAtlas.get_image_names()))
+    return _pyramids[key]
+
+
+class TileAtlas:
+    """All the tile images of one size in a single image.
+
+    Each registered tile type is stored in a row with one column for each of
+    the tile directions, so the tiles are drawn without scaling or rotation.
+    The types without the image file are drawn with the image of the back.
+    The images are taken from the `SpritePyramid`. The atlas is saved to the
+    cache dir and loaded from it next time, the file name is changed by the
+    tile size, the build version and the changes of the images.
+    """
+
+    # Changed on the changes of the build, so the old cache files are not used.
+    build_version = 2
+    # Quality of the saved PNG, the higher one is compressed less.
+    png_quality = 90
+
+    def __init__(self, images_path, tile_size, cache_path=None):
+        self.tile_size = tile_size
+        # Number of the registered tile types the atlas is built for.
+        self.n_registered = len(tile_types)
+        self.tile_types = sorted(self.get_image_names())
+        self.directions = Tile.get_tile_dirs()
+        self.__rows = {tile_type: i for i, tile_type in enumerate(self.tile_types)}
+        self.__columns = {direction: i for i, direction in enumerate(self.directions)}
+        # Loaded from the cache file, None if it's built.
+        self.cache_file = None
+        # Thread saving the built atlas, None if it's loaded.
+        self.saving = None
+        cache_file = None
+        if cache_path is not None:
+            cache_file = os.path.join(cache_path, self.get_cache_name(images_path))
+        image = QImage(cache_file) if cache_file is not None else QImage()
+        if not image.isNull():
+            self.image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+            self.cache_file = cache_file
+        else:
+            self.image = self.build(images_path)
+            if cache_file is not None:
+                # Saved in the background, as the big atlases take a second to save.
+                self.saving = threading.Thread(target=self.save, args=(cache_file,))
+                self.saving.start()
+
+    def save(self, path):
+        """Save the atlas, the other processes never read the partly written file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        # Less compression, as the big atlases take seconds to compress.
+        self.image.save(temp_path, 'PNG', self.png_quality)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def get_image_names():
+        names = set(tile_types)
+        names.discard('water')
+        names.update(['back', 'boat_black', 'boat_red', 'boat_white', 'boat_yellow'])
+        return names
+
+    def is_outdated(self):
+        """Whether a tile type was registered after the atlas was built."""
+        return self.n_registered != len(tile_types)
+
+    def get_cache_name(self, images_path):
+        """Name of the cache file, changed on any change of the images."""
+        source = hashlib.sha1(f'{self.tile_size}:{self.build_version}'.encode())
+        for tile_type in self.tile_types:
+            stat = os.stat(get_image_path(images_path, tile_type))
+            source.update(f'{tile_type}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return f'atlas_{self.tile_size}_{source.hexdigest()[:16]}.png'
+
+    def build(self, images_path):
+        size = self.tile_size
+        image = QImage(size * len(self.directions), size * len(self.tile_types),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        pyramid = get_sprite_pyramid(images_path)
+        for tile_type in self.tile_types:
+            tile_image = pyramid.get(tile_type, size)
+            for direction in self.directions:
+                rotated = tile_image.transformed(QTransform().rotate(direction))
+                painter.drawImage(self.get_rect(tile_type, direction).topLeft(), rotated)
+        painter.end()
+        return image
+
+    def get_rect(self, tile_type, direction=0):
+        """Get the rect of the tile image in the atlas."""
+        size = self.tile_size
+        return QRect(self.__columns[direction] * size, self.__rows[tile_type] * size, size, size)
+
+    def draw(self, painter: QPainter, pos, tile_type, direction=0):
+        painter.drawImage(pos, self.image, QRectF(self.get_rect(tile_type, direction)))
+
+
+_atlases = {}
+
+
+def get_tile_atlas(images_path, tile_size, cache_path=None):
+    """Get the atlas of the tile images of the size.
+
+    It is built once per process and again after a new tile type is registered.
+
+    :param cache_path: dir of the saved atlases, `.cache` in the images dir if None
+    """
+    key = (os.path.abspath(images_path), tile_size, len(tile_types))
+    if key not in _atlases:
+        if cache_path is None:
+            cache_path = os.path.join(images_path, '.cache')
+        _atlases[key] = TileAtlas(images_path, tile_size, cache_path)
+    return _atlases[key]
@@ -0,0 +1,285 @@
+"""Offscreen rendering of the games to image files, without the game window.
+
+The frames of the replay logs, saved games or simulated games are drawn with
+`GameRenderer` into `QImage`s in a pool of processes. The positions are
+restored in the main process and sent to the workers encoded, so the frames
+are rendered in any order and written in the order of the game.
+
+Each game is written to `<output>/<name>/frame_00000.png`, or to one animated
+PNG `<output>/<name>.png` with `--animate`. Games of one frame, e.g. saved
+games, are written to `<output>/<name>.png`.
+
+Usage example:
+```cmd
+python -m code.render.export replay.jkr savegame.jkl -o frames
+python -m code.render.export --simulate 20 --policy greedy_gold --animate --tile-size 16 -o review
+```
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from multiprocessing import Pool
+
+# Rendering doesn't need the display.
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import QGuiApplication, QImage, QPainter, QColor
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+
+from code import GameLogic
+from code.render.renderer import GameRenderer
+from code.replay import MAGIC as REPLAY_MAGIC, Replay
+from code.serialization import encode, decode
+from code.simulate import policies
+
+# Color of the water, the same as the background of the game window.
+background_color = (3, 102, 196)
+# Quality of `QImage.save`, the lower zlib compression takes most of the time of the frame.
+png_quality = 80
+
+
+def render_frame(renderer: GameRenderer, game_logic) -> QImage:
+    """Draw the game into a new image of the size of the map."""
+    # The frames are opaque, the images without alpha are saved faster.
+    image = QImage(*renderer.get_map_shape(game_logic.game_map), QImage.Format_RGB32)
+    image.fill(QColor(*background_color))
+    painter = QPainter(image)
+    renderer.display_frame(painter, game_logic)
+    painter.end()
+    return image
+
+
+def to_png(image: QImage) -> bytes:
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG', png_quality)
+    buffer.close()
+    return bytes(data)
+
+
+class AnimatedPngWriter:
+    """Writes the PNG images of the same size as the frames of one animated PNG (APNG).
+
+    Viewers without the support of APNG show the first frame.
+    """
+
+    __signature = b'\x89PNG\r\n\x1a\n'
+
+    def __init__(self, file, n_frames, delay=0.5, n_plays=0):
+        """
+        :param file: binary file to write to
+        :param n_frames: number of the frames to be added
+        :param delay: time of each frame in seconds
+        :param n_plays: number of the plays of the animation, 0 to loop forever
+        """
+        self.file = file
+        self.n_frames = n_frames
+        self.delay = delay
+        self.n_plays = n_plays
+        self.n_added = 0
+        # Sequence number of the frame control and frame data chunks.
+        self.__sequence = 0
+
+    def __write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def __next_sequence(self):
+        self.__sequence += 1
+        return self.__sequence - 1
+
+    @classmethod
+    def read_chunks(cls, png):
+        """Read the chunks of the PNG image.
+
+        :return: list of (chunk type, data)
+        """
+        if png[:8] != cls.__signature:
+            raise ValueError('Data is not a PNG image.')
+        chunks, offset = [], 8
+        while offset < len(png):
+            length, chunk_type = struct.unpack_from('>I4s', png, offset)
+            chunks.append((chunk_type, png[offset + 8:offset + 8 + length]))
+            offset += length + 12
+        return chunks
+
+    def add_frame(self, png):
+        """Add the PNG image as the next frame."""
+        if self.n_added >= self.n_frames:
+            raise ValueError(f'Only {self.n_frames} frames can be added.')
+        chunks = self.read_chunks(png)
+        header = next(data for chunk_type, data in chunks if chunk_type == b'IHDR')
+        if self.n_added == 0:
+            self.file.write(self.__signature)
+            self.__write_chunk(b'IHDR', header)
+            self.__write_chunk(b'acTL', struct.pack('>II', self.n_frames, self.n_plays))
+        width, height = struct.unpack_from('>II', header)
+        delay_ms = round(self.delay * 1000)
+        # The frame covers the whole image and replaces the previous one.
+        self.__write_chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.__next_sequence(), width,
+                                                height, 0, 0, delay_ms, 1000, 0, 0))
+        for chunk_type, data in chunks:
+            if chunk_type != b'IDAT':
+                continue
+            if self.n_added == 0:
+                # The first frame is the default image.
+                self.__write_chunk(b'IDAT', data)
+            else:
+                self.__write_chunk(b'fdAT', struct.pack('>I', self.__next_sequence()) + data)
+        self.n_added += 1
+        if self.n_added == self.n_frames:
+            self.__write_chunk(b'IEND', b'')
+
+
+def replay_frames(replay: Replay, every='turn'):
+    """Get the encoded positions of the replay log.
+
+    :param every: 'turn' for the positions at the start of each turn and the last one,
+        'action' for the positions after each action
+    :return: list of the encoded positions
+    """
+    game_logic = replay.seek_action(0)
+    frames = [encode(game_logic)]
+    for i in range(len(replay.actions)):
+        turn = game_logic.turn
+        replay.replay(game_logic, i, i + 1)
+        if every == 'action' or game_logic.turn != turn:
+            frames.append(encode(game_logic))
+    if every == 'turn' and replay.actions and game_logic.turn == turn:
+        frames.append(encode(game_logic))
+    return frames
+
+
+def simulated_frames(seed, num_of_players=4, policy='random', max_turns=300, every='turn',
+                     map_shape=None):
+    """Play the game with the policy for all players, see `code.simulate.play_game`.
+
+    :return: list of the encoded positions, see `replay_frames`
+    """
+    choose_action = policies[policy]
+    rng = random.Random(seed)
+    game_logic = GameLogic(num_of_players, seed=seed, map_shape=map_shape)
+    frames = [encode(game_logic)]
+    while not game_logic.is_game_over() and game_logic.turn < max_turns:
+        turn = game_logic.turn
+        game_logic.make_action(*choose_action(game_logic, rng))
+        if every == 'action' or game_logic.turn != turn or game_logic.is_game_over():
+            frames.append(encode(game_logic))
+    return frames
+
+
+# Application and renderer of the worker process.
+_app, _renderer = None, None
+
+
+def _init_worker(tile_size, images_path):
+    global _renderer, _app
+    # Fonts of the text need the application.
+    _app = QGuiApplication.instance() or QGuiApplication([])
+    _renderer = GameRenderer(tile_size, images_path)
+
+
+def _render_png(data):
+    return to_png(render_frame(_renderer, decode(data)))
+
+
+def export_games(games, output, tile_size=64, images_path='tile_images', animate=False,
+                 delay=0.5, processes=None):
+    """Render the games and write them to the image files.
+
+    :param games: list of (name, list of the encoded positions)
+    :param output: directory to write to
+    :param animate: write each game to one animated PNG instead of the frame files
+    :param delay: time of each frame of the animation in seconds
+    :param processes: number of the rendering processes, all the cores if None
+    :return: number of the rendered frames
+    """
+    tasks = [data for _, frames in games for data in frames]
+    if processes == 1:
+        _init_worker(tile_size, images_path)
+        pngs = map(_render_png, tasks)
+        pool = None
+    else:
+        n_workers = processes or os.cpu_count() or 1
+        pool = Pool(n_workers, initializer=_init_worker, initargs=(tile_size, images_path))
+        chunksize = max(1, len(tasks) // (n_workers * 8))
+        pngs = pool.imap(_render_png, tasks, chunksize=chunksize)
+    os.makedirs(output, exist_ok=True)
+    try:
+        for name, frames in games:
+            if len(frames) == 1:
+                with open(os.path.join(output, f'{name}.png'), 'wb') as file:
+                    file.write(next(pngs))
+            elif animate:
+                with open(os.path.join(output, f'{name}.png'), 'wb') as file:
+                    writer = AnimatedPngWriter(file, len(frames), delay)
+                    for _ in frames:
+                        writer.add_frame(next(pngs))
+            else:
+                game_path = os.path.join(output, name)
+                os.makedirs(game_path, exist_ok=True)
+                for i in range(len(frames)):
+                    with open(os.path.join(game_path, f'frame_{i:05d}.png'), 'wb') as file:
+                        file.write(next(pngs))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return len(tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the games to PNG files offscreen.')
+    parser.add_argument('inputs', nargs='*',
+                        help='replay logs (.jkr) and saved games, named by their files')
+    parser.add_argument('-o', '--output', default='frames', help='output directory')
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+                        help='also play N games with the policy, named game_<seed>')
+    parser.add_argument('--policy', choices=policies, default='random')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first simulated game')
+    parser.add_argument('--max-turns', type=int, default=300,
+                        help='number of turns of the simulated games')
+    parser.add_argument('--every', choices=['turn', 'action'], default='turn',
+                        help='render the position at the start of each turn or after each action')
+    parser.add_argument('--animate', action='store_true',
+                        help='write each game to one animated PNG')
+    parser.add_argument('--delay', type=float, default=0.5,
+                        help='time of each frame of the animation in seconds')
+    parser.add_argument('--tile-size', type=int, default=64, help='size of the tiles in pixels')
+    parser.add_argument('--images', default='tile_images', help='directory of the tile images')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of processes, all cores by default')
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.simulate:
+        parser.error('Nothing to render, give the inputs or --simulate.')
+
+    start_time = time.perf_counter()
+    games = []
+    for path in args.inputs:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as file:
+            data = file.read()
+        if data[:len(REPLAY_MAGIC)] == REPLAY_MAGIC:
+            frames = replay_frames(Replay(data), args.every)
+        else:
+            frames = [encode(decode(data))]
+        games.append((name, frames))
+    for seed in range(args.seed, args.seed + args.simulate):
+        games.append((f'game_{seed}', simulated_frames(seed, policy=args.policy,
+                                                       max_turns=args.max_turns,
+                                                       every=args.every)))
+    n_frames = export_games(games, args.output, args.tile_size, args.images, args.animate,
+                            args.delay, args.jobs)
+    elapsed = time.perf_counter() - start_time
+    print(f'{n_frames} frames of {len(games)} games in {elapsed:.2f}s '
+          f'({n_frames / elapsed:.1f} frames/s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from code.data import Coords
+
+from PyQt5.QtGui import QPainter, QPixmap, QColor
+from PyQt5.QtCore import Qt, QPoint, QPointF
+
+
+class TileTracker:
+    """Finds the tiles which look different since the last frame.
+
+    Each tile gets a signature of everything drawn on it: the tile image,
+    objects, characters, ships and possible turns. Only the tiles of the
+    `GameState` changes since the last frame, of the moved characters and
+    ships and of the changed turns are compared. The tracker keeps a
+    snapshot of the state to get the changes with `GameState.get_changes`.
+    """
+
+    def __init__(self):
+        self.game_state = None
+        self.reset()
+
+    def reset(self):
+        """Compare all the tiles on the next update, e.g. when the game is replaced."""
+        if self.game_state is not None and self.game_state.marks:
+            self.game_state.discard()
+        self.game_state = None
+        self.signatures = {}
+        # Coords of the last frame in format {row: coords}, of the alive characters
+        # and the ships of the players.
+        self.characters = {}
+        self.ships = {}
+        self.turns = set()
+        self.cur_coords = None
+
+    @staticmethod
+    def get_signature(game_logic, coords, cur_char, turns, ships):
+        """Get the signature of the tile.
+
+        :param ships: (player color, gold) of the ships in format {coords: tuple}
+        """
+        state = game_logic.game_state
+        cell = state.to_cell(coords)
+        characters = tuple((color, ch.state, ch.spin_counter, ch.object, ch is cur_char)
+                           for ch, color in game_logic.position_index.get(coords, ()))
+        return ((state.tile_type[cell], state.direction[cell], state.is_open[cell]),
+                state.gold[cell], characters, ships.get(coords, ()), coords in turns)
+
+    @staticmethod
+    def get_ships(game_logic):
+        ships = defaultdict(tuple)
+        for player in game_logic.players:
+            ships[player.ship_coords] += ((player.color, player.objects['money']),)
+        return ships
+
+    @classmethod
+    def get_signatures(cls, game_logic, tiles=None):
+        """Get the signatures of the tiles, of all of them if None."""
+        cur_char = game_logic._get_current_character()
+        turns = set(game_logic._get_possible_turns())
+        ships = cls.get_ships(game_logic)
+        if tiles is None:
+            tiles = game_logic.game_state.cell_coords
+        return {coords: cls.get_signature(game_logic, coords, cur_char, turns, ships)
+                for coords in tiles}
+
+    def __get_changed_tiles(self, state, characters, ships, turns, cur_coords):
+        """Get the tiles which can look different since the last frame, None if unknown."""
+        changes = state.get_changes() if state is self.game_state else None
+        if changes is None:
+            return None
+        tiles = turns ^ self.turns
+        tiles.update((self.cur_coords, cur_coords))
+        for field, idx, _ in changes:
+            if field in state.tile_fields:
+                tiles.add(state.cell_coords[idx])
+                continue
+            rows = (self.characters, characters) if field in state.character_fields else \
+                (self.ships, ships)
+            # Both the old and the new tile of the character or ship.
+            for coords_by_row in rows:
+                if idx in coords_by_row:
+                    tiles.add(coords_by_row[idx])
+        return tiles
+
+    def update(self, game_logic):
+        """Remember the current frame and compare it with the previous one.
+
+        :return: tuple of (changed tiles, tiles with changed image)
+        """
+        state = game_logic.game_state
+        cur_coords = game_logic._get_current_character().coords
+        turns = set(game_logic._get_possible_turns())
+        characters = {ch.row: ch.coords for player in game_logic.players
+                      for ch in player.characters}
+        ships = {player.row: player.ship_coords for player in game_logic.players}
+        tiles = self.__get_changed_tiles(state, characters, ships, turns, cur_coords)
+        tracked = tiles is not None
+        if not tracked:
+            # Other game or the added characters, all the tiles are compared.
+            self.reset()
+            self.game_state = state
+        else:
+            tiles = sorted(tiles, key=state.to_cell)
+        signatures = self.get_signatures(game_logic, tiles)
+        changed, changed_images = [], []
+        for coords, signature in signatures.items():
+            old_signature = self.signatures.get(coords)
+            if old_signature == signature:
+                continue
+            changed.append(coords)
+            if old_signature is None or old_signature[0] != signature[0]:
+                changed_images.append(coords)
+        self.signatures.update(signatures)
+        self.characters, self.ships, self.turns, self.cur_coords = (characters, ships, turns,
+                                                                     cur_coords)
+        # Changes of the next frame are counted from here.
+        if tracked:
+            state.discard()
+        state.snapshot()
+        return changed, changed_images
+
+
+class BoardLayer:
+    """Cached image of the map tiles of one tile size, redrawn tile by tile.
+
+    The image is in the coords of the board, it's moved to the offset of the
+    view of the renderer when drawn.
+    """
+
+    def __init__(self, renderer, game_logic):
+        self.renderer = renderer
+        self.tile_size = renderer.tile_size
+        # Tiles changed while the layer of the other tile size is shown.
+        self.stale_tiles = set()
+        self.pixmap = QPixmap(*renderer.get_map_shape(game_logic.game_map))
+        self.pixmap.fill(QColor('transparent'))
+        painter = self.__begin()
+        renderer.display_map(painter, game_logic)
+        painter.end()
+
+    def __begin(self):
+        """Start drawing with the view of the renderer moved to the board."""
+        painter = QPainter(self.pixmap)
+        painter.translate(-QPointF(*self.renderer.offset))
+        return painter
+
+    def update_tiles(self, game_logic, tiles):
+        painter = self.__begin()
+        for coords in tiles:
+            # Clear the old image, as water tiles are not drawn.
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(self.renderer.get_tile_rect(coords), Qt.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            self.renderer.display_tile(painter, coords, game_logic.game_map[coords])
+        painter.end()
+
+    def draw(self, painter: QPainter, rect):
+        painter.drawPixmap(rect, self.pixmap, rect.translated(-QPoint(*self.renderer.offset)))
@@ -0,0 +1,205 @@
+import math
+
+from code import GameMap
+from code.data import Coords
+from code.render.atlas import get_tile_atlas
+
+from PyQt5.QtGui import QPainter, QBrush, QPen, QColor, QTransform
+from PyQt5.QtCore import Qt, QPointF, QRect, QRectF
+
+
+# @staticmethod
+def color_to_rgb(game_color):
+    return {
+        'red': (238, 29, 35, 170),
+        'white': (255, 255, 255, 170),
+        'black': (35, 31, 32, 170),
+        'yellow': (255, 221, 23, 170),
+        'green': (127, 255, 0, 170),
+    }[game_color]
+
+
+class GameRenderer:
+    """Draws the state of the `GameLogic` with Qt.
+
+    The tiles are mapped to the screen with the view transform of the tile
+    size and the offset of the board. The sprites are drawn from the atlas
+    of the tile size, so they are never scaled while drawing.
+    """
+
+    # Tile size the widths of the pens are given for.
+    pen_tile_size = 128
+
+    def __init__(self, tile_size, images_path='tile_images'):
+        self.images_path = images_path
+        self.set_view(tile_size)
+
+    def set_view(self, tile_size, offset=(0, 0)):
+        """Set the zoom and the position of the board.
+
+        :param tile_size: size of the tiles in pixels, the atlas of the size is built once
+        :param offset: pixel position of the top left corner of the board
+        """
+        self.tile_size = tile_size
+        self.offset = Coords(*offset)
+        self.view = QTransform(tile_size, 0, 0, tile_size, *self.offset)
+        self.inverted_view, _ = self.view.inverted()
+        self.atlas = get_tile_atlas(self.images_path, tile_size)
+
+    def get_atlas(self):
+        """Get the atlas of the tile size, it is taken again after a new tile type is registered."""
+        if self.atlas.is_outdated():
+            self.atlas = get_tile_atlas(self.images_path, self.tile_size)
+        return self.atlas
+
+    def get_map_shape(self, game_map: GameMap):
+        """Get the size of the map in pixels."""
+        return game_map.get_map_shape() * self.tile_size
+
+    def get_tile_pixel_inds(self, coords):
+        x, y = self.scale_coords(coords)
+        return slice(x, x + self.tile_size), slice(y, y + self.tile_size)
+
+    def scale_coords(self, coords):
+        """Get the pixel position of the top left corner of the tile."""
+        x, y = self.view.map(float(coords[0]), float(coords[1]))
+        return Coords(round(x), round(y))
+
+    def unscale_coords(self, coords):
+        """Get the coords of the tile at the pixel position."""
+        x, y = self.inverted_view.map(float(coords[0]), float(coords[1]))
+        return Coords(math.floor(x), math.floor(y))
+
+    def get_pen_width(self, width):
+        """Scale the pen width to the tile size."""
+        return max(1., width * self.tile_size / self.pen_tile_size)
+
+    def get_tile_rect(self, coords, margin=0):
+        """Get the rect of the tile on screen, extended by the margin."""
+        x, y = self.scale_coords(coords)
+        return QRect(x - margin, y - margin,
+                     self.tile_size + 2 * margin, self.tile_size + 2 * margin)
+
+    def get_tiles_in_rect(self, rect: QRect, margin=0):
+        """Get the coords of the tiles intersecting with the rect on screen."""
+        left, top = self.unscale_coords((rect.left() - margin, rect.top() - margin))
+        right, bottom = self.unscale_coords((rect.right() + margin, rect.bottom() + margin))
+        return {Coords(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)}
+
+    def get_object_color(self, object_name):
+        return {
+            'money': QColor(32, 107, 40)
+        }[object_name]
+
+    def display_map(self, painter: QPainter, game_logic):
+        for coord, tile in game_logic.game_map.enumerate_tiles():
+            self.display_tile(painter, coord, tile)
+
+    def display_tile(self, painter: QPainter, coord: Coords, tile):
+        # TODO: Add 'water' tile image.
+        if tile.tile_type == 'water':
+            return
+        tile_type = tile.tile_type if tile.is_open else 'back'
+        # Tile images are already rotated in the atlas.
+        self.get_atlas().draw(painter, QPointF(*self.scale_coords(coord)), tile_type,
+                              tile.direction)
+
+    def display_objects_on_map(self, painter: QPainter, game_logic, tiles=None):
+        for coord, tile in game_logic.game_map.enumerate_tiles():
+            if tiles is not None and coord not in tiles:
+                continue
+            # Display objects
+            self.display_objects(painter, coord, tile.objects)
+
+    def display_objects(self, painter: QPainter, coord: Coords, objects):
+        painter.save()
+        for i, (obj_name, obj_counter) in enumerate(objects.items()):
+            # If no objects left, skip.
+            if obj_counter < 1:
+                continue
+            ellipse_size = self.tile_size / max(3, len(objects))
+            rect_pos = self.scale_coords(coord) + (i * ellipse_size, 0)
+            rect = QRectF(*rect_pos, ellipse_size, ellipse_size)
+            # Draw ellipse
+            painter.setBrush(QBrush(self.get_object_color(obj_name), Qt.SolidPattern))
+            painter.drawEllipse(rect)
+            # Draw the amount
+            painter.setPen(QPen(QColor('black'), 3))
+            text = str(obj_counter)
+            text_br = painter.boundingRect(rect, Qt.AlignCenter, text)
+            painter.drawText(text_br, 1, text)
+        painter.restore()
+
+    def display_players(self, painter: QPainter, game_logic, tiles=None):
+        game_map, players = game_logic.game_map, game_logic.players
+        cur_character = game_logic._get_current_character()
+
+        def get_character_color(color):
+            if character.ch_type == 'pirate':
+                return QColor(*color_to_rgb(color))
+            else:
+                raise NotImplemented('The color for non pirate characters is not yet defined.')
+
+        # Display each player's ship.
+        for player in players:
+            if tiles is not None and player.ship_coords not in tiles:
+                continue
+            self.get_atlas().draw(painter, QPointF(*self.scale_coords(player.ship_coords)),
+                                  f'boat_{player.color}')
+            # Display objects on ship.
+            self.display_objects(painter, player.ship_coords, player.objects)
+
+        # Display the characters at each position.
+        for pos, characters in game_logic.position_index.items():
+            if tiles is not None and pos not in tiles:
+                continue
+            for i, (character, ch_color) in enumerate(characters):
+                ellipse_size = self.tile_size / len(characters)
+                painter.save()
+                painter.setBrush(QBrush(get_character_color(ch_color), Qt.SolidPattern))
+                rect_pos = self.scale_coords(pos) + i * ellipse_size
+                rect = QRectF(*rect_pos, ellipse_size, ellipse_size)
+                painter.drawEllipse(rect)
+                # Display red circle if character is drunk/trapped.
+                if character.state in ['drunk', 'hangover', 'trapped']:
+                    painter.setBrush(Qt.NoBrush)
+                    color = 'red' if character.state in ['drunk', 'trapped'] else 'orange'
+                    painter.setPen(QPen(QColor(color), self.get_pen_width(15)))
+                    painter.drawEllipse(rect)
+                # Display counter if character is on spinning tile.
+                elif 'spinning' in game_map[pos].tile_type:
+                    painter.setPen(QPen(QColor('black'), 3))
+                    text = str(character.spin_counter)
+                    text_br = painter.boundingRect(rect, Qt.AlignCenter, text)
+                    painter.drawText(text_br, 1, text)
+                # Display the object if character is holding one.
+                if character.object is not None:
+                    painter.setPen(Qt.NoPen)
+                    obj_pos = rect_pos + 1 / 3 * ellipse_size
+                    obj_rect = QRectF(*obj_pos, ellipse_size / 3, ellipse_size / 3)
+                    painter.setBrush(QBrush(self.get_object_color(character.object), Qt.SolidPattern))
+                    painter.drawEllipse(obj_rect)
+                # Display the glow outside the current player.
+                if character is cur_character:
+                    painter.setBrush(Qt.NoBrush)
+                    painter.setPen(QPen(QColor(*color_to_rgb('green')), self.get_pen_width(5)))
+                    painter.drawEllipse(rect)
+                painter.restore()
+
+    def display_frame(self, painter: QPainter, game_logic):
+        """Draw everything shown in the game window."""
+        self.display_map(painter, game_logic)
+        self.display_objects_on_map(painter, game_logic)
+        self.display_possible_turns(painter, game_logic)
+        self.display_players(painter, game_logic)
+
+    def display_possible_turns(self, painter: QPainter, game_logic, tiles=None):
+        for coord in game_logic._get_possible_turns():
+            if tiles is not None and coord not in tiles:
+                continue
+            painter.save()
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(QColor(*color_to_rgb('green')), self.get_pen_width(5)))
+            rect_size = self.tile_size
+            painter.drawRect(*(self.scale_coords(coord)), rect_size, rect_size)
+            painter.restore()
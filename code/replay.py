@@ -0,0 +1,205 @@
+"""Append-only replay log of the game.
+
+The log starts with the seed of the map (or the encoded start position)
+and holds the actions of the players. Encoded positions are added every
+`keyframe_interval` turns, so any turn is restored by decoding the last
+keyframe before it and replaying only the actions after it.
+
+Usage example:
+```cmd
+python -m code.replay replay.jkr --turn 120 --output savegame.jkl
+```
+"""
+import argparse
+import struct
+import sys
+
+from code import GameLogic
+from code.data import Coords
+from code.serialization import encode, decode, save
+
+MAGIC = b'JKR'
+VERSION = 2
+
+# Magic, version, number of players, has seed, seed for each of the versions.
+# The seed of the version 1 is unsigned.
+_headers = {1: struct.Struct('<3sBBBQ'), 2: struct.Struct('<3sBBBq')}
+_header = _headers[VERSION]
+_seed_range = range(-2 ** 63, 2 ** 63)
+# Action id and its argument.
+_action = struct.Struct('<Bhh')
+# Keyframe id, index of the next action, turn and length of the encoded position.
+_keyframe = struct.Struct('<BIII')
+
+actions = ['mouse_click', 'move_character', 'pick_money', 'next_character']
+_action_ids = {action: i for i, action in enumerate(actions)}
+_keyframe_id = 255
+_directions = ['up', 'down', 'left', 'right']
+
+
+class ReplayRecorder:
+    """Writes the actions of the game to the log file.
+
+    Set as `GameLogic.recorder`, so the actions are recorded after they
+    are made.
+    """
+
+    def __init__(self, game_logic: GameLogic, file, seed=None, keyframe_interval=50):
+        """
+        :param game_logic: game at its start position
+        :param file: binary file to write the log to
+        :param seed: seed of the map of the game, the start position is saved if None
+        :param keyframe_interval: number of turns between the keyframes
+        """
+        self.file = file
+        self.keyframe_interval = keyframe_interval
+        self.n_actions = 0
+        self.last_keyframe_turn = game_logic.turn
+        game_map = game_logic.game_map
+        if (game_map.get_map_shape() != game_map.default_map_shape
+                or game_map.tiles != game_map.get_all_tiles()):
+            # Only the standard maps are created from the seed on replay.
+            seed = None
+        if type(seed) is not int or seed not in _seed_range:
+            # The seeds not fitting the header are replaced by the start position.
+            seed = None
+        file.write(_header.pack(MAGIC, VERSION, game_logic.num_of_players,
+                                seed is not None, seed or 0))
+        if seed is None:
+            self.write_keyframe(game_logic)
+        game_logic.recorder = self
+
+    def record(self, game_logic, action, *args):
+        arg = (0, 0)
+        if action == 'mouse_click':
+            arg = args[0]
+        elif action == 'move_character':
+            arg = (_directions.index(args[0]), 0)
+        self.file.write(_action.pack(_action_ids[action], *arg))
+        self.n_actions += 1
+        if game_logic.turn >= self.last_keyframe_turn + self.keyframe_interval:
+            self.write_keyframe(game_logic)
+
+    def write_keyframe(self, game_logic):
+        data = encode(game_logic)
+        self.file.write(_keyframe.pack(_keyframe_id, self.n_actions, game_logic.turn, len(data)))
+        self.file.write(data)
+        self.file.flush()
+        self.last_keyframe_turn = game_logic.turn
+
+    def close(self):
+        self.file.close()
+
+
+class Replay:
+    """Replay log read into memory."""
+
+    def __init__(self, data):
+        """
+        :param data: bytes of the log, the log can be cut in the middle of a record
+        """
+        data = memoryview(data)
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Data is not a replay log.')
+        version = data[len(MAGIC)]
+        if version not in _headers:
+            raise ValueError(f'Unsupported version of the replay log: {version}.')
+        header = _headers[version]
+        _, _, self.num_of_players, has_seed, seed = header.unpack_from(data)
+        self.seed = seed if has_seed else None
+        # Actions in format (action, args).
+        self.actions = []
+        # Keyframes in format (turn, index of the next action, encoded position).
+        self.keyframes = []
+        offset = header.size
+        while offset + _action.size <= len(data):
+            action_id = data[offset]
+            if action_id == _keyframe_id:
+                if offset + _keyframe.size > len(data):
+                    break
+                _, n_actions, turn, length = _keyframe.unpack_from(data, offset)
+                offset += _keyframe.size
+                if offset + length > len(data):
+                    break
+                self.keyframes.append((turn, n_actions, data[offset:offset + length]))
+                offset += length
+            else:
+                _, x, y = _action.unpack_from(data, offset)
+                offset += _action.size
+                self.actions.append(self.__decode_action(actions[action_id], x, y))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls(file.read())
+
+    @staticmethod
+    def __decode_action(action, x, y):
+        if action == 'mouse_click':
+            return action, (Coords(x, y),)
+        if action == 'move_character':
+            return action, (_directions[x],)
+        return action, ()
+
+    @property
+    def n_turns(self):
+        """Number of the last turn in the log."""
+        return self.seek_action(len(self.actions)).turn
+
+    def __get_start(self, keyframes):
+        """Decode the last of the keyframes, or create the game from the seed.
+
+        :return: tuple of (game, index of its next action)
+        """
+        if keyframes:
+            _, n_actions, keyframe = keyframes[-1]
+            return decode(keyframe), n_actions
+        if self.seed is None:
+            raise ValueError('No start position in the log.')
+        return GameLogic(self.num_of_players, seed=self.seed), 0
+
+    def replay(self, game_logic, start, stop):
+        """Make the actions from `start` to `stop` in the game."""
+        for action, args in self.actions[start:stop]:
+            getattr(game_logic, action)(*args)
+        return game_logic
+
+    def seek(self, turn):
+        """Get the game at the start of the turn, or at the end of the log."""
+        game_logic, n_actions = self.__get_start(
+            [keyframe for keyframe in self.keyframes if keyframe[0] <= turn])
+        while n_actions < len(self.actions) and game_logic.turn < turn:
+            self.replay(game_logic, n_actions, n_actions + 1)
+            n_actions += 1
+        return game_logic
+
+    def seek_action(self, n_actions):
+        """Get the game after the first `n_actions` actions."""
+        game_logic, start = self.__get_start(
+            [keyframe for keyframe in self.keyframes if keyframe[1] <= n_actions])
+        return self.replay(game_logic, start, n_actions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Restore the game from the replay log.')
+    parser.add_argument('log', help='replay log file')
+    parser.add_argument('--turn', type=int, default=None, help='turn to seek, the last by default')
+    parser.add_argument('-o', '--output', default=None,
+                        help='save the position to the file, it can be loaded in the game')
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.log)
+    print(f'{len(replay.actions)} actions, {len(replay.keyframes)} keyframes, '
+          f'seed {replay.seed}', file=sys.stderr)
+    if args.turn is None:
+        game_logic = replay.seek_action(len(replay.actions))
+    else:
+        game_logic = replay.seek(args.turn)
+    gold = {pl.color: pl.objects['money'] for pl in game_logic.players}
+    print(f'Turn {game_logic.turn}, gold {gold}, gold left {game_logic.get_gold_left()}')
+    if args.output:
+        save(game_logic, args.output)
+
+
+if __name__ == '__main__':
+    main()
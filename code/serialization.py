@@ -0,0 +1,131 @@
+"""Compact binary format of the game position.
+
+Usage example:
+```python
+data = encode(game_logic)  # less than a kilobyte
+game_logic = decode(data)
+```
+`GameLogic` is pickled in this format, so the games are sent between
+processes without pickling the views of the state.
+
+The names of the tile type ids are saved with the position, so the games
+are decoded after the tile types are registered in another order. Version 1
+without the names is decoded with the ids of the current registration.
+"""
+import struct
+
+from code import GameLogic
+from code.data import Coords, GameState, Player, tile_types, get_tile_type_id
+
+MAGIC = b'JKL'
+VERSION = 2
+
+__version = struct.Struct('<3sB')
+# Format of the fields of the game which are not in the `GameState` by the version:
+# magic, version, flags, turn, current player and character, move start
+# coords ((-1, -1) if None), number of the cycle cells, players and tile types.
+__headers = {
+    1: struct.Struct('<3sBBIBBhhHB'),
+    2: struct.Struct('<3sBBIBBhhHBB'),
+}
+__header = __headers[VERSION]
+__cycle = struct.Struct('<hh')
+__player = struct.Struct('<BB')
+
+# Bits of the flags.
+__moved = 1
+__use_move_tables = 2
+__has_cycles = 4
+
+# Names of the tile types packed as (number of the types, bytes of the names),
+# packed again only when the new types are registered.
+__tile_names = (0, b'')
+
+
+def __pack_tile_names():
+    """Get the names of the tile types by their ids, each one prefixed by its length."""
+    global __tile_names
+    if __tile_names[0] != len(tile_types):
+        names = [tile_type.encode() for tile_type in tile_types]
+        __tile_names = (len(names), b''.join(bytes([len(name)]) + name for name in names))
+    return __tile_names[1]
+
+
+def encode(game_logic: GameLogic) -> bytes:
+    """Encode the game position to bytes, the snapshots are not saved."""
+    flags = ((__moved if game_logic.moved else 0) |
+             (__use_move_tables if game_logic.use_move_tables else 0) |
+             (__has_cycles if game_logic.cycles is not None else 0))
+    move_start = game_logic.move_start_coords or (-1, -1)
+    cycles = game_logic.cycles or {}
+    colors = Player._get_possible_colors()
+    chunks = [__header.pack(MAGIC, VERSION, flags, game_logic.turn, game_logic.cur_player,
+                            game_logic.cur_character, *move_start, len(cycles),
+                            len(game_logic.players), len(tile_types)),
+              __pack_tile_names()]
+    chunks.extend(__cycle.pack(*coords) for coords in cycles)
+    chunks.extend(__player.pack(colors.index(pl.color), pl.side) for pl in game_logic.players)
+    chunks.append(game_logic.game_state.tobytes())
+    return b''.join(chunks)
+
+
+def decode(data) -> GameLogic:
+    """Decode the game position encoded with `encode`.
+
+    :param data: bytes-like object
+    :raise KeyError: if the game has the tile types which are not registered
+    """
+    data = memoryview(data)
+    magic, version = __version.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Data is not an encoded game.')
+    if version not in __headers:
+        raise ValueError(f'Unsupported version of the encoded game: {version}.')
+    header = __headers[version]
+    (_, _, flags, turn, cur_player, cur_character, start_x, start_y, n_cycles, n_players,
+     *n_tile_types) = header.unpack_from(data)
+    offset = header.size
+    # Ids of the saved tile types, None if they are the same as the current ones.
+    tile_type_ids = None
+    if n_tile_types:
+        names_offset = offset
+        names = []
+        for _ in range(n_tile_types[0]):
+            length = data[offset]
+            names.append(bytes(data[offset + 1:offset + 1 + length]).decode())
+            offset += 1 + length
+        if data[names_offset:offset] != __pack_tile_names():
+            tile_type_ids = bytes(map(get_tile_type_id, names))
+    cycles = {}
+    for _ in range(n_cycles):
+        cycles[Coords(*__cycle.unpack_from(data, offset))] = True
+        offset += __cycle.size
+    colors = Player._get_possible_colors()
+    players = []
+    for _ in range(n_players):
+        color, side = __player.unpack_from(data, offset)
+        players.append((colors[color], side))
+        offset += __player.size
+    game_state, _ = GameState.frombytes(data, offset)
+    if tile_type_ids is not None:
+        table = tile_type_ids + bytes(256 - len(tile_type_ids))
+        game_state.load_tiles(tile_type=game_state.tile_type.tobytes().translate(table))
+    game_logic = GameLogic.from_state(game_state, players,
+                                      use_move_tables=bool(flags & __use_move_tables))
+    game_logic.turn = turn
+    game_logic.cur_player = cur_player
+    game_logic.cur_character = cur_character
+    game_logic.moved = bool(flags & __moved)
+    game_logic.move_start_coords = Coords(start_x, start_y) if start_x >= 0 else None
+    game_logic.cycles = cycles if flags & __has_cycles else None
+    return game_logic
+
+
+def save(game_logic: GameLogic, path):
+    with open(path, 'wb') as file:
+        file.write(encode(game_logic))
+
+
+def load(path) -> GameLogic:
+    with open(path, 'rb') as file:
+        return decode(file.read())
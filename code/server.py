@@ -0,0 +1,402 @@
+"""Multiplayer game server hosting many tables in one process.
+
+Clients talk to the server over TCP with one JSON message per line:
+```
+{"type": "create", "players": 4, "seed": 1}  -> {"type": "created", "table": 0}
+{"type": "join", "table": 0, "colors": ["red"]}  -> {"type": "joined", ..., "state": ...}
+{"type": "action", "table": 0, "action": "mouse_click", "args": [6, 11]}
+{"type": "stats"}  -> {"type": "stats", "latency": {...}}
+```
+The server checks that the action is made by the current player and is
+possible, then sends the changes of the `GameState` to all the players
+of the table. The full position is sent only on join.
+
+Usage example, 200 tables played by the bots against the local server:
+```cmd
+python -m code.server --bench --tables 200
+```
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from collections import deque
+
+from code import GameLogic
+from code.data import Coords, Player
+from code.serialization import encode, decode
+from code.simulate import policies
+
+
+def get_fields(game_logic):
+    """Get the fields of the game which are not stored in the `GameState`."""
+    return {
+        'turn': game_logic.turn,
+        'cur_player': game_logic.cur_player,
+        'cur_character': game_logic.cur_character,
+        'moved': game_logic.moved,
+        'move_start_coords': (tuple(game_logic.move_start_coords)
+                              if game_logic.move_start_coords is not None else None),
+        'cycles': [tuple(coords) for coords in game_logic.cycles]
+        if game_logic.cycles is not None else None,
+    }
+
+
+def set_fields(game_logic, fields):
+    game_logic.turn = fields['turn']
+    game_logic.cur_player = fields['cur_player']
+    game_logic.cur_character = fields['cur_character']
+    game_logic.moved = fields['moved']
+    move_start = fields['move_start_coords']
+    game_logic.move_start_coords = Coords(*move_start) if move_start is not None else None
+    cycles = fields['cycles']
+    game_logic.cycles = {Coords(*coords): True for coords in cycles} if cycles is not None else None
+    game_logic.chain = None
+
+
+def encode_state(game_logic):
+    return base64.b64encode(encode(game_logic)).decode()
+
+
+def decode_state(data):
+    return decode(base64.b64decode(data))
+
+
+class LatencyStats:
+    """Latencies of the last handled moves."""
+
+    def __init__(self, size=10000):
+        self.latencies = deque(maxlen=size)
+        self.n_moves = 0
+
+    def add(self, latency):
+        self.latencies.append(latency)
+        self.n_moves += 1
+
+    def to_dict(self):
+        """Get the mean, 95th percentile and max latency in ms."""
+        if not self.latencies:
+            return {'moves': 0}
+        latencies = sorted(self.latencies)
+        return {
+            'moves': self.n_moves,
+            'mean_ms': 1000 * sum(latencies) / len(latencies),
+            'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            'max_ms': 1000 * latencies[-1],
+        }
+
+
+class Table:
+    """One game with the clients sitting at it."""
+
+    actions = ('mouse_click', 'move_character', 'pick_money', 'next_character')
+
+    def __init__(self, table_id, num_of_players=4, seed=None):
+        self.table_id = table_id
+        self.game_logic = GameLogic(num_of_players, seed=seed)
+        # Clients of the players in format {color: client}.
+        self.seats = {}
+        # Number of the changes sent, so the clients can detect the lost ones.
+        self.seq = 0
+
+    @property
+    def clients(self):
+        return set(self.seats.values())
+
+    def join(self, client, colors=None):
+        """Seat the client at the given colors, or at the first free one.
+
+        :return: list of the taken colors
+        """
+        free = [player.color for player in self.game_logic.players if player.color not in self.seats]
+        if colors is None:
+            colors = free[:1]
+        if not colors or any(color not in free for color in colors):
+            raise ValueError(f'Colors are not free: {colors}.')
+        for color in colors:
+            self.seats[color] = client
+        return colors
+
+    def leave(self, client):
+        for color in [color for color, seat in self.seats.items() if seat is client]:
+            del self.seats[color]
+
+    def check_action(self, client, action, args):
+        """Check that the action is possible for the client."""
+        game_logic = self.game_logic
+        if action not in self.actions:
+            raise ValueError(f'Unknown action: {action}.')
+        if game_logic.is_game_over():
+            raise ValueError('The game is over.')
+        # Getting the turns skips the players without the living characters,
+        # so the seat is checked for the player who actually moves.
+        pos_turns = game_logic._get_possible_turns()
+        color = game_logic._get_current_player().color
+        if self.seats.get(color) is not client:
+            raise ValueError(f'Not your turn, current player is {color}.')
+        if action == 'mouse_click':
+            # With no turns, any click removes the character.
+            if pos_turns and args[0] not in pos_turns:
+                raise ValueError(f'Impossible turn: {tuple(args[0])}.')
+        elif action == 'move_character' and args[0] not in ('up', 'down', 'left', 'right'):
+            raise ValueError(f'Unknown direction: {args[0]}.')
+
+    def make_action(self, client, action, args):
+        """Make the action of the client.
+
+        :return: message with the changes of the game
+        """
+        game_logic = self.game_logic
+        if action == 'mouse_click':
+            args = [Coords(*args)]
+        game_logic.snapshot()
+        try:
+            self.check_action(client, action, args)
+            getattr(game_logic, action)(*args)
+        except Exception:
+            # The failed action doesn't leave the table in the partly changed position.
+            game_logic.restore()
+            raise
+        changes = game_logic.game_state.get_changes()
+        game_logic.discard()
+        self.seq += 1
+        message = {'type': 'diff', 'table': self.table_id, 'seq': self.seq,
+                   'fields': get_fields(game_logic)}
+        if changes is None:
+            message['state'] = encode_state(game_logic)
+        else:
+            message['changes'] = changes
+        return message
+
+
+class GameServer:
+    """Asyncio server of the game tables."""
+
+    def __init__(self):
+        self.tables = {}
+        self.latency = LatencyStats()
+        self.__next_table_id = 0
+        self.__server = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.__server = await asyncio.start_server(self.handle_client, host, port)
+        return self.__server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    def close(self):
+        self.__server.close()
+
+    @staticmethod
+    def send(client, message):
+        client.write((json.dumps(message, separators=(',', ':')) + '\n').encode())
+
+    def get_table(self, message):
+        table = self.tables.get(message.get('table'))
+        if table is None:
+            raise ValueError(f'Unknown table: {message.get("table")}.')
+        return table
+
+    async def handle_client(self, reader, writer):
+        joined_tables = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                try:
+                    message = json.loads(line)
+                    receivers = self.handle_message(writer, message, joined_tables)
+                except (ValueError, KeyError, TypeError, IndexError) as e:
+                    self.send(writer, {'type': 'error', 'message': str(e)})
+                    continue
+                for client in receivers:
+                    await client.drain()
+                if message['type'] == 'action':
+                    self.latency.add(time.perf_counter() - start)
+        except ConnectionError:
+            pass
+        finally:
+            for table in joined_tables:
+                table.leave(writer)
+            writer.close()
+
+    def handle_message(self, client, message, joined_tables):
+        """Handle the message of the client.
+
+        :return: clients the answers were sent to
+        """
+        msg_type = message['type']
+        if msg_type == 'create':
+            players = message.get('players', 4)
+            if type(players) is not int or not 1 <= players <= 4:
+                raise ValueError(f'Wrong number of players: {players}.')
+            table_id = self.__next_table_id
+            self.__next_table_id += 1
+            self.tables[table_id] = Table(table_id, players, message.get('seed'))
+            self.send(client, {'type': 'created', 'table': table_id})
+            return [client]
+        if msg_type == 'join':
+            table = self.get_table(message)
+            colors = table.join(client, message.get('colors'))
+            joined_tables.add(table)
+            self.send(client, {'type': 'joined', 'table': table.table_id, 'colors': colors,
+                               'seq': table.seq, 'state': encode_state(table.game_logic),
+                               'fields': get_fields(table.game_logic)})
+            return [client]
+        if msg_type == 'action':
+            table = self.get_table(message)
+            diff = table.make_action(client, message['action'], message.get('args', []))
+            receivers = table.clients
+            for receiver in receivers:
+                self.send(receiver, diff)
+            return receivers
+        if msg_type == 'stats':
+            self.send(client, {'type': 'stats', 'tables': len(self.tables),
+                               'latency': self.latency.to_dict()})
+            return [client]
+        raise ValueError(f'Unknown message type: {msg_type}.')
+
+
+class GameClient:
+    """Client keeping the copy of the game at one table.
+
+    The copy is updated with the changes sent by the server.
+    """
+
+    def __init__(self):
+        self.reader = self.writer = None
+        self.table_id = None
+        self.colors = []
+        self.game_logic = None
+        self.seq = 0
+        # Round trip time of the actions.
+        self.latency = LatencyStats()
+
+    async def connect(self, host='127.0.0.1', port=8765):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def request(self, message):
+        self.writer.write((json.dumps(message) + '\n').encode())
+        await self.writer.drain()
+        return await self.receive()
+
+    async def receive(self):
+        answer = json.loads(await self.reader.readline())
+        if answer['type'] == 'error':
+            raise ValueError(answer['message'])
+        if answer['type'] in ('joined', 'diff'):
+            self.apply(answer)
+        return answer
+
+    async def create(self, players=4, seed=None):
+        answer = await self.request({'type': 'create', 'players': players, 'seed': seed})
+        return answer['table']
+
+    async def join(self, table_id, colors=None):
+        answer = await self.request({'type': 'join', 'table': table_id, 'colors': colors})
+        self.table_id = table_id
+        self.colors = answer['colors']
+        return answer
+
+    async def act(self, action, *args):
+        """Make the action and wait for its changes."""
+        start = time.perf_counter()
+        answer = await self.request({'type': 'action', 'table': self.table_id,
+                                     'action': action, 'args': args})
+        self.latency.add(time.perf_counter() - start)
+        return answer
+
+    def apply(self, message):
+        if message['type'] == 'diff' and message['seq'] != self.seq + 1:
+            raise ValueError(f'Lost changes: {self.seq + 1}..{message["seq"] - 1}.')
+        self.seq = message['seq']
+        if 'state' in message:
+            self.game_logic = decode_state(message['state'])
+        else:
+            self.game_logic.game_state.apply_changes(message['changes'])
+            self.game_logic._sync_with_state()
+        set_fields(self.game_logic, message['fields'])
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_bot(host, port, seed, max_turns, policy='random'):
+    """Create the table and play all the colors with the bot.
+
+    :return: the client with the final position
+    """
+    client = GameClient()
+    await client.connect(host, port)
+    table_id = await client.create(players=4, seed=seed)
+    await client.join(table_id, Player._get_possible_colors())
+    rng = random.Random(seed)
+    game_logic = client.game_logic
+    while not game_logic.is_game_over() and game_logic.turn < max_turns:
+        # Policy is asked on the copy, so the client copy is changed only by the server.
+        action, coords = policies[policy](game_logic.copy(), rng)
+        if action == 'move':
+            await client.act('mouse_click', *coords)
+        else:
+            await client.act(action)
+        game_logic = client.game_logic
+    await client.close()
+    return client
+
+
+async def bench(n_tables, max_turns, policy):
+    server = GameServer()
+    host, port = await server.start(port=0)
+    start = time.perf_counter()
+    clients = await asyncio.gather(*(play_bot(host, port, seed, max_turns, policy)
+                                     for seed in range(n_tables)))
+    elapsed = time.perf_counter() - start
+    # Copies of the clients must be the same as the games on the server.
+    n_same = sum(encode(client.game_logic) == encode(server.tables[client.table_id].game_logic)
+                 for client in clients)
+    server.close()
+    n_moves = server.latency.n_moves
+    print(f'{n_tables} tables, {n_moves} moves in {elapsed:.2f}s '
+          f'({n_moves / elapsed:.0f} moves/s), {n_same} clients in sync', file=sys.stderr)
+    print(f'Server latency: {server.latency.to_dict()}', file=sys.stderr)
+    round_trip = LatencyStats()
+    for client in clients:
+        round_trip.latencies.extend(client.latency.latencies)
+        round_trip.n_moves += client.latency.n_moves
+    print(f'Client round trip: {round_trip.to_dict()}', file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the game server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bench', action='store_true',
+                        help='play the tables with the bots against the local server')
+    parser.add_argument('--tables', type=int, default=100, help='number of tables in bench')
+    parser.add_argument('--max-turns', type=int, default=200, help='max turns in bench')
+    parser.add_argument('--policy', choices=policies, default='random', help='policy in bench')
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        asyncio.run(bench(args.tables, args.max_turns, args.policy))
+        return
+
+    async def serve():
+        server = GameServer()
+        host, port = await server.start(args.host, args.port)
+        print(f'Serving on {host}:{port}', file=sys.stderr)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
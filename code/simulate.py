@@ -0,0 +1,278 @@
+"""Batch self-play of the game without the UI.
+
+Usage example:
+```cmd
+python -m code.simulate -n 1000 --policy greedy_gold --output results.jsonl
+```
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from code import GameLogic
+from code.data import Player, objects_on_open
+from code.profiling import Profiler
+
+
+def _distance(a, b):
+    """Number of king moves between two cells."""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+def _closest_turns(pos_turns, targets):
+    """Get turns which are the closest to any of the targets."""
+    if not targets:
+        return pos_turns
+    dists = [min(_distance(coord, target) for target in targets) for coord in pos_turns]
+    min_dist = min(dists)
+    return [coord for coord, dist in zip(pos_turns, dists) if dist == min_dist]
+
+
+def _can_carry_money(game_logic, cur_char):
+    """Check if the character will be able to move after picking up the money."""
+    cur_object, cur_char.object = cur_char.object, 'money'
+    try:
+        return len(game_logic._get_possible_turns()) > 0
+    finally:
+        cur_char.object = cur_object
+
+
+def _should_pick_money(game_logic, cur_char):
+    cur_tile = game_logic.game_map[cur_char.coords]
+    return (cur_char.object is None and cur_tile.objects['money'] > 0 and
+            _can_carry_money(game_logic, cur_char))
+
+
+def random_policy(game_logic, rng):
+    """Pick any of the available actions at random.
+
+    :return: action in format (action_name, coords)
+    """
+    cur_char = game_logic._get_current_character()
+    pos_turns = game_logic._get_possible_turns()
+    if not game_logic.moved and rng.random() < 0.25:
+        return 'next_character', None
+    if rng.random() < 0.5 and _should_pick_money(game_logic, cur_char):
+        return 'pick_money', None
+    if not pos_turns:
+        # Drop the money to be able to leave the character.
+        if cur_char.object is not None:
+            return 'pick_money', None
+        return 'move', cur_char.coords
+    return 'move', rng.choice(pos_turns)
+
+
+def greedy_gold_policy(game_logic, rng):
+    """Carry the gold to the ship, otherwise go to the nearest gold or closed tile.
+
+    :return: action in format (action_name, coords)
+    """
+    cur_player = game_logic._get_current_player()
+    cur_char = game_logic._get_current_character()
+    pos_turns = game_logic._get_possible_turns()
+    if _should_pick_money(game_logic, cur_char):
+        return 'pick_money', None
+    if not pos_turns:
+        if cur_char.object is not None:
+            return 'pick_money', None
+        return 'move', cur_char.coords
+    # In the middle of the chain move, pick at random to not follow the same cycle forever.
+    if game_logic.moved:
+        return 'move', rng.choice(pos_turns)
+    if cur_char.object == 'money':
+        targets = [cur_player.ship_coords]
+    else:
+        targets = [coord for coord, tile in game_logic.game_map.enumerate_tiles()
+                   if tile.objects['money'] > 0 or
+                   (not tile.is_open and 'money' in objects_on_open[tile.tile_type])]
+        targets = targets or [coord for coord, tile in game_logic.game_map.enumerate_tiles()
+                              if not tile.is_open]
+    return 'move', rng.choice(_closest_turns(pos_turns, targets))
+
+
+policies = {
+    'random': random_policy,
+    'greedy_gold': greedy_gold_policy,
+}
+
+
+def make_counted_action(game_logic, action, deaths):
+    """Make the action of the policy and count the characters killed by it.
+
+    Deaths are counted by the tile where the kill happens, the tile on which
+    the acting character ends the action. The ones killed by the water or
+    the ogre die there, the enemies are killed on the cell the character
+    steps on, and the character without the turns dies where it stands.
+
+    :param action: action in format (action_name, coords)
+    :param deaths: Counter of the deaths by the tile type, updated in place
+    """
+    characters = {id(ch): ch for pl in game_logic.players for ch in pl.characters}
+    cur_char = game_logic._get_current_character()
+    game_logic.make_action(*action)
+    alive = {id(ch) for pl in game_logic.players for ch in pl.characters}
+    n_killed = sum(ch_id not in alive for ch_id in characters)
+    if n_killed:
+        deaths[game_logic.game_map[cur_char.coords].tile_type] += n_killed
+
+
+def play_game(game_id, seed, num_of_players=4, policy='random', max_turns=1000,
+              max_turn_actions=200, map_shape=None):
+    """Play one game till the end with the given policy for all players.
+
+    :param game_id: id of the game reported in the result
+    :param seed: seed of both the game map and the policy
+    :param num_of_players: number of players in the game
+    :param policy: name of the move policy, one of `policies`
+    :param max_turns: number of turns after which the game is stopped
+    :param max_turn_actions: number of actions in one turn after which the game is stopped
+    :param map_shape: (width, height) of the map, the standard map if None
+    :return: dict with the game results
+    """
+    choose_action = policies[policy]
+    rng = random.Random(seed)
+    game_logic = GameLogic(num_of_players, seed=seed, map_shape=map_shape)
+    deaths = Counter()
+    n_actions, turn_start, turn_actions = 0, 0, 0
+    while not game_logic.is_game_over() and turn_actions < max_turn_actions:
+        # Getting the character skips the players without the living characters, which
+        # advances the turn, so the limit is checked after it.
+        game_logic._get_current_character()
+        if game_logic.turn >= max_turns:
+            break
+        make_counted_action(game_logic, choose_action(game_logic, rng), deaths)
+        n_actions += 1
+        if game_logic.turn != turn_start:
+            turn_start, turn_actions = game_logic.turn, 0
+        turn_actions += 1
+
+    gold = {pl.color: pl.objects['money'] for pl in game_logic.players}
+    max_gold = max(gold.values())
+    winners = [color for color, amount in gold.items() if amount == max_gold]
+    return {
+        'game': game_id,
+        'seed': seed,
+        'policy': policy,
+        'winner': winners[0] if len(winners) == 1 else None,
+        'gold': gold,
+        # Players skipped after the last action don't play, the game stops at the limit.
+        'turns': min(game_logic.turn, max_turns),
+        'actions': n_actions,
+        'finished': game_logic.is_game_over(),
+        'deaths': dict(deaths),
+    }
+
+
+def _play_game(args):
+    game_id, seed, options = args
+    return play_game(game_id, seed, **options)
+
+
+def simulate(n_games, seed=0, num_of_players=4, policy='random',
+             max_turns=1000, processes=None, map_shape=None):
+    """Play `n_games` games in a process pool.
+
+    Game `i` is played with seed `seed + i`, so the results do not depend
+    on the number of processes.
+
+    :return: generator of game results in order of completion
+    """
+    options = dict(num_of_players=num_of_players, policy=policy, max_turns=max_turns,
+                   map_shape=map_shape)
+    tasks = [(i, seed + i, options) for i in range(n_games)]
+    if processes == 1:
+        yield from map(_play_game, tasks)
+        return
+    n_workers = processes or os.cpu_count() or 1
+    chunksize = max(1, n_games // (n_workers * 8))
+    with Pool(n_workers) as pool:
+        yield from pool.imap_unordered(_play_game, tasks, chunksize=chunksize)
+
+
+def write_jsonl(results, file):
+    for result in results:
+        file.write(json.dumps(result) + '\n')
+        file.flush()
+
+
+def write_csv(results, file):
+    fields = ['game', 'seed', 'policy', 'winner', 'turns', 'actions', 'finished']
+    gold_fields = [f'gold_{color}' for color in Player._get_possible_colors()]
+    writer = csv.DictWriter(file, fields + gold_fields + ['deaths'])
+    writer.writeheader()
+    for result in results:
+        row = {field: result[field] for field in fields}
+        row.update({f'gold_{color}': amount for color, amount in result['gold'].items()})
+        row['deaths'] = json.dumps(result['deaths'])
+        writer.writerow(row)
+        file.flush()
+
+
+sinks = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play games between bots.')
+    parser.add_argument('-n', '--games', type=int, default=100, help='number of games')
+    parser.add_argument('-p', '--players', type=int, default=4, help='number of players')
+    parser.add_argument('--policy', choices=policies, default='random')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--max-turns', type=int, default=1000)
+    parser.add_argument('--map-shape', type=int, nargs=2, default=None,
+                        metavar=('WIDTH', 'HEIGHT'), help='shape of the maps, 13 13 by default')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of processes, all cores by default')
+    parser.add_argument('-o', '--output', default=None, help='output file, stdout by default')
+    parser.add_argument('-f', '--format', choices=sinks, default=None,
+                        help='output format, guessed from the output extension by default')
+    parser.add_argument('--profile', default=None,
+                        help='write the time of the hot paths per turn to the JSON file, '
+                             'the games are played in one process')
+    parser.add_argument('--trace', default=None,
+                        help='write the calls of the hot paths to the Chrome trace file, '
+                             'the games are played in one process')
+    args = parser.parse_args(argv)
+
+    out_format = args.format
+    if out_format is None:
+        out_format = 'csv' if args.output and args.output.endswith('.csv') else 'jsonl'
+    out_file = open(args.output, 'w', newline='') if args.output else sys.stdout
+
+    profiler, processes = None, args.jobs
+    if args.profile or args.trace:
+        profiler, processes = Profiler(trace=args.trace is not None), 1
+        profiler.instrument()
+
+    start_time = time.perf_counter()
+    results = simulate(args.games, seed=args.seed, num_of_players=args.players,
+                       policy=args.policy, max_turns=args.max_turns, processes=processes,
+                       map_shape=args.map_shape)
+    try:
+        sinks[out_format](results, out_file)
+    finally:
+        if args.output:
+            out_file.close()
+        if profiler is not None:
+            profiler.uninstrument()
+    elapsed = time.perf_counter() - start_time
+    print(f'{args.games} games in {elapsed:.2f}s ({args.games / elapsed:.1f} games/s)',
+          file=sys.stderr)
+    if profiler is not None:
+        print(profiler.format_totals(), file=sys.stderr)
+        if args.profile:
+            profiler.write_json(args.profile)
+        if args.trace:
+            profiler.write_chrome_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
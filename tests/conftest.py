@@ -0,0 +1,29 @@
+import os
+import random
+
+import pytest
+
+from code import GameLogic
+
+
+def play_random_turns(game_logic, n_actions, seed=0):
+    """Make random moves to get the board with some opened tiles."""
+    rng = random.Random(seed)
+    for _ in range(n_actions):
+        pos_turns = game_logic._get_possible_turns()
+        cur_char = game_logic._get_current_character()
+        game_logic.mouse_click(rng.choice(pos_turns) if pos_turns else cur_char.coords)
+    return game_logic
+
+
+@pytest.fixture
+def played_game_logic():
+    return play_random_turns(GameLogic(4, seed=1), 100)
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """Application needed by the rendering, without the display."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QGuiApplication
+    return QGuiApplication.instance() or QGuiApplication([])
@@ -0,0 +1,56 @@
+import os
+import shutil
+
+import pytest
+
+from PyQt5.QtGui import QImage
+
+from code import GameLogic
+from code.behaviour import register_tile_type
+from code.render import GameRenderer, TileAtlas
+from code.render.export import render_frame
+
+
+@pytest.fixture
+def images_path(tmp_path):
+    """Copy of the tile images, which can be changed by the test."""
+    path = tmp_path / 'tile_images'
+    shutil.copytree('tile_images', path, ignore=shutil.ignore_patterns('.cache'))
+    return str(path)
+
+
+def test_atlas_loaded_from_cache(qapp, images_path, tmp_path):
+    cache_path = str(tmp_path / 'cache')
+    built = TileAtlas(images_path, 16, cache_path)
+    assert built.cache_file is None
+    built.saving.join()
+    assert os.listdir(cache_path) == [built.get_cache_name(images_path)]
+    loaded = TileAtlas(images_path, 16, cache_path)
+    assert loaded.cache_file == os.path.join(cache_path, built.get_cache_name(images_path))
+    assert loaded.image == built.image
+
+
+def test_cache_name(qapp, images_path):
+    atlas = TileAtlas(images_path, 16)
+    name = atlas.get_cache_name(images_path)
+    assert TileAtlas(images_path, 24).get_cache_name(images_path) != name
+    # The changed image gets a new file.
+    stat = os.stat(os.path.join(images_path, 'back.png'))
+    os.utime(os.path.join(images_path, 'back.png'), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert atlas.get_cache_name(images_path) != name
+
+
+def test_render_plugin_tile(qapp, images_path):
+    renderer = GameRenderer(16, images_path)
+    game_logic = GameLogic(4, seed=0)
+    render_frame(renderer, game_logic)
+    # The tile type without the image, registered after the atlas is built.
+    register_tile_type('lava')
+    coords, tile = next((coords, tile) for coords, tile in game_logic.game_map.enumerate_tiles()
+                        if tile.tile_type != 'water')
+    tile.tile_type, tile.direction, tile.is_open = 'lava', 0, True
+    image = render_frame(renderer, game_logic)
+    atlas = renderer.get_atlas()
+    assert 'lava' in atlas.tile_types
+    back = atlas.image.copy(atlas.get_rect('back')).convertToFormat(QImage.Format_RGB32)
+    assert image.copy(renderer.get_tile_rect(coords)) == back
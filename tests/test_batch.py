@@ -0,0 +1,9 @@
+import pytest
+
+from code.batch import verify
+
+
+@pytest.mark.parametrize('map_shape', [None, (9, 11)], ids=['standard', '9x11'])
+def test_engines_match(map_shape):
+    # Raises on the first position which differs between the engines.
+    assert verify(n_games=2, n_actions=200, map_shape=map_shape) > 0
@@ -0,0 +1,123 @@
+import itertools
+from collections import defaultdict
+
+import pytest
+
+from code import GameLogic
+from code.behaviour import MoveTables, ChainAnalyzer
+from code.behaviour.ruleRegistry import is_final_rules
+from code.data import Coords
+
+center = Coords(6, 6)
+
+
+def set_tiles(game_logic, tile_type, direction=0):
+    """Open all the land tiles of the map with the given tile type."""
+    game_map = game_logic.game_map
+    for _, tile in game_map.enumerate_tiles():
+        if tile.tile_type != 'water':
+            tile.tile_type = tile_type
+            tile.direction = direction
+            tile.is_open = True
+    game_map.move_tables = MoveTables(game_map)
+
+
+def place_current_character(game_logic, coords, prev_coords):
+    cur_char = game_logic._get_current_character()
+    cur_char.move(prev_coords)
+    cur_char.move(coords)
+    return cur_char
+
+
+def get_path_tree(game_logic, been_in=None):
+    """Tree of the chain moves of the current character, as built by the replaced detector."""
+    been_in = been_in or set()
+    cur_char = game_logic._get_current_character()
+    init_coord = cur_char.coords
+    paths = defaultdict(list)
+    for coord in game_logic._get_possible_turns():
+        if coord not in been_in:
+            if not is_final_rules[game_logic.game_map[coord].tile_type_id]:
+                been_in.add(coord)
+                game_logic.snapshot()
+                cur_char.move(coord)
+                sub_paths, been_in = get_path_tree(game_logic, been_in)
+                game_logic.restore()
+                paths[init_coord].append(sub_paths or coord)
+            else:
+                paths[init_coord].append(coord)
+    return paths, been_in
+
+
+def get_leaves(tree):
+    if isinstance(tree, Coords):
+        return {tree}
+    return {leaf for nodes in tree.values() for node in nodes for leaf in get_leaves(node)}
+
+
+def detect_cycles_recursive(game_logic):
+    """Recursive cycle detection replaced by `ChainAnalyzer`.
+
+    :return: starts of the cycles, the loops returning only to the tile they start from
+    """
+    def detect(tree):
+        n_cycles, cycles = 0, []
+        if isinstance(tree, Coords):
+            return cycles
+        for coord, nodes in tree.items():
+            for node in nodes:
+                leaves = get_leaves(node)
+                if coord in leaves and len(leaves) == 1:
+                    n_cycles += 1
+                else:
+                    cycles.extend(detect(node))
+            if nodes and n_cycles == len(nodes):
+                cycles = [coord]
+        return cycles
+
+    return detect(get_path_tree(game_logic)[0])
+
+
+def assert_same_traps(game_logic, start, prev_coords):
+    place_current_character(game_logic, start, prev_coords)
+    recursive = detect_cycles_recursive(game_logic)
+    analysis = game_logic.analyze_chain()
+    # The analyzer also finds the loops entered after the first tile, which were missed.
+    assert set(recursive) <= analysis.trapped_cells
+    if recursive:
+        assert recursive == [start]
+        assert analysis.is_trapped(ChainAnalyzer.get_node(game_logic.game_map, start, prev_coords))
+        assert not analysis.resting_cells
+    return recursive, analysis
+
+
+# Layouts of the benchmarks with the longest chain moves.
+@pytest.mark.parametrize('tile_type, direction', [
+    ('dir_uplr', 0),
+    ('dir_diagonal', 0),
+    ('dir_45_225', 90),
+    ('dir_0_135_270', 0),
+    ('ice_lake', 0),
+])
+def test_benchmark_layouts(tile_type, direction):
+    game_logic = GameLogic(4, seed=0)
+    set_tiles(game_logic, tile_type, direction)
+    recursive, analysis = assert_same_traps(game_logic, center, center + (0, -1))
+    assert set(recursive) == analysis.trapped_cells
+
+
+def test_arrow_loops():
+    """Arrows of all the directions in the square of 2x2 tiles around the start."""
+    cells = [center, center + (1, 0), center + (1, 1), center + (0, 1)]
+    n_loops = 0
+    for directions in itertools.product([0, 90, 180, 270], repeat=len(cells)):
+        game_logic = GameLogic(4, seed=0)
+        set_tiles(game_logic, 'empty')
+        game_map = game_logic.game_map
+        for coords, direction in zip(cells, directions):
+            game_map[coords].tile_type = 'dir_straight'
+            game_map[coords].direction = direction
+        game_map.move_tables = MoveTables(game_map)
+        recursive, _ = assert_same_traps(game_logic, center, center + (0, -1))
+        n_loops += bool(recursive)
+    assert n_loops > 0
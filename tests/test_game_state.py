@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from code.data import GameState
+from code.serialization import encode
+from code.simulate import policies
+
+
+def get_values(state):
+    """Get all the values of the state with its hash."""
+    return {field: getattr(state, field).tolist() for field in GameState.hash_fields}, state.hash
+
+
+def set_random(state, rng, n_changes):
+    """Change random items of the tiles and the characters."""
+    for _ in range(n_changes):
+        field = rng.choice(['tile_type', 'direction', 'is_open', 'gold', 'ch_x', 'ch_state'])
+        values = getattr(state, field)
+        state.set(values, rng.randrange(len(values)), rng.randrange(4))
+
+
+def play(game_logic, rng, n_actions):
+    for _ in range(n_actions):
+        if game_logic.is_game_over():
+            break
+        game_logic.make_action(*policies['random'](game_logic, rng))
+
+
+def test_nested_snapshots(played_game_logic):
+    state = played_game_logic.game_state.copy()
+    rng = random.Random(0)
+    start = get_values(state)
+    state.snapshot()
+    set_random(state, rng, 20)
+    outer = get_values(state)
+    state.snapshot()
+    set_random(state, rng, 20)
+    state.add_character((0, 0), 0, 0)
+    set_random(state, rng, 20)
+    state.restore()
+    assert get_values(state) == outer
+    state.snapshot()
+    set_random(state, rng, 20)
+    state.snapshot()
+    set_random(state, rng, 20)
+    kept = get_values(state)
+    # Discarding the inner snapshot keeps the changes, they are rolled back by the outer one.
+    state.discard()
+    assert get_values(state) == kept
+    state.discard()
+    assert get_values(state) == kept
+    assert state.marks
+    state.restore()
+    assert get_values(state) == start
+    assert not state.marks and not state.journal
+
+
+def test_discard_last_snapshot(played_game_logic):
+    state = played_game_logic.game_state.copy()
+    state.snapshot()
+    set_random(state, random.Random(0), 20)
+    changed = get_values(state)
+    state.discard()
+    assert get_values(state) == changed
+    assert not state.marks and not state.journal
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_restore_after_character_removal(played_game_logic, seed):
+    game_logic = played_game_logic
+    rng = random.Random(seed)
+    start, start_hash = encode(game_logic), game_logic.game_state.hash
+    game_logic.snapshot()
+    play(game_logic, rng, 10)
+    moved, moved_hash = encode(game_logic), game_logic.game_state.hash
+    game_logic.snapshot()
+    for player in game_logic.players:
+        for character in list(player.characters)[:2]:
+            player.remove_character(character)
+    play(game_logic, rng, 10)
+    game_logic.restore()
+    assert (encode(game_logic), game_logic.game_state.hash) == (moved, moved_hash)
+    game_logic.restore()
+    assert (encode(game_logic), game_logic.game_state.hash) == (start, start_hash)
+    assert game_logic.game_state.hash == game_logic.game_state.compute_hash()
+
+
+def test_bytes_round_trip(played_game_logic):
+    state = played_game_logic.game_state
+    data = state.tobytes()
+    buffer = bytearray(b'prefix' + data + b'suffix')
+    decoded, offset = GameState.frombytes(buffer, len(b'prefix'))
+    assert offset == len(buffer) - len(b'suffix')
+    assert get_values(decoded) == get_values(state)
+    assert decoded.tobytes() == data
+    # The decoded state doesn't share the memory of the buffer.
+    buffer[len(b'prefix'):offset] = bytes(len(data))
+    assert get_values(decoded) == get_values(state)
+
+
+def test_bytes_without_snapshots(played_game_logic):
+    state = played_game_logic.game_state.copy()
+    data = state.tobytes()
+    state.snapshot()
+    decoded, _ = GameState.frombytes(state.tobytes())
+    assert not decoded.marks
+    set_random(state, random.Random(0), 20)
+    state.restore()
+    assert state.tobytes() == data
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_apply_changes(played_game_logic, seed):
+    game_logic = played_game_logic
+    other = game_logic.game_state.copy()
+    rng = random.Random(seed)
+    game_logic.snapshot()
+    play(game_logic, rng, 5)
+    inner = game_logic.game_state.copy()
+    game_logic.snapshot()
+    play(game_logic, rng, 5)
+    # Only the changes since the last snapshot are taken.
+    changes = game_logic.game_state.get_changes()
+    inner.apply_changes(changes)
+    assert get_values(inner) == get_values(game_logic.game_state)
+    game_logic.discard()
+    other.apply_changes(game_logic.game_state.get_changes())
+    assert get_values(other) == get_values(game_logic.game_state)
+
+
+def test_no_changes_after_added_character(played_game_logic):
+    state = played_game_logic.game_state
+    state.snapshot()
+    state.set(state.is_open, 0, 1)
+    assert state.get_changes() is not None
+    state.add_character((0, 0), 0, 0)
+    assert state.get_changes() is None
+    state.restore()
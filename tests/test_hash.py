@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from code import GameLogic
+from code.serialization import decode, encode
+from code.simulate import policies
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_hash(seed):
+    game_logic = GameLogic(4, seed=seed)
+    state = game_logic.game_state
+    rng = random.Random(seed)
+    for _ in range(300):
+        if game_logic.is_game_over():
+            break
+        game_logic.make_action(*policies['random'](game_logic, rng))
+        assert state.hash == state.compute_hash()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_hash_after_restore(seed):
+    game_logic = GameLogic(4, seed=seed)
+    state = game_logic.game_state
+    rng = random.Random(seed)
+    for _ in range(100):
+        if game_logic.is_game_over():
+            break
+        state_hash, game_hash = state.hash, game_logic.get_hash()
+        game_logic.snapshot()
+        for _ in range(rng.randrange(1, 10)):
+            if game_logic.is_game_over():
+                break
+            game_logic.make_action(*policies['random'](game_logic, rng))
+        game_logic.restore()
+        assert (state.hash, game_logic.get_hash()) == (state_hash, game_hash)
+        assert state.hash == state.compute_hash()
+        game_logic.make_action(*policies['random'](game_logic, rng))
+
+
+def test_same_position_same_hash(played_game_logic):
+    game_logic = played_game_logic
+    for other in [game_logic.copy(), decode(encode(game_logic))]:
+        assert other.game_state.hash == game_logic.game_state.hash
+        assert other.get_hash() == game_logic.get_hash()
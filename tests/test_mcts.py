@@ -0,0 +1,22 @@
+from code.mcts import MCTS, MCTSPlayer, get_actions
+from code.serialization import encode
+
+
+def test_search_doesnt_change_game(played_game_logic):
+    game_logic = played_game_logic
+    game_hash, data = game_logic.get_hash(), encode(game_logic)
+    root, n_iterations = MCTS(rollout_turns=5, seed=0).search(game_logic, iterations=30)
+    assert (game_logic.get_hash(), encode(game_logic)) == (game_hash, data)
+    assert n_iterations == root.visits == 30
+    assert set(root.children) <= set(get_actions(game_logic))
+
+
+def test_player_action_is_possible(played_game_logic):
+    game_logic = played_game_logic
+    game_hash, data = game_logic.get_hash(), encode(game_logic)
+    actions = [MCTSPlayer(iterations=20, time_limit=None, seed=0, rollout_turns=5).search(game_logic)
+               for _ in range(2)]
+    assert (game_logic.get_hash(), encode(game_logic)) == (game_hash, data)
+    # The same seed gives the same search.
+    assert actions[0] == actions[1]
+    assert actions[0] in get_actions(game_logic)
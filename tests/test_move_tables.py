@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from code import GameLogic
+
+
+def get_turn_sets(game_logic, player):
+    """Get the turns of each character of the player with the move tables on and off."""
+    turn_sets = []
+    for use_move_tables in (True, False):
+        game_logic.use_move_tables = use_move_tables
+        turn_sets.append([set(game_logic._get_turns(player, character))
+                          for character in player.characters])
+    game_logic.use_move_tables = True
+    return turn_sets
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_same_turns_as_rules(seed):
+    game_logic = GameLogic(4, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(300):
+        if game_logic.is_game_over():
+            break
+        pos_turns = game_logic._get_possible_turns()
+        with_tables, with_rules = get_turn_sets(game_logic, game_logic._get_current_player())
+        assert with_tables == with_rules
+        cur_char = game_logic._get_current_character()
+        game_logic.mouse_click(rng.choice(pos_turns) if pos_turns else cur_char.coords)
@@ -0,0 +1,74 @@
+import io
+import random
+import struct
+
+import pytest
+
+from code import GameLogic
+from code.replay import ReplayRecorder, Replay
+from code.serialization import encode
+from code.simulate import policies
+
+
+def record(seed, n_actions, keyframe_interval=50):
+    """Record the random game of the seed.
+
+    :return: tuple of (game at the end, bytes of the log)
+    """
+    file = io.BytesIO()
+    game_logic = GameLogic(4, seed=seed)
+    ReplayRecorder(game_logic, file, seed, keyframe_interval)
+    rng = random.Random(0)
+    for _ in range(n_actions):
+        game_logic.make_action(*policies['random'](game_logic, rng))
+    return game_logic, file.getvalue()
+
+
+@pytest.mark.parametrize('seed', [-1, -2 ** 63, 2 ** 64 - 1, 2 ** 70])
+def test_seed_out_of_unsigned_range(seed):
+    game_logic, data = record(seed, 20)
+    replay = Replay(data)
+    assert replay.seed == (seed if -2 ** 63 <= seed < 2 ** 63 else None)
+    assert encode(replay.seek_action(len(replay.actions))) == encode(game_logic)
+
+
+def test_version_1():
+    game_logic, data = record(1, 20)
+    header_v1, header_v2 = struct.Struct('<3sBBBQ'), struct.Struct('<3sBBBq')
+    fields = list(header_v2.unpack_from(data))
+    fields[1] = 1
+    replay = Replay(header_v1.pack(*fields) + data[header_v2.size:])
+    assert replay.seed == 1
+    assert encode(replay.seek_action(len(replay.actions))) == encode(game_logic)
+
+
+@pytest.fixture(scope='module')
+def replay():
+    _, data = record(3, 300, keyframe_interval=20)
+    return Replay(data)
+
+
+def replay_from_start(replay, n_actions):
+    return replay.replay(GameLogic(replay.num_of_players, seed=replay.seed), 0, n_actions)
+
+
+def test_seek_action(replay):
+    keyframe_actions = [n_actions for _, n_actions, _ in replay.keyframes]
+    assert len(keyframe_actions) > 2
+    indices = {0, len(replay.actions)}
+    for n_actions in keyframe_actions:
+        indices.update([n_actions - 1, n_actions, n_actions + 1])
+    for n_actions in sorted(indices):
+        assert encode(replay.seek_action(n_actions)) == encode(replay_from_start(replay, n_actions))
+
+
+def test_seek(replay):
+    keyframe_turns = [turn for turn, _, _ in replay.keyframes]
+    for turn in sorted({0, 1, replay.n_turns, *keyframe_turns,
+                        *(turn + 1 for turn in keyframe_turns)}):
+        game_logic = GameLogic(replay.num_of_players, seed=replay.seed)
+        n_actions = 0
+        while n_actions < len(replay.actions) and game_logic.turn < turn:
+            replay.replay(game_logic, n_actions, n_actions + 1)
+            n_actions += 1
+        assert encode(replay.seek(turn)) == encode(game_logic)
@@ -0,0 +1,61 @@
+import struct
+
+import pytest
+
+from code.data import tile_types
+from code.serialization import MAGIC, encode, decode
+
+header_v1 = struct.Struct('<3sBBIBBhhHB')
+header_v2 = struct.Struct('<3sBBIBBhhHBB')
+
+
+def pack_names(names):
+    return b''.join(bytes([len(name)]) + name.encode() for name in names)
+
+
+def assert_same_game(game_logic, other):
+    assert encode(other) == encode(game_logic)
+    assert other.game_state.hash == game_logic.game_state.hash
+
+
+def test_round_trip(played_game_logic):
+    game_logic = played_game_logic
+    assert_same_game(game_logic, decode(encode(game_logic)))
+
+
+def test_version_1(played_game_logic):
+    game_logic = played_game_logic
+    data = encode(game_logic)
+    names_size = len(pack_names(tile_types))
+    # Version 1 has no number of the tile types and no names.
+    fields = list(header_v2.unpack_from(data))
+    fields[1] = 1
+    data_v1 = header_v1.pack(*fields[:-1]) + data[header_v2.size + names_size:]
+    assert data_v1[:len(MAGIC)] == MAGIC
+    assert_same_game(game_logic, decode(data_v1))
+
+
+def test_other_registration_order(played_game_logic):
+    game_logic = played_game_logic
+    # Save of the game made with the tile types registered in the reversed order.
+    names = tile_types[::-1]
+    saved_ids = bytes(names.index(tile_type) for tile_type in tile_types)
+    state = game_logic.game_state.copy()
+    state.load_tiles(tile_type=bytes(saved_ids[tile_type_id] for tile_type_id in state.tile_type))
+    data = encode(game_logic)
+    state_size = len(state.tobytes())
+    start = header_v2.size + len(pack_names(tile_types))
+    saved = (data[:header_v2.size] + pack_names(names) + data[start:len(data) - state_size] +
+             state.tobytes())
+    assert saved != data
+    assert_same_game(game_logic, decode(saved))
+
+
+def test_unknown_tile_type(played_game_logic):
+    game_logic = played_game_logic
+    data = encode(game_logic)
+    names = ['unknown_tile_type', *tile_types[1:]]
+    start = header_v2.size + len(pack_names(tile_types))
+    saved = data[:header_v2.size] + pack_names(names) + data[start:]
+    with pytest.raises(KeyError):
+        decode(saved)
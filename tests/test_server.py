@@ -0,0 +1,57 @@
+import pytest
+
+from code.serialization import encode
+from code.server import GameServer, Table
+
+
+@pytest.fixture
+def table():
+    """Table of two players, the first one without the living characters."""
+    table = Table(0, num_of_players=2, seed=0)
+    first, second = table.game_logic.players
+    for character in list(first.characters):
+        first.remove_character(character)
+    table.join('first', [first.color])
+    table.join('second', [second.color])
+    return table
+
+
+def test_player_without_characters_is_skipped(table):
+    with pytest.raises(ValueError, match='Not your turn'):
+        table.make_action('first', 'next_character', [])
+    message = table.make_action('second', 'next_character', [])
+    assert message['fields']['cur_player'] == 1
+
+
+def test_move_of_next_player(table):
+    # Turns are taken from the copy, as getting them skips the first player.
+    game_logic = table.game_logic.copy()
+    # The move of the ship ends the turn.
+    turn = next(coords for coords in game_logic._get_possible_turns()
+                if game_logic.game_map[coords].tile_type == 'water')
+    message = table.make_action('second', 'mouse_click', list(turn))
+    assert message['fields']['turn'] == 2
+
+
+@pytest.mark.parametrize('players', [0, 5, '4', None])
+def test_wrong_number_of_players(players):
+    server = GameServer()
+    with pytest.raises(ValueError, match='Wrong number of players'):
+        server.handle_message(None, {'type': 'create', 'players': players}, set())
+    assert not server.tables
+
+
+def test_failed_action_is_restored(table, monkeypatch):
+    game_logic = table.game_logic
+    data = encode(game_logic)
+
+    def fail():
+        game_logic.turn += 1
+        game_logic.game_state.set(game_logic.game_state.is_open, 0, 1)
+        raise ValueError('The action failed.')
+
+    monkeypatch.setattr(game_logic, 'next_character', fail)
+    with pytest.raises(ValueError, match='The action failed'):
+        table.make_action('second', 'next_character', [])
+    assert encode(game_logic) == data
+    assert not game_logic.game_state.marks
@@ -0,0 +1,24 @@
+from collections import Counter
+
+from code import GameLogic
+from code.behaviour import MoveTables
+from code.simulate import make_counted_action, play_game
+
+
+def test_turns_stop_at_limit():
+    # Players without the living characters are skipped after the last action of the game.
+    result = play_game(0, 21, max_turns=200)
+    assert not result['finished']
+    assert result['turns'] == 200
+
+
+def test_deaths_counted_at_kill_site():
+    game_logic = GameLogic(4, seed=0)
+    game_map = game_logic.game_map
+    target = next(coords for coords in game_logic._get_possible_turns()
+                  if game_map[coords].tile_type != 'water')
+    game_map[target].tile_type = 'ogre'
+    game_map.move_tables = MoveTables(game_map)
+    deaths = Counter()
+    make_counted_action(game_logic, ('move', target), deaths)
+    assert deaths == {'ogre': 1}
@@ -0,0 +1,35 @@
+import pytest
+
+from code import GameMap
+from code.behaviour import moveTables, register_tile_type, get_tile_rules
+from code.behaviour.ruleRegistry import compile_rules
+from code.data import get_tile_type_id
+
+
+@pytest.fixture
+def restore_empty():
+    """Restore the rules of the empty tiles after the test."""
+    rules = get_tile_rules('empty')
+    yield
+    compile_rules(get_tile_type_id('empty'), rules)
+
+
+def n_turns(game_map, tile_type):
+    """Get the numbers of the static turns of the tiles of the type."""
+    tile_type_id = get_tile_type_id(tile_type)
+    return [bin(game_map.move_tables.cell_turns[cell]).count('1')
+            for cell, cell_type_id in enumerate(game_map.game_state.tile_type)
+            if cell_type_id == tile_type_id]
+
+
+def test_unknown_tile_type():
+    with pytest.raises(KeyError):
+        get_tile_type_id('unknown_tile_type')
+
+
+def test_reregistered_rules_on_used_shape(restore_empty):
+    # Builds the tables of the shape with the default rules.
+    assert 8 in n_turns(GameMap(seed=0), 'empty')
+    register_tile_type('empty', static_mask=moveTables.dir_straight)
+    for game_map in [GameMap(seed=0), GameMap.from_state(GameMap(seed=0).game_state)]:
+        assert max(n_turns(game_map, 'empty')) == 1
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+from code import GameLogic
+from code.render import TileTracker
+from code.simulate import policies
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_partial_update_matches_full_redraw(seed):
+    game_logic = GameLogic(4, seed=seed)
+    rng = random.Random(seed)
+    tracker = TileTracker()
+    tracker.update(game_logic)
+    for _ in range(400):
+        if game_logic.is_game_over():
+            break
+        game_logic.make_action(*policies['random'](game_logic, rng))
+        old_signatures = dict(tracker.signatures)
+        changed, changed_images = tracker.update(game_logic)
+        full = TileTracker.get_signatures(game_logic)
+        assert tracker.signatures == full
+        assert set(changed) == {coords for coords, signature in full.items()
+                                if old_signatures[coords] != signature}
+        assert set(changed_images) == {coords for coords, signature in full.items()
+                                       if old_signatures[coords][0] != signature[0]}
+
+
+def test_new_game():
+    tracker = TileTracker()
+    tracker.update(GameLogic(4, seed=0))
+    game_logic = GameLogic(4, seed=1)
+    changed, _ = tracker.update(game_logic)
+    assert tracker.signatures == TileTracker.get_signatures(game_logic)
+    assert len(changed) > 0
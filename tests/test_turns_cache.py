@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from code import GameLogic
+from code.simulate import policies
+
+
+def get_uncached_turns(game_logic):
+    return game_logic._get_turns(game_logic._get_current_player(),
+                                 game_logic._get_current_character())
+
+
+def mutate(game_logic, rng):
+    """Change a random tile near the current character, or move the other character next to it."""
+    cur_char = game_logic._get_current_character()
+    game_map = game_logic.game_map
+    neighbours = [cur_char.coords + (dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    neighbours = [coords for coords in neighbours if game_map.is_in_bounds(coords)]
+    coords = rng.choice(neighbours)
+    kind = rng.randrange(4)
+    if kind == 0:
+        game_map[coords].tile_type = rng.choice(['empty', 'fort', 'dir_straight', 'water'])
+    elif kind == 1:
+        game_map[coords].is_open = not game_map[coords].is_open
+    elif kind == 2:
+        game_map[coords].direction = rng.choice([0, 90, 180, 270])
+    else:
+        others = [character for player in game_logic.players for character in player.characters
+                  if character is not cur_char]
+        rng.choice(others).move(coords)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_cache_is_invalidated(seed):
+    game_logic = GameLogic(4, seed=seed)
+    rng = random.Random(seed)
+    n_changed = 0
+    for _ in range(200):
+        if game_logic.is_game_over():
+            break
+        turns = game_logic._get_possible_turns()
+        hits = game_logic.turns_cache_hits
+        assert game_logic._get_possible_turns() is turns
+        assert game_logic.turns_cache_hits == hits + 1
+        game_logic.snapshot()
+        mutate(game_logic, rng)
+        new_turns = game_logic._get_possible_turns()
+        assert new_turns == get_uncached_turns(game_logic)
+        n_changed += new_turns != turns
+        # The rollback changes the state again.
+        game_logic.restore()
+        assert game_logic._get_possible_turns() == get_uncached_turns(game_logic) == turns
+        game_logic.make_action(*policies['random'](game_logic, rng))
+    assert n_changed > 0
+
+
+def test_cache_of_next_character(played_game_logic):
+    game_logic = played_game_logic
+    for _ in range(10):
+        game_logic._get_possible_turns()
+        game_logic.next_character()
+        assert game_logic._get_possible_turns() == get_uncached_turns(game_logic)